@@ -24,6 +24,14 @@ class BaseAgent(ABC):
             task: Task dictionary
         """
         pass
+
+    def prepare_environment(self, task: Dict[str, Any]) -> None:
+        """Start preparing the environment of an upcoming task in the background (optional).
+
+        Args:
+            task: Task dictionary of the task that will run next
+        """
+        pass
     
     @abstractmethod
     def run_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
@@ -63,3 +71,7 @@ class BaseAgent(ABC):
         """Cleanup environment after execution (optional)."""
         pass
 
+    def close(self) -> None:
+        """Release resources held across tasks once all tasks are done (optional)."""
+        pass
+
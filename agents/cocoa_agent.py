@@ -17,6 +17,10 @@ class CocoaAgent(BaseAgent):
     def setup_environment(self, task: Dict[str, Any]) -> None:
         """Setup Docker sandbox environment."""
         self.executor.setup_environment(task)
+
+    def prepare_environment(self, task: Dict[str, Any]) -> None:
+        """Warm the image and a pooled container for the next task."""
+        self.executor.prepare_environment(task)
     
     def run_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """Execute task using TaskExecutor."""
@@ -46,3 +50,6 @@ class CocoaAgent(BaseAgent):
         """Cleanup Docker sandbox."""
         self.executor.cleanup_environment()
 
+    def close(self) -> None:
+        """Shut down executor-wide resources such as the warm container pool."""
+        self.executor.close()
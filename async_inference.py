@@ -0,0 +1,175 @@
+"""
+Single-process concurrent inference runner.
+
+Drives many agent loops from one asyncio event loop instead of one OS process
+per task. Each concurrency slot owns one agent (controller, HTTP clients and
+sandbox client on its own sandbox port) and pulls tasks from a shared queue.
+The blocking agent loop of a task runs in a worker thread, so all slots share
+one interpreter, one set of imported SDKs and one process' memory. Results use
+the same per-task JSON format as inference_main.py.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict
+
+from executor.logger import route_output_by_context, task_output
+from executor.result_index import ResultIndex
+from executor.utils import get_logger, load_config, setup_logging
+from inference_main import create_agent, load_tasks, run_single_task
+from parallel_inference import find_available_ports, should_run_task
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run CocoaAgent inference for many tasks concurrently in a single process."
+    )
+    parser.add_argument("--config", type=str, required=True, help="Path to JSON config file")
+    parser.add_argument("--tasks-dir", type=str, required=True, help="Directory containing task subdirectories")
+    parser.add_argument("--output-dir", type=str, required=True, help="Output directory for result JSONs")
+    parser.add_argument("--concurrency", type=int, default=16, help="Number of tasks running at the same time")
+    parser.add_argument("--base-port", type=int, default=8084, help="Starting sandbox port")
+    parser.add_argument("--model", type=str, help="Optional model override")
+    parser.add_argument(
+        "--run-all",
+        action="store_true",
+        help="Run all tasks even if a successful result already exists in the output directory",
+    )
+    parser.add_argument(
+        "--work-dir",
+        type=str,
+        default=".async_run",
+        help="Directory for per-task run logs",
+    )
+    return parser.parse_args()
+
+
+def record_result(result_index: ResultIndex, result_file: Path) -> None:
+    """Add a finished task's result to the index and rewrite statistics.txt."""
+    result_index.update_file(result_file)
+    result_index.write_statistics()
+
+
+async def run_slot(
+    slot_index: int,
+    config: Dict[str, Any],
+    task_queue: "asyncio.Queue[Dict[str, Any]]",
+    output_dir: Path,
+    logs_root: Path,
+    progress: Dict[str, int],
+    result_index: ResultIndex,
+    result_lock: asyncio.Lock,
+) -> None:
+    """Run tasks from the queue one after another with this slot's agent."""
+    agent = None
+    try:
+        while True:
+            try:
+                task = task_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            task_name = task["task_name"]
+            log_path = logs_root / task_name / "run.log"
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            print(f"[slot {slot_index}] port={config['sandbox']['docker_port']} task={task_name} log={log_path}")
+
+            with open(log_path, "a") as log_file, task_output(log_file):
+                log_file.write(
+                    f"\n==== slot={slot_index} port={config['sandbox']['docker_port']} task={task_name} "
+                    f"started_at={datetime.now().isoformat(timespec='seconds')} ====\n"
+                )
+                try:
+                    if agent is None:
+                        agent = await asyncio.to_thread(create_agent, config)
+                    await asyncio.to_thread(run_single_task, agent, task, output_dir)
+                except Exception as exc:
+                    # run_single_task records task failures itself; this only covers agent construction
+                    get_logger("inference").error(f"Task {task_name} failed in slot {slot_index}: {exc}")
+                    if not (output_dir / f"{task_name}.json").exists():
+                        with open(output_dir / f"{task_name}.json", "w") as f:
+                            json.dump({"status": "error", "error": str(exc), "task_name": task_name}, f, indent=2)
+
+            progress["done"] += 1
+            # File I/O off the event loop, one slot at a time since the index is shared
+            async with result_lock:
+                await asyncio.to_thread(record_result, result_index, output_dir / f"{task_name}.json")
+            print(f"[slot {slot_index}] finished task={task_name} ({progress['done']}/{progress['total']})")
+    finally:
+        if agent is not None:
+            await asyncio.to_thread(agent.close)
+
+
+async def run_all(args: argparse.Namespace) -> int:
+    config = load_config(args.config)
+    setup_logging(config.get("log_level", "INFO"))
+    logger = get_logger("inference")
+
+    if args.model:
+        config["controller"]["args"]["model"] = args.model
+        logger.info(f"Model overridden to: {args.model}")
+
+    output_dir = Path(args.output_dir).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    tasks = load_tasks(args.tasks_dir, use_encrypted=config.get("use_encrypted_tasks", False))
+    if not args.run_all:
+        tasks = [task for task in tasks if should_run_task(Path(task["task_dir"]), output_dir)]
+    if not tasks:
+        print("No tasks to run.")
+        return 0
+
+    concurrency = max(1, min(args.concurrency, len(tasks)))
+    ports = find_available_ports(count=concurrency, start_port=args.base_port)
+    logs_root = Path(args.work_dir).resolve() / datetime.now().strftime("%Y%m%d-%H%M%S") / "tasks"
+
+    print(f"Total tasks selected: {len(tasks)}")
+    print(f"Running {concurrency} concurrent slots in one process (ports {ports[0]}-{ports[-1]})")
+    print(f"Task logs: {logs_root}")
+
+    # One thread per slot so every agent loop can block on the LLM or sandbox at the same time
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="agent-slot"))
+    route_output_by_context()
+
+    task_queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+    for task in tasks:
+        task_queue.put_nowait(task)
+
+    slot_configs = []
+    for port in ports:
+        slot_config = copy.deepcopy(config)
+        slot_config.setdefault("sandbox", {})["docker_port"] = port
+        slot_configs.append(slot_config)
+
+    progress = {"done": 0, "total": len(tasks)}
+    result_index = ResultIndex.load(output_dir).refresh()
+    result_lock = asyncio.Lock()
+    await asyncio.gather(
+        *(
+            run_slot(index, slot_config, task_queue, output_dir, logs_root, progress, result_index, result_lock)
+            for index, slot_config in enumerate(slot_configs)
+        )
+    )
+
+    await asyncio.to_thread(result_index.write_statistics)
+    print(f"Results written to {output_dir}")
+    print(f"Statistics written to {output_dir / 'statistics.txt'}")
+    return 0
+
+
+def main() -> int:
+    args = parse_args()
+    if args.concurrency < 1:
+        print("--concurrency must be >= 1", file=sys.stderr)
+        return 1
+    return asyncio.run(run_all(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
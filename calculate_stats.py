@@ -1,7 +1,8 @@
 import argparse
-import json
 from pathlib import Path
 
+from executor.result_index import ResultIndex
+
 def main():
     parser = argparse.ArgumentParser(description="Calculate success rate statistics from output JSON files")
     parser.add_argument("output_dir", type=str, help="Directory containing the output JSON files")
@@ -12,51 +13,39 @@ def main():
         print(f"Error: Directory not found: {args.output_dir}")
         return
 
-    total_tasks = 0
-    passed_tasks = 0
-    failed_tasks = 0
-    error_tasks = 0
-    passed_list = []
-    error_list = []
-
     print(f"Scanning directory: {output_path}")
 
-    for json_file in output_path.glob("*.json"):
-        try:
-            with open(json_file, 'r') as f:
-                data = json.load(f)
-                total_tasks += 1
-                if data.get("status") == "error":
-                    error_tasks += 1
-                    error_list.append(json_file.stem)
-                elif data.get("eval", {}).get("passed", False) is True:
-                    passed_tasks += 1
-                    passed_list.append(json_file.stem)
-                else:
-                    failed_tasks += 1
-        except Exception as e:
-            print(f"Error reading {json_file}: {e}")
-
-    success_rate = (passed_tasks / total_tasks * 100) if total_tasks > 0 else 0.0
+    # Same index inference_main.py and parallel_inference.py maintain; only changed files are re-read
+    result_index = ResultIndex.load(output_path).refresh()
+    result_index.save()
+    totals = result_index.totals()
 
     print("-" * 30)
-    print(f"Total Tasks: {total_tasks}")
-    print(f"Passed:      {passed_tasks}")
-    print(f"Failed:      {failed_tasks}")
-    print(f"Errors:      {error_tasks}")
+    print(f"Total Tasks: {totals['total_tasks']}")
+    print(f"Passed:      {totals['passed_tasks']}")
+    print(f"Failed:      {totals['failed_tasks']}")
+    print(f"Errors:      {totals['error_tasks']}")
+    if totals["timeout_tasks"]:
+        print(f"Timeouts:    {totals['timeout_tasks']}")
     print("-" * 30)
-    print(f"Success Rate: {success_rate:.2f}%")
+    print(f"Success Rate: {totals['success_rate']:.2f}%")
     print("-" * 30)
     
-    if passed_list:
+    if totals["passed_list"]:
         print("\nPassed Tasks:")
-        for task_name in sorted(passed_list):
+        for task_name in totals["passed_list"]:
             print(f"  - {task_name}")
         print("-" * 30)
 
-    if error_list:
+    if totals["error_list"]:
         print("\nError Tasks:")
-        for task_name in sorted(error_list):
+        for task_name in totals["error_list"]:
+            print(f"  - {task_name}")
+        print("-" * 30)
+
+    if totals["timeout_list"]:
+        print("\nTimeout Tasks:")
+        for task_name in totals["timeout_list"]:
             print(f"  - {task_name}")
         print("-" * 30)
 
@@ -13,7 +13,7 @@ Usage: clean_cocoa_bench_dockers.sh [--images] [--networks] [--dry-run]
 Clean CocoaBench task docker resources created by task docker-compose files.
 
 Options:
-  --images   Also remove task images matching task-*:latest
+  --images   Also remove task images matching task-*:latest and cocoa-task-cache:*
   --networks Also remove task compose networks matching <task_name>_default
   --dry-run  Print what would be removed without executing
   -h, --help Show this help message
@@ -71,7 +71,7 @@ fi
 
 if [[ "$REMOVE_IMAGES" == true ]]; then
   mapfile -t IMAGES < <(
-    docker images --format '{{.Repository}}:{{.Tag}}' | awk '/^task-.*:latest$/ { print $0 }'
+    docker images --format '{{.Repository}}:{{.Tag}}' | awk '/^task-.*:latest$/ || /^cocoa-task-cache:/ { print $0 }'
   )
 
   if [[ ${#IMAGES[@]} -eq 0 ]]; then
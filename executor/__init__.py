@@ -3,11 +3,15 @@ Executor module for task execution with controllers and sandbox agents.
 """
 
 import importlib.util
+import json
+import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Dict
 
-from .logger import setup_logging, get_logger
+from .logger import setup_logging, get_logger, with_current_context
 from .controller import (
     OpenAILLM, QwenLLM, BaseLLM, Controller, Human, GeminiLLM, ClaudeLLM,
     GLMLLM, KimiLLM, DeepSeekLLM,
@@ -18,6 +22,11 @@ from .sandbox import (
     UnifiedSandboxClient,
 )
 from .utils import colorize, extract_config_info, measure_execution_time
+from .container_pool import ContainerPool, PooledContainer
+from .assets import AssetInjectionPlan
+from .image_cache import ImageCache
+from .streaming import EarlyActionDispatcher
+from .checkpoint import CheckpointWriter
 
 # Import decrypt utilities for encrypted test files
 try:
@@ -42,6 +51,8 @@ __all__ = [
     "Human",
     "BrowserSandboxClient",
     "UnifiedSandboxClient",
+    "ContainerPool",
+    "ImageCache",
     "setup_logging",
     "get_logger",
 ]
@@ -181,6 +192,78 @@ class TaskExecutor:
             self.sandbox_client = UnifiedSandboxClient(sandbox_config=sandbox_config)
             logger.info(f"Using UnifiedSandboxClient as fallback for client_type='{client_type}'")
 
+        # Optional warm container pool: tasks lease pre-started containers instead of compose up
+        pool_config = sandbox_config.get("pool") or {}
+        self.container_pool: ContainerPool | None = None
+        self._leased_container: PooledContainer | None = None
+        # Set-up latency of the current task's environment, reported in the result JSON
+        self.setup_latency: dict = {}
+        self._prepare_executor: ThreadPoolExecutor | None = None
+        # Partial results are checkpointed here each iteration so a watchdog can recover them
+        checkpoint_dir = config.get("checkpoint_dir")
+        self.checkpoint_dir: Path | None = Path(checkpoint_dir) if checkpoint_dir else None
+        self._checkpoint: CheckpointWriter | None = None
+        if pool_config.get("enabled", False):
+            self.container_pool = ContainerPool(
+                size=pool_config.get("size", 1),
+                health_timeout=pool_config.get("health_timeout", 60),
+                prober=self.sandbox_client.readiness_prober,
+                backend=self.sandbox_client.docker_backend,
+            )
+            logger.info(f"Using warm container pool (size={self.container_pool.size} per image)")
+
+    def _task_image(self, task: dict) -> tuple[str, AssetInjectionPlan | None]:
+        """Resolve the cached image a pooled container for this task must run, plus assets to inject."""
+        image, asset_plan = self.sandbox_client.resolve_task_image(task["task_dir"])
+        if image is None:
+            raise RuntimeError(f"Failed to build image for task '{task.get('task_name')}'")
+        return image, asset_plan
+
+    def _prewarm_task(self, task: dict) -> None:
+        try:
+            self.container_pool.prewarm(self._task_image(task)[0])
+        except Exception as e:
+            logger.warning(f"Failed to prepare environment for task '{task.get('task_name')}': {e}")
+
+    def prepare_environment(self, task: dict) -> None:
+        """Build the image and warm a pooled container for an upcoming task in the background.
+
+        Only has an effect with the container pool enabled; setup_environment for
+        that task then leases the already started container.
+
+        Args:
+            task: Task object of the task that will run next
+        """
+        if self.container_pool is None:
+            return
+        if self._prepare_executor is None:
+            self._prepare_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prepare-env")
+        logger.debug(f"Preparing environment for upcoming task '{task.get('task_name')}'")
+        self._prepare_executor.submit(with_current_context(self._prewarm_task), task)
+
+    def _setup_pooled_environment(self, task: dict, wait_time: int) -> None:
+        """Lease a warm container for the task and attach the sandbox client to it."""
+        image, asset_plan = self._task_image(task)
+        container = self.container_pool.lease(image, timeout=wait_time)
+        if container is None:
+            raise RuntimeError("Sandbox environment failed to become ready")
+        if not self.sandbox_client.attach_container(task, container.name, container.host_port):
+            self.container_pool.release(container)
+            raise RuntimeError("Sandbox environment failed to become ready")
+        if asset_plan is not None and not self.sandbox_client.inject_task_assets(task["task_dir"], asset_plan):
+            self.sandbox_client.detach_container()
+            self.container_pool.release(container)
+            raise RuntimeError(f"Failed to inject assets for task '{task.get('task_name')}'")
+        self._leased_container = container
+        self.setup_latency = {
+            "source": "pool",
+            "warm": container.warm,
+            "container_start": round(container.start_latency, 3),
+            "readiness": container.readiness,
+        }
+        # Results and test.py locate the sandbox through sandbox.docker_port
+        self.config.setdefault("sandbox", {})["docker_port"] = container.host_port
+
     def setup_environment(self, task: dict, wait_time: int = 30) -> None:
         """Initialize the sandbox environment for task execution.
 
@@ -188,19 +271,66 @@ class TaskExecutor:
             task: Task object containing task_dir and other task metadata
             wait_time: Time to wait for server to be ready (default: 30 seconds)
         """
-        if self.sandbox_client.create_docker_environment(task, wait_time):
+        started = time.monotonic()
+        self.setup_latency = {}
+        if self.container_pool is not None:
+            self._setup_pooled_environment(task, wait_time)
+            logger.info(f"Sandbox environment ready (Pooled container: {self.sandbox_client.container_id})")
+        elif self.sandbox_client.create_docker_environment(task, wait_time):
+            self.setup_latency = dict(self.sandbox_client.setup_timings)
             logger.info(f"Sandbox environment ready (Container: {self.sandbox_client.container_id})")
         else:
             raise RuntimeError("Sandbox environment failed to become ready")
+        self.setup_latency["task_total"] = round(time.monotonic() - started, 3)
         self.controller.clear_history()
         if hasattr(self.controller, "reset_cost_tracking"):
             self.controller.reset_cost_tracking()
 
     def cleanup_environment(self) -> None:
         """Clean up the sandbox environment after execution."""
-        self.sandbox_client.cleanup_docker_environment()
+        if self._leased_container is not None:
+            self.sandbox_client.detach_container()
+            self.container_pool.release(self._leased_container)
+            self._leased_container = None
+        else:
+            self.sandbox_client.cleanup_docker_environment()
         self.controller.clear_history()
 
+    def close(self) -> None:
+        """Release executor-wide resources such as warm pooled containers."""
+        if self._prepare_executor is not None:
+            self._prepare_executor.shutdown(wait=True, cancel_futures=True)
+            self._prepare_executor = None
+        if self.container_pool is not None:
+            self.container_pool.shutdown()
+
+    def checkpoint_path(self, task: dict) -> Path | None:
+        """Return the partial-result checkpoint file for a task, or None if checkpointing is off."""
+        if self.checkpoint_dir is None:
+            return None
+        return self.checkpoint_dir / f"{task.get('task_name', 'task')}.partial.jsonl"
+
+    def _write_checkpoint(self, task: dict, iterations: int, visualization_data: dict) -> None:
+        """Append the iterations since the last checkpoint, for recovery if the task is killed."""
+        if self._checkpoint is None:
+            path = self.checkpoint_path(task)
+            if path is None:
+                return
+            self._checkpoint = CheckpointWriter(path, task | extract_config_info(self.config) | {
+                "visualization_data": {"task_description": visualization_data.get("task_description")},
+                "setup_latency": self.setup_latency,
+            })
+        extra = {}
+        if hasattr(self.controller, "get_cost_stats"):
+            extra["api_cost_stats"] = self.controller.get_cost_stats()
+        self._checkpoint.append(
+            iterations,
+            self.controller.get_history(),
+            self.sandbox_client.get_history(),
+            visualization_data["iterations"],
+            extra,
+        )
+
     @measure_execution_time
     def run_task(self, task: dict) -> dict:
         """Run inference on the given task with agent loop.
@@ -244,6 +374,7 @@ class TaskExecutor:
 
         # Build initial prompt (only for first iteration)
         prompt = self.controller.build_prompt(task_description=task_desc)
+        self._checkpoint = None
 
         action = None
         final_iteration = 0
@@ -257,171 +388,202 @@ class TaskExecutor:
             "iterations": []
         }
 
+        # With a streaming controller, complete tool calls start running while the response still streams
+        early_dispatcher = None
+        if getattr(self.controller, "early_dispatch", False):
+            # The loop screenshots the sandbox after browser actions; the next early action waits for that
+            early_dispatcher = EarlyActionDispatcher(
+                self.sandbox_client.get_feedback,
+                hold=lambda early_action: (
+                    hasattr(self.sandbox_client, "take_screenshot")
+                    and is_browser_action(early_action)
+                    and early_action.get("action_type") != "browser_screenshot"
+                ),
+            )
+            self.controller.on_tool_call = lambda early_action: early_dispatcher.submit(normalize_action(early_action))
+
         # Agent loop
-        for iteration in range(1, max_iterations + 1):
-            final_iteration = iteration
-            logger.info(f"Iteration {iteration}/{max_iterations}")
-
-            # Get controller response (already parsed into action dict)
-            # Only include images from the previous iteration (i-1), not all historical images
-            images_base64 = images_from_last_iteration.copy() if images_from_last_iteration else None
-            if images_base64:
-                logger.debug(f"Including {len(images_base64)} image(s) from previous iteration in next prompt")
+        try:
+            for iteration in range(1, max_iterations + 1):
+                final_iteration = iteration
+                logger.info(f"Iteration {iteration}/{max_iterations}")
+                self._write_checkpoint(task, iteration - 1, visualization_data)
+                if early_dispatcher is not None:
+                    # Early actions of a response that was rejected (e.g. re-asked after a parse error)
+                    early_dispatcher.discard_pending()
+
+                # Get controller response (already parsed into action dict)
+                # Only include images from the previous iteration (i-1), not all historical images
+                images_base64 = images_from_last_iteration.copy() if images_from_last_iteration else None
+                if images_base64:
+                    logger.debug(f"Including {len(images_base64)} image(s) from previous iteration in next prompt")
             
-            prompt_with_progress = add_progress_note(prompt, iteration)
-            # Pass list of images (only from previous iteration)
-            action = self.controller.call(prompt_with_progress, images_base64=images_base64)
+                prompt_with_progress = add_progress_note(prompt, iteration)
+                # Pass list of images (only from previous iteration)
+                action = self.controller.call(prompt_with_progress, images_base64=images_base64)
             
-            # Extract think content from controller
-            think_content = None
-            if hasattr(self.controller, 'get_last_think'):
-                think_content = self.controller.get_last_think()
-
-            # Handle error action (parsing errors from tool calls)
-            if isinstance(action, dict) and action.get("action_type") == "error":
-                error_message = action.get("error_message", "Unknown error occurred while parsing tool calls")
-                logger.warning(f"Tool call parsing error: {error_message}")
-                # Create feedback with error message to send back to model
-                feedback = {
-                    "done": False,
-                    "message": f"Error: {error_message}\nPlease correct the tool call parameters and try again."
-                }
-                # Prepare next prompt with error feedback
-                prompt = self.controller.build_prompt(
-                    feedback=feedback.get("message", "Continue with the task.")
-                )
-                continue
-
-            # Normalize action format
-            action = normalize_action(action)
-
-            # Handle multiple actions (from tool calling)
-            if "actions" in action:
-                # Execute multiple actions sequentially
-                feedbacks = []
-                done = False
-                images_from_current_iteration = []  # Collect all images from current iteration
-                browser_screenshots = [] # Collect only browser screenshots
-                image_read_contents = [] # Collect only image_read contents
-                iteration_actions = []  # Store actions for visualization
+                # Extract think content from controller
+                think_content = None
+                if hasattr(self.controller, 'get_last_think'):
+                    think_content = self.controller.get_last_think()
+
+                # Handle error action (parsing errors from tool calls)
+                if isinstance(action, dict) and action.get("action_type") == "error":
+                    error_message = action.get("error_message", "Unknown error occurred while parsing tool calls")
+                    logger.warning(f"Tool call parsing error: {error_message}")
+                    # Create feedback with error message to send back to model
+                    feedback = {
+                        "done": False,
+                        "message": f"Error: {error_message}\nPlease correct the tool call parameters and try again."
+                    }
+                    # Prepare next prompt with error feedback
+                    prompt = self.controller.build_prompt(
+                        feedback=feedback.get("message", "Continue with the task.")
+                    )
+                    continue
+
+                # Normalize action format
+                action = normalize_action(action)
+
+                # Handle multiple actions (from tool calling)
+                if "actions" in action:
+                    # Execute multiple actions sequentially
+                    feedbacks = []
+                    done = False
+                    images_from_current_iteration = []  # Collect all images from current iteration
+                    browser_screenshots = [] # Collect only browser screenshots
+                    image_read_contents = [] # Collect only image_read contents
+                    iteration_actions = []  # Store actions for visualization
                 
-                for single_action in action["actions"]:
-                    # Normalize action format
-                    single_action = normalize_action(single_action)
-                    single_feedback = self.sandbox_client.get_feedback(single_action)
-                    record_tool_feedback(single_action, single_feedback) # TODO: optimize OpenAI Tool Calling format to avoid extra messages in the conversation history
-                    feedbacks.append(single_feedback.get("message", ""))
+                    for single_action in action["actions"]:
+                        # Normalize action format
+                        single_action = normalize_action(single_action)
+                        single_feedback = early_dispatcher.take(single_action) if early_dispatcher is not None else None
+                        if single_feedback is None:
+                            single_feedback = self.sandbox_client.get_feedback(single_action)
+                        record_tool_feedback(single_action, single_feedback) # TODO: optimize OpenAI Tool Calling format to avoid extra messages in the conversation history
+                        feedbacks.append(single_feedback.get("message", ""))
                     
-                    # For browser actions, take a screenshot after execution (unless it's already a screenshot action)
-                    screenshot_base64 = None
-                    if is_browser_action(single_action) and single_action.get("action_type") != "browser_screenshot":
-                        if hasattr(self.sandbox_client, 'take_screenshot'):
-                            try:
-                                screenshot_base64, _ = self.sandbox_client.take_screenshot()
-                                if screenshot_base64:
-                                    browser_screenshots.append(screenshot_base64)
-                            except Exception as e:
-                                logger.warning(f"Failed to take screenshot after browser action: {e}")
+                        # For browser actions, take a screenshot after execution (unless it's already a screenshot action)
+                        screenshot_base64 = None
+                        if is_browser_action(single_action) and single_action.get("action_type") != "browser_screenshot":
+                            if hasattr(self.sandbox_client, 'take_screenshot'):
+                                try:
+                                    screenshot_base64, _ = self.sandbox_client.take_screenshot()
+                                    if screenshot_base64:
+                                        browser_screenshots.append(screenshot_base64)
+                                except Exception as e:
+                                    logger.warning(f"Failed to take screenshot after browser action: {e}")
+                        if early_dispatcher is not None:
+                            early_dispatcher.resume()
                     
-                    # Check if this action was a screenshot or image_read and has image_base64
-                    if single_action.get("action_type") == "browser_screenshot" and "image_base64" in single_feedback:
-                        image_base64 = single_feedback["image_base64"]
-                        browser_screenshots.append(image_base64)
+                        # Check if this action was a screenshot or image_read and has image_base64
+                        if single_action.get("action_type") == "browser_screenshot" and "image_base64" in single_feedback:
+                            image_base64 = single_feedback["image_base64"]
+                            browser_screenshots.append(image_base64)
                     
-                    if single_action.get("action_type") == "image_read" and "image_base64" in single_feedback:
-                        image_base64 = single_feedback["image_base64"]
-                        if image_base64 not in image_read_contents:
-                            image_read_contents.append(image_base64)
+                        if single_action.get("action_type") == "image_read" and "image_base64" in single_feedback:
+                            image_base64 = single_feedback["image_base64"]
+                            if image_base64 not in image_read_contents:
+                                image_read_contents.append(image_base64)
                     
-                    # Store action data for visualization
-                    action_data = {
-                        "action": single_action,
-                        "observation": single_feedback.get("message", ""),
-                        "screenshot": screenshot_base64 if screenshot_base64 else (single_feedback.get("image_base64") if single_action.get("action_type") in ["browser_screenshot", "image_read"] else None)
-                    }
-                    iteration_actions.append(action_data)
+                        # Store action data for visualization
+                        action_data = {
+                            "action": single_action,
+                            "observation": single_feedback.get("message", ""),
+                            "screenshot": screenshot_base64 if screenshot_base64 else (single_feedback.get("image_base64") if single_action.get("action_type") in ["browser_screenshot", "image_read"] else None)
+                        }
+                        iteration_actions.append(action_data)
                     
-                    if single_feedback.get("done"):
-                        done = True
-                        break
+                        if single_feedback.get("done"):
+                            done = True
+                            break
                 
-                # Combine all feedbacks
-                combined_feedback = {
-                    "done": done,
-                    "message": "\n".join(feedbacks) # '/n' is used to separate each feedback
-                }
+                    # Combine all feedbacks
+                    combined_feedback = {
+                        "done": done,
+                        "message": "\n".join(feedbacks) # '/n' is used to separate each feedback
+                    }
                 
-                # Construct images list for next iteration
-                # 1. Take ONLY the last browser screenshot if available
-                # 2. Add ALL image_read contents
-                images_from_last_iteration = []
+                    # Construct images list for next iteration
+                    # 1. Take ONLY the last browser screenshot if available
+                    # 2. Add ALL image_read contents
+                    images_from_last_iteration = []
                 
-                if browser_screenshots:
-                    images_from_last_iteration.append(browser_screenshots[-1])
+                    if browser_screenshots:
+                        images_from_last_iteration.append(browser_screenshots[-1])
                 
-                # Append all manually read images
-                images_from_last_iteration.extend(image_read_contents)
+                    # Append all manually read images
+                    images_from_last_iteration.extend(image_read_contents)
                 
-                # For backward compatibility in feedback dict (though mostly unused if images_from_last_iteration is set)
-                if images_from_last_iteration:
-                    combined_feedback["image_base64"] = images_from_last_iteration[-1]
+                    # For backward compatibility in feedback dict (though mostly unused if images_from_last_iteration is set)
+                    if images_from_last_iteration:
+                        combined_feedback["image_base64"] = images_from_last_iteration[-1]
                 
-                feedback = combined_feedback
+                    feedback = combined_feedback
                 
-                # Store iteration data for visualization
-                visualization_data["iterations"].append({
-                    "iteration": iteration,
-                    "think": think_content,
-                    "actions": iteration_actions
-                })
-            else:
-                # Single action
-                feedback = self.sandbox_client.get_feedback(action)
-                record_tool_feedback(action, feedback)
+                    # Store iteration data for visualization
+                    visualization_data["iterations"].append({
+                        "iteration": iteration,
+                        "think": think_content,
+                        "actions": iteration_actions
+                    })
+                else:
+                    # Single action
+                    feedback = early_dispatcher.take(action) if early_dispatcher is not None else None
+                    if feedback is None:
+                        feedback = self.sandbox_client.get_feedback(action)
+                    record_tool_feedback(action, feedback)
                 
-                # For browser actions, take a screenshot after execution (unless it's already a screenshot action)
-                screenshot_base64 = None
-                if is_browser_action(action) and action.get("action_type") != "browser_screenshot":
-                    if hasattr(self.sandbox_client, 'take_screenshot'):
-                        try:
-                            screenshot_base64, _ = self.sandbox_client.take_screenshot()
-                        except Exception as e:
-                            logger.warning(f"Failed to take screenshot after browser action: {e}")
+                    # For browser actions, take a screenshot after execution (unless it's already a screenshot action)
+                    screenshot_base64 = None
+                    if is_browser_action(action) and action.get("action_type") != "browser_screenshot":
+                        if hasattr(self.sandbox_client, 'take_screenshot'):
+                            try:
+                                screenshot_base64, _ = self.sandbox_client.take_screenshot()
+                            except Exception as e:
+                                logger.warning(f"Failed to take screenshot after browser action: {e}")
+                    if early_dispatcher is not None:
+                        early_dispatcher.resume()
                 
-                # Store images from this iteration for next iteration
-                images_from_last_iteration = []  # Reset for current iteration
-                if action.get("action_type") in ["browser_screenshot", "image_read"] and "image_base64" in feedback:
-                    image_base64 = feedback["image_base64"]
-                    images_from_last_iteration = [image_base64]  # Store single image for next iteration
-                elif screenshot_base64:
-                    images_from_last_iteration = [screenshot_base64]
+                    # Store images from this iteration for next iteration
+                    images_from_last_iteration = []  # Reset for current iteration
+                    if action.get("action_type") in ["browser_screenshot", "image_read"] and "image_base64" in feedback:
+                        image_base64 = feedback["image_base64"]
+                        images_from_last_iteration = [image_base64]  # Store single image for next iteration
+                    elif screenshot_base64:
+                        images_from_last_iteration = [screenshot_base64]
                 
-                # Store iteration data for visualization
-                visualization_data["iterations"].append({
-                    "iteration": iteration,
-                    "think": think_content,
-                    "actions": [{
-                        "action": action,
-                        "observation": feedback.get("message", ""),
-                        "screenshot": screenshot_base64 if screenshot_base64 else (feedback.get("image_base64") if action.get("action_type") in ["browser_screenshot", "image_read"] else None)
-                    }]
-                })
-
-            # Store the full feedback (including image_base64) for next iteration
-            last_feedback_with_image = feedback
-
-            # Check if task is complete
-            if feedback.get("done"):
-                logger.info(f"Task completed at iteration {iteration}")
-                # Extract task_result if present
-                if "task_result" in feedback:
-                    task_result = feedback.get("task_result")
-                break
-
-            # Prepare next prompt - only feedback, context is maintained in self.messages
-            prompt = self.controller.build_prompt(
-                feedback=feedback.get("message", "Continue with the task.")
-            )
+                    # Store iteration data for visualization
+                    visualization_data["iterations"].append({
+                        "iteration": iteration,
+                        "think": think_content,
+                        "actions": [{
+                            "action": action,
+                            "observation": feedback.get("message", ""),
+                            "screenshot": screenshot_base64 if screenshot_base64 else (feedback.get("image_base64") if action.get("action_type") in ["browser_screenshot", "image_read"] else None)
+                        }]
+                    })
+
+                # Store the full feedback (including image_base64) for next iteration
+                last_feedback_with_image = feedback
+
+                # Check if task is complete
+                if feedback.get("done"):
+                    logger.info(f"Task completed at iteration {iteration}")
+                    # Extract task_result if present
+                    if "task_result" in feedback:
+                        task_result = feedback.get("task_result")
+                    break
+
+                # Prepare next prompt - only feedback, context is maintained in self.messages
+                prompt = self.controller.build_prompt(
+                    feedback=feedback.get("message", "Continue with the task.")
+                )
+        finally:
+            if early_dispatcher is not None:
+                early_dispatcher.close()
+                self.controller.on_tool_call = None
 
         result_dict = task | extract_config_info(self.config) | {
             "status": "success",
@@ -429,7 +591,14 @@ class TaskExecutor:
             "conversation": self.controller.get_history(),
             "execution_trace": self.sandbox_client.get_history(),
             "visualization_data": visualization_data,  # Add visualization data
+            "setup_latency": self.setup_latency,
         }
+
+        # The full result supersedes the partial checkpoint
+        checkpoint = self.checkpoint_path(task)
+        if checkpoint is not None:
+            checkpoint.unlink(missing_ok=True)
+        self._checkpoint = None
         
         # Add task_result if it was provided in task_complete
         if task_result:
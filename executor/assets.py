@@ -0,0 +1,196 @@
+"""
+Bulk injection of task assets into running sandbox containers.
+
+Asset-bearing tasks use Dockerfiles of the form::
+
+    FROM ghcr.io/agent-infra/sandbox:latest
+    RUN mkdir -p /home/gem/assets
+    COPY assets/series.csv /home/gem/assets/
+    RUN chown -R 1000:1000 /home/gem/
+
+Such a Dockerfile only adds files on top of the shared base image. Instead of
+building an image per task, the container is started from the base image and
+the files are streamed in as one in-memory tar whose entries already carry the
+ownership the ``chown`` would have set.
+"""
+
+import io
+import posixpath
+import shlex
+import tarfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .image_cache import _iter_instructions, _split_copy_arguments
+from .utils import get_logger
+
+logger = get_logger("assets")
+
+ASSETS_DIR = "assets"
+
+
+@dataclass
+class AssetInjectionPlan:
+    """What an injectable Dockerfile adds on top of its base image."""
+
+    base_image: str
+    directories: List[str] = field(default_factory=list)
+    copies: List[Tuple[str, str]] = field(default_factory=list)
+    uid: int = 0
+    gid: int = 0
+
+    @property
+    def base_dockerfile(self) -> str:
+        """Dockerfile text of the shared base image."""
+        return f"FROM {self.base_image}"
+
+
+def _covered_by(path: str, root: str) -> bool:
+    path = posixpath.normpath(path)
+    root = posixpath.normpath(root)
+    return path == root or path.startswith(root.rstrip("/") + "/")
+
+
+def _parse_chown(arguments: str) -> Optional[Tuple[int, int, str]]:
+    tokens = shlex.split(arguments)
+    if len(tokens) != 4 or tokens[0] != "chown" or tokens[1] != "-R":
+        return None
+    owner, _, group = tokens[2].partition(":")
+    if not owner.isdigit() or not (group or owner).isdigit():
+        return None
+    return int(owner), int(group or owner), tokens[3]
+
+
+def asset_injection_plan(task_dir: str | Path, dockerfile: str = "Dockerfile") -> Optional[AssetInjectionPlan]:
+    """Return an injection plan if the task's Dockerfile only adds assets to a base image.
+
+    Accepted instructions are a single leading ``FROM``, ``RUN mkdir -p``,
+    ``COPY assets/... <dest>`` and a final ``RUN chown -R <uid>:<gid> <dir>``
+    covering every created path. Anything else returns None and the task image
+    is built as usual.
+
+    Args:
+        task_dir: Task directory containing the Dockerfile
+        dockerfile: Dockerfile name relative to task_dir
+
+    Returns:
+        AssetInjectionPlan, or None if the Dockerfile cannot be replaced by injection
+    """
+    dockerfile_path = Path(task_dir) / dockerfile
+    if not dockerfile_path.is_file():
+        return None
+
+    instructions = list(_iter_instructions(dockerfile_path.read_text()))
+    if not instructions or instructions[0][0] != "FROM" or len(instructions[0][1].split()) != 1:
+        return None
+
+    plan = AssetInjectionPlan(base_image=instructions[0][1].strip())
+    chown = None
+    for instruction, arguments in instructions[1:]:
+        if chown is not None:
+            # Ownership must be fixed after every file is in place
+            return None
+        if instruction == "COPY":
+            tokens = _split_copy_arguments(arguments)
+            if len(tokens) < 2 or any(token.startswith("--") for token in tokens):
+                return None
+            destination = tokens[-1]
+            if not destination.startswith("/"):
+                return None
+            for source in tokens[:-1]:
+                if source.startswith("/") or ".." in source.split("/"):
+                    # Not a plain path inside the build context; build the image instead
+                    return None
+                normalized = posixpath.normpath(source.removeprefix("./"))
+                if normalized.split("/", 1)[0] != ASSETS_DIR or set("*?[") & set(normalized):
+                    return None
+                plan.copies.append((normalized, destination))
+        elif instruction == "RUN":
+            tokens = shlex.split(arguments)
+            if tokens[:2] == ["mkdir", "-p"] and len(tokens) > 2 and all(t.startswith("/") for t in tokens[2:]):
+                plan.directories.extend(tokens[2:])
+            elif tokens[:1] == ["chown"]:
+                chown = _parse_chown(arguments)
+                if chown is None:
+                    return None
+            else:
+                return None
+        else:
+            return None
+
+    if not plan.copies:
+        return None
+    if chown is None:
+        # Without a chown the files keep root ownership, as COPY would leave them
+        plan.uid = plan.gid = 0
+    else:
+        plan.uid, plan.gid, chown_root = chown
+        targets = plan.directories + [destination for _, destination in plan.copies]
+        if not all(_covered_by(target, chown_root) for target in targets):
+            return None
+    return plan
+
+
+def build_assets_tar(task_dir: str | Path, plan: AssetInjectionPlan) -> bytes:
+    """Pack the plan's directories and COPY sources into a tar rooted at ``/``.
+
+    Entries are owned by the plan's uid/gid, so extracting the archive with
+    ownership preserved replaces both the COPY steps and the ``chown``.
+
+    Raises:
+        FileNotFoundError: If a COPY source is missing from the task directory
+    """
+    context_dir = Path(task_dir)
+    buffer = io.BytesIO()
+    added = set()
+    now = time.time()
+
+    def add_directory(tar: tarfile.TarFile, path: str) -> None:
+        arcname = posixpath.normpath(path).lstrip("/")
+        if not arcname or arcname in added:
+            return
+        info = tarfile.TarInfo(arcname)
+        info.type = tarfile.DIRTYPE
+        info.mode = 0o755
+        info.uid, info.gid = plan.uid, plan.gid
+        info.mtime = now
+        tar.addfile(info)
+        added.add(arcname)
+
+    def add_file(tar: tarfile.TarFile, source: Path, target: str) -> None:
+        arcname = posixpath.normpath(target).lstrip("/")
+        info = tar.gettarinfo(str(source), arcname=arcname)
+        info.uid, info.gid = plan.uid, plan.gid
+        info.uname = info.gname = ""
+        with open(source, "rb") as f:
+            tar.addfile(info, f)
+        added.add(arcname)
+
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for directory in plan.directories:
+            add_directory(tar, directory)
+        for source, destination in plan.copies:
+            source_path = context_dir / source
+            if not source_path.exists():
+                raise FileNotFoundError(f"Asset '{source}' not found in {context_dir}")
+            if source_path.is_dir():
+                # COPY of a directory copies its contents into the destination
+                add_directory(tar, destination)
+                for child in sorted(source_path.rglob("*")):
+                    target = posixpath.join(destination, child.relative_to(source_path).as_posix())
+                    if child.is_dir():
+                        add_directory(tar, target)
+                    else:
+                        add_file(tar, child, target)
+            else:
+                if destination.endswith("/"):
+                    add_directory(tar, destination)
+                    target = posixpath.join(destination, source_path.name)
+                else:
+                    target = destination
+                add_file(tar, source_path, target)
+
+    logger.debug(f"Packed {len(added)} asset entries from {context_dir}")
+    return buffer.getvalue()
@@ -0,0 +1,162 @@
+"""
+Persistent Playwright connection to a sandbox browser over CDP.
+
+DOM tools (``dom_*``) and ``browser_navigate`` drive the sandbox's Chromium
+through Playwright. Starting Playwright, asking the sandbox for the CDP URL and
+running ``connect_over_cdp`` costs far more than most DOM operations, so a
+``CDPSession`` does it once per sandbox and keeps the connection open:
+
+- a dedicated thread runs the asyncio event loop that owns the Playwright
+  driver, the browser connection and the cached context/page handles; callers
+  on any thread submit coroutines to it
+- the connection is checked before every operation and re-established when the
+  browser disconnected or the cached page was closed
+- ``close`` disconnects (the remote browser keeps running) and stops the thread;
+  the sandbox client calls it when its container is cleaned up or detached
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable
+
+from .logger import with_current_context
+from .utils import get_logger
+
+logger = get_logger("cdp")
+
+# Seconds a single operation may take, including a reconnect
+DEFAULT_CALL_TIMEOUT = 60.0
+
+
+class CDPSession:
+    """Long-lived Playwright CDP connection owned by one event-loop thread."""
+
+    def __init__(self, get_cdp_url: Callable[[], str], call_timeout: float = DEFAULT_CALL_TIMEOUT):
+        """Initialize the session; nothing connects until the first operation.
+
+        Args:
+            get_cdp_url: Returns the browser's CDP URL, e.g. from the sandbox browser info endpoint
+            call_timeout: Seconds an operation may take before it is cancelled
+        """
+        self._get_cdp_url = get_cdp_url
+        self.call_timeout = call_timeout
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        # Owned by the loop thread
+        self._playwright: Any = None
+        self._browser: Any = None
+        self._context: Any = None
+        self._page: Any = None
+        self.connects = 0
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="cdp-session", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def _submit(self, coro: Awaitable[Any], timeout: float | None) -> Any:
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    async def _connect(self) -> None:
+        await self._disconnect()
+        if self._playwright is None:
+            from playwright.async_api import async_playwright
+
+            self._playwright = await async_playwright().start()
+        cdp_url = await asyncio.get_running_loop().run_in_executor(None, with_current_context(self._get_cdp_url))
+        self._browser = await self._playwright.chromium.connect_over_cdp(cdp_url)
+        self.connects += 1
+        if self.connects > 1:
+            logger.info(f"Reconnected to the sandbox browser over CDP (connection #{self.connects})")
+        else:
+            logger.debug(f"Connected to the sandbox browser at {cdp_url}")
+
+    async def _disconnect(self) -> None:
+        browser, self._browser, self._context, self._page = self._browser, None, None, None
+        if browser is not None:
+            try:
+                # Disconnects the client; a browser attached over CDP keeps running
+                await browser.close()
+            except Exception as e:
+                logger.debug(f"Ignoring error while disconnecting from the browser: {e}")
+
+    async def _active_page(self) -> Any:
+        """The page DOM operations act on: the first page of the first context, as before."""
+        if self._browser is None or not self._browser.is_connected():
+            await self._connect()
+        contexts = self._browser.contexts
+        if self._context is None or self._context not in contexts:
+            self._context = contexts[0] if contexts else await self._browser.new_context()
+            self._page = None
+        pages = self._context.pages
+        if self._page is None or self._page.is_closed() or not pages or pages[0] is not self._page:
+            self._page = pages[0] if pages else await self._context.new_page()
+        return self._page
+
+    async def _run(self, func: Callable[[Any], Awaitable[Any]], wait_timeout: int) -> Any:
+        try:
+            page = await self._active_page()
+        except Exception as e:
+            # Stale connection (e.g. the browser restarted); the operation has not started, so retry once
+            logger.debug(f"CDP connection unusable ({e}); reconnecting")
+            await self._connect()
+            page = await self._active_page()
+        if wait_timeout > 0:
+            try:
+                await page.wait_for_load_state("domcontentloaded", timeout=wait_timeout)
+            except Exception:
+                # If page is already loaded or timeout, continue anyway
+                pass
+        try:
+            return await func(page)
+        except Exception:
+            if self._browser is None or not self._browser.is_connected():
+                # Not retried: the operation may have had effects; the next one reconnects
+                await self._disconnect()
+            raise
+
+    def run(self, func: Callable[[Any], Awaitable[Any]], wait_timeout: int = 5000) -> Any:
+        """Run an async function on the active page.
+
+        Args:
+            func: Async function that takes a Playwright page and returns a result
+            wait_timeout: Timeout in ms for waiting for page load (use 0 to skip the wait)
+
+        Returns:
+            The function's result
+        """
+        return self._submit(self._run(func, wait_timeout), self.call_timeout)
+
+    def close(self) -> None:
+        """Disconnect from the browser and stop the event-loop thread."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+
+        async def shutdown() -> None:
+            await self._disconnect()
+            if self._playwright is not None:
+                playwright, self._playwright = self._playwright, None
+                await playwright.stop()
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=10)
+        except Exception as e:
+            logger.debug(f"Error while closing the CDP session: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        if not thread.is_alive():
+            loop.close()
+        logger.debug(f"Closed CDP session after {self.connects} connection(s)")
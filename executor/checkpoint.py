@@ -0,0 +1,148 @@
+"""
+Append-only checkpoints of a running task's trajectory.
+
+When a task is killed by the ``--task-timeout`` watchdog, its ``timeout``
+result keeps the trajectory recorded so far. Rewriting the whole trajectory
+every iteration would cost time proportional to its length, so a
+``CheckpointWriter`` appends one JSON line per iteration instead:
+
+- the first line is a header with the task and its recorded config
+- every following line holds what the last iteration added: new conversation
+  messages, execution trace entries and visualization iterations, plus the
+  current iteration count and API cost stats
+
+Screenshots and other base64 images are left out, since they dominate the size
+of a trajectory. When the controller rewrote messages that were already
+checkpointed (e.g. context trimming dropped old turns), the record holds the
+whole conversation instead of the new messages. ``load_checkpoint`` folds the
+lines back into a partial result.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .utils import get_logger
+
+logger = get_logger("checkpoint")
+
+IMAGE_KEYS = frozenset({"image_base64", "screenshot"})
+IMAGE_BLOCK_TYPES = frozenset({"image", "image_url", "input_image"})
+
+
+def without_images(value: Any) -> Any:
+    """Copy of a trajectory value without base64 images, at any depth."""
+    if isinstance(value, dict):
+        return {key: without_images(item) for key, item in value.items() if key not in IMAGE_KEYS}
+    if isinstance(value, list):
+        return [
+            without_images(item)
+            for item in value
+            if not (isinstance(item, dict) and item.get("type") in IMAGE_BLOCK_TYPES)
+        ]
+    return value
+
+
+class CheckpointWriter:
+    """Appends the new part of one task's trajectory to its checkpoint file."""
+
+    def __init__(self, path: Path, header: Dict[str, Any]):
+        """Start a checkpoint, replacing any left over from an earlier run of the task.
+
+        Args:
+            path: Checkpoint file (JSON lines)
+            header: Task fields and recorded config, written once as the first line
+        """
+        self.path = path
+        self._conversation_written = 0
+        self._last_message: Any = None
+        self._trace_written = 0
+        self._iterations_written = 0
+        self._failed = False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._write(header | {"status": "running"}, mode="w")
+
+    def _write(self, record: Dict[str, Any], mode: str = "a") -> None:
+        if self._failed:
+            return
+        try:
+            with open(self.path, mode) as f:
+                f.write(json.dumps(record, default=str) + "\n")
+        except Exception as e:
+            # One warning per task; the task itself must not fail over its checkpoint
+            self._failed = True
+            logger.warning(f"Failed to write checkpoint {self.path}: {e}")
+
+    def _conversation_delta(self, conversation: List[Dict[str, Any]]) -> Dict[str, Any]:
+        start = self._conversation_written
+        if self._last_message is not None:
+            if start > len(conversation) or conversation[start - 1] is not self._last_message:
+                # Earlier messages were replaced or dropped; find where the checkpointed part ends now
+                start = next(
+                    (index + 1 for index, message in enumerate(conversation) if message is self._last_message),
+                    None,
+                )
+        self._conversation_written = len(conversation)
+        self._last_message = conversation[-1] if conversation else None
+        if start is None:
+            return {"conversation": without_images(conversation)}
+        return {"new_messages": without_images(conversation[start:])}
+
+    def append(
+        self,
+        iterations: int,
+        conversation: List[Dict[str, Any]],
+        execution_trace: List[Dict[str, Any]],
+        visualization_iterations: List[Dict[str, Any]],
+        extra: Dict[str, Any] | None = None,
+    ) -> None:
+        """Record what was added since the previous call.
+
+        Args:
+            iterations: Completed iterations
+            conversation: The controller's full message history
+            execution_trace: The sandbox client's full execution history
+            visualization_iterations: All visualization iterations so far
+            extra: Fields that replace earlier values, e.g. ``api_cost_stats``
+        """
+        record = {"iterations": iterations} | self._conversation_delta(conversation)
+        record["new_trace"] = without_images(execution_trace[self._trace_written:])
+        record["new_visualization_iterations"] = without_images(visualization_iterations[self._iterations_written:])
+        self._trace_written = len(execution_trace)
+        self._iterations_written = len(visualization_iterations)
+        self._write(record | (extra or {}))
+
+
+def load_checkpoint(path: Path) -> Dict[str, Any]:
+    """Fold a checkpoint back into a partial result; empty if it is missing or unreadable.
+
+    A truncated last line (the task was killed while writing it) is ignored.
+    """
+    result: Dict[str, Any] = {}
+    conversation: List[Dict[str, Any]] = []
+    execution_trace: List[Dict[str, Any]] = []
+    visualization_iterations: List[Dict[str, Any]] = []
+    try:
+        with open(path, "r") as f:
+            lines = f.readlines()
+    except OSError:
+        return {}
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if "conversation" in record:
+            conversation = record.pop("conversation")
+        conversation.extend(record.pop("new_messages", []))
+        execution_trace.extend(record.pop("new_trace", []))
+        visualization_iterations.extend(record.pop("new_visualization_iterations", []))
+        result |= record
+    if not result:
+        return {}
+    visualization_data = result.pop("visualization_data", {})
+    return result | {
+        "conversation": conversation,
+        "execution_trace": execution_trace,
+        "visualization_data": visualization_data | {"iterations": visualization_iterations},
+    }
@@ -0,0 +1,121 @@
+"""
+Adaptive run-level concurrency control.
+
+Instead of a fixed worker count, the number of tasks allowed to run at once is
+adjusted AIMD-style (additive increase, multiplicative decrease) from the LLM
+call telemetry all workers report: any rate-limit error halves the limit, a
+latency climb well above the best observed latency shrinks it too, and a quiet
+window while the limit is saturated raises it by one.
+"""
+
+import statistics
+import time
+from typing import Any, Dict, List
+
+from .utils import get_logger
+
+logger = get_logger("concurrency")
+
+
+class AIMDConcurrencyGovernor:
+    """Additive-increase / multiplicative-decrease limit on concurrently running tasks."""
+
+    def __init__(
+        self,
+        min_limit: int,
+        max_limit: int,
+        initial_limit: int | None = None,
+        increase: int = 1,
+        decrease_factor: float = 0.5,
+        window: float = 30.0,
+        latency_tolerance: float = 2.0,
+    ):
+        """Initialize the governor.
+
+        Args:
+            min_limit: Lowest number of concurrent tasks
+            max_limit: Highest number of concurrent tasks (the number of workers)
+            initial_limit: Starting limit; defaults to half of max_limit
+            increase: Slots added after a healthy, saturated window
+            decrease_factor: Factor applied to the limit on congestion
+            window: Seconds of telemetry evaluated per adjustment
+            latency_tolerance: Median latency above this multiple of the best window median counts as congestion
+        """
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        if initial_limit is None:
+            initial_limit = max(self.min_limit, self.max_limit // 2)
+        self.limit = min(max(initial_limit, self.min_limit), self.max_limit)
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.window = window
+        self.latency_tolerance = latency_tolerance
+
+        self.baseline_latency: float | None = None
+        self._window_started = time.monotonic()
+        self._latencies: List[float] = []
+        self._rate_limited = 0
+        self._calls = 0
+        self._saturated = False
+
+    def observe(self, event: Dict[str, Any]) -> None:
+        """Feed one telemetry event; non-LLM events are ignored."""
+        if event.get("event") != "llm_call":
+            return
+        self._calls += 1
+        if event.get("outcome") == "rate_limited":
+            self._rate_limited += 1
+        elif event.get("outcome") == "ok" and event.get("latency") is not None:
+            self._latencies.append(float(event["latency"]))
+
+    def _decrease(self, reason: str) -> None:
+        new_limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+        if new_limit != self.limit:
+            logger.info(f"Concurrency {self.limit} -> {new_limit} ({reason})")
+        self.limit = new_limit
+
+    def _reset_window(self, now: float) -> None:
+        self._window_started = now
+        self._latencies = []
+        self._rate_limited = 0
+        self._calls = 0
+        self._saturated = False
+
+    def update(self, in_flight: int, now: float | None = None) -> int:
+        """Re-evaluate the limit and return it.
+
+        Args:
+            in_flight: Number of tasks currently running
+            now: Monotonic timestamp, defaults to ``time.monotonic()``
+
+        Returns:
+            The current concurrency limit
+        """
+        now = time.monotonic() if now is None else now
+        # Only grow when the current limit was actually used, otherwise there is no signal
+        self._saturated = self._saturated or in_flight >= self.limit
+
+        if self._rate_limited:
+            # React to 429s at once and start a fresh window so one burst is only counted once
+            self._decrease(f"{self._rate_limited} rate-limited call(s)")
+            self._reset_window(now)
+            return self.limit
+
+        if now - self._window_started < self.window:
+            return self.limit
+
+        if self._latencies:
+            median = statistics.median(self._latencies)
+            if self.baseline_latency is None or median < self.baseline_latency:
+                self.baseline_latency = median
+            if median > self.baseline_latency * self.latency_tolerance:
+                self._decrease(f"median LLM latency {median:.1f}s vs best {self.baseline_latency:.1f}s")
+                self._reset_window(now)
+                return self.limit
+
+        if self._calls and self._saturated and self.limit < self.max_limit:
+            new_limit = min(self.max_limit, self.limit + self.increase)
+            logger.info(f"Concurrency {self.limit} -> {new_limit} (no rate limiting in the last {self.window:.0f}s)")
+            self.limit = new_limit
+        self._reset_window(now)
+        return self.limit
@@ -0,0 +1,237 @@
+"""
+Warm pool of pre-started sandbox containers.
+
+Keeps started and health-checked sandbox containers per image so a task can
+lease one instead of paying a cold ``docker compose up`` plus the AIO sandbox
+warm-up. Containers are only started for images with announced upcoming tasks
+(``prewarm``), at most ``size`` idle per image, so one-off task images do not
+leave warm containers behind. Containers are never reused across tasks: a
+released container is destroyed in the background.
+"""
+
+import atexit
+import os
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Optional
+
+from .docker_backend import DockerBackendError, DockerCLIBackend
+from .readiness import ReadinessProber
+from .logger import with_current_context
+from .utils import get_logger
+
+logger = get_logger("container_pool")
+
+POOL_LABEL = "cocoa-agent.pool"
+OWNER_PID_LABEL = "cocoa-agent.owner-pid"
+
+
+@dataclass
+class PooledContainer:
+    """A started sandbox container owned by a ContainerPool."""
+
+    name: str
+    image: str
+    host_port: int
+    start_latency: float
+    readiness: Dict[str, Any] = field(default_factory=dict)
+    warm: bool = False
+    started_at: float = field(default_factory=time.time)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://localhost:{self.host_port}"
+
+
+class ContainerPool:
+    """Keeps up to ``size`` healthy sandbox containers warm per image, with lease/return semantics."""
+
+    def __init__(
+        self,
+        size: int = 1,
+        health_timeout: int = 60,
+        max_workers: int = 2,
+        prober: ReadinessProber | None = None,
+        backend=None,
+    ):
+        """Initialize the pool.
+
+        Args:
+            size: Maximum idle containers to keep warm per image
+            health_timeout: Seconds to wait for a new container to answer health checks
+            max_workers: Background threads used to start and destroy containers
+            prober: Readiness prober for new containers (default: all sandbox endpoints)
+            backend: Docker backend used to run and remove containers (default: docker CLI)
+        """
+        self.size = max(0, int(size))
+        self.health_timeout = health_timeout
+        self.prober = prober or ReadinessProber()
+        self.backend = backend or DockerCLIBackend()
+        self._idle: Dict[str, Deque[PooledContainer]] = {}
+        self._starting: Dict[str, int] = {}
+        # Announced leases that have not happened yet, per image
+        self._upcoming: Dict[str, int] = {}
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="container-pool")
+        self._closed = False
+        atexit.register(self.shutdown)
+
+    def _destroy(self, name: str) -> None:
+        try:
+            if self.backend.remove_container(name):
+                logger.debug(f"Removed pooled container {name}")
+        except (subprocess.TimeoutExpired, TimeoutError):
+            logger.warning(f"Timed out removing pooled container {name}")
+        except DockerBackendError as e:
+            logger.warning(f"Failed to remove pooled container {name}: {e}")
+
+    def _start_container(self, image: str) -> Optional[PooledContainer]:
+        """Start one container from ``image`` and block until it is healthy."""
+        name = f"cocoa-pool-{uuid.uuid4().hex[:12]}"
+        started = time.monotonic()
+        try:
+            # Let Docker pick a free host port so pooled containers never collide
+            self.backend.run_container(
+                name,
+                image,
+                labels={POOL_LABEL: "1", OWNER_PID_LABEL: str(os.getpid())},
+            )
+            host_port = self.backend.container_host_port(name)
+            if host_port is None:
+                logger.error(f"Failed to resolve host port for {name}")
+                self._destroy(name)
+                return None
+        except DockerBackendError as e:
+            logger.error(f"Failed to start pooled container from {image}: {e}")
+            self._destroy(name)
+            return None
+        except (subprocess.TimeoutExpired, TimeoutError, ValueError) as e:
+            logger.error(f"Error starting pooled container from {image}: {e}")
+            self._destroy(name)
+            return None
+
+        readiness = self.prober.wait(f"http://localhost:{host_port}", self.health_timeout, container=name)
+        if not readiness.ready:
+            logger.error(
+                f"Pooled container {name} failed to become healthy within {self.health_timeout} seconds: "
+                f"{readiness.reason}"
+            )
+            self._destroy(name)
+            return None
+
+        container = PooledContainer(
+            name=name,
+            image=image,
+            host_port=host_port,
+            start_latency=time.monotonic() - started,
+            readiness=readiness.to_dict(),
+        )
+        logger.info(f"Pooled container {name} ready on port {host_port} ({container.start_latency:.1f}s)")
+        return container
+
+    def _start_into_pool(self, image: str) -> None:
+        container = None
+        try:
+            if not self._closed:
+                container = self._start_container(image)
+        finally:
+            with self._condition:
+                self._starting[image] = self._starting.get(image, 1) - 1
+                if container is not None and not self._closed:
+                    self._idle.setdefault(image, deque()).append(container)
+                    container = None
+                self._condition.notify_all()
+            if container is not None:
+                # Pool was shut down while this container was starting
+                self._destroy(container.name)
+
+    def _schedule_starts(self, image: str, target_idle: int) -> None:
+        """Start containers in the background until idle + starting reaches target_idle."""
+        with self._condition:
+            if self._closed:
+                return
+            have = len(self._idle.get(image, ())) + self._starting.get(image, 0)
+            missing = target_idle - have
+            if missing <= 0:
+                return
+            self._starting[image] = self._starting.get(image, 0) + missing
+        for _ in range(missing):
+            self._executor.submit(with_current_context(self._start_into_pool), image)
+
+    def _target_idle(self, image: str) -> int:
+        """Idle containers to keep for ``image``: one per upcoming lease, at most the pool size."""
+        with self._condition:
+            return min(self._upcoming.get(image, 0), max(self.size, 1))
+
+    def prewarm(self, image: str, count: int = 1) -> None:
+        """Announce upcoming leases of ``image`` and start their containers in the background.
+
+        Args:
+            image: Image tag to warm
+            count: Number of tasks that will lease a container for this image
+        """
+        with self._condition:
+            self._upcoming[image] = self._upcoming.get(image, 0) + max(0, count)
+        self._schedule_starts(image, self._target_idle(image))
+
+    def lease(self, image: str, timeout: float = 60) -> Optional[PooledContainer]:
+        """Take a healthy container for ``image``, starting one if none is warm.
+
+        Args:
+            image: Image tag the container must run
+            timeout: Seconds to wait for an in-flight warm start before starting a new one
+
+        Returns:
+            The leased container, or None if no container could be started
+        """
+        container = None
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            if self._upcoming.get(image, 0) > 0:
+                self._upcoming[image] -= 1
+            while True:
+                idle = self._idle.get(image)
+                if idle:
+                    container = idle.popleft()
+                    container.warm = True
+                    break
+                remaining = deadline - time.monotonic()
+                if self._starting.get(image, 0) <= 0 or remaining <= 0:
+                    break
+                self._condition.wait(timeout=remaining)
+
+        if container is not None:
+            logger.info(f"Leased warm container {container.name} for {image}")
+        else:
+            logger.info(f"No warm container for {image}, starting one")
+            container = self._start_container(image)
+
+        # Other announced tasks for this image may still need a container
+        self._schedule_starts(image, self._target_idle(image))
+        return container
+
+    def release(self, container: PooledContainer) -> None:
+        """Return a leased container; it is destroyed in the background."""
+        if self._closed:
+            self._destroy(container.name)
+            return
+        self._executor.submit(with_current_context(self._destroy), container.name)
+
+    def shutdown(self) -> None:
+        """Destroy all idle containers and stop the background workers."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            idle = [container for queue in self._idle.values() for container in queue]
+            self._idle.clear()
+            self._condition.notify_all()
+        for container in idle:
+            self._destroy(container.name)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        logger.debug("Container pool shut down")
@@ -0,0 +1,319 @@
+"""
+Token-budgeted context window management for agent histories.
+
+``BaseLLM.messages`` grows with every iteration and is resent in full on each
+call. A ``ContextManager`` keeps it under a per-model token budget by applying
+reduction strategies to older messages, oldest first, until the history fits
+a low-water mark below the budget:
+
+- ``elide_tool_outputs``: shorten old tool results to a head plus a stub
+- ``strip_images``: replace old images with a text placeholder
+- ``truncate_text``: shorten any other long text in old messages
+- ``drop_turns``: drop whole old assistant turns (with their tool results)
+
+The task prompt (the first user message and any system messages before it)
+and the most recent messages are never touched. Messages are replaced, not
+edited in place, so per-message conversion caches notice the change. Trimming
+down to the low-water mark instead of the budget keeps the trimmed prefix
+stable for several calls, which keeps provider prompt caches useful.
+"""
+
+import re
+from typing import Any, Callable, Dict, List
+
+from .token_estimator import TokenEstimator
+from .utils import get_logger
+
+logger = get_logger("context")
+
+DEFAULT_STRATEGIES = ("elide_tool_outputs", "strip_images", "truncate_text", "drop_turns")
+
+IMAGE_PLACEHOLDER = "[image removed to fit the context budget]"
+
+GAP_NOTE = "[{count} earlier messages were removed to fit the context budget]"
+_GAP_NOTE_PATTERN = re.compile(r"\[(\d+) earlier messages were removed to fit the context budget\]$")
+
+
+def _elision_stub(removed_chars: int) -> str:
+    return f"\n[... {removed_chars} characters elided to fit the context budget ...]"
+
+
+def _shorten(text: str, limit: int) -> str | None:
+    """Return ``text`` cut to ``limit`` characters plus a stub, or None if it is short enough."""
+    if not isinstance(text, str) or len(text) <= limit + 100:
+        return None
+    return text[:limit] + _elision_stub(len(text) - limit)
+
+
+def is_tool_output(message: Dict[str, Any]) -> bool:
+    """Whether a message carries tool results, in any provider's history format."""
+    role = message.get("role")
+    content = message.get("content")
+    if role == "tool":
+        return True
+    if isinstance(content, list):
+        return any(isinstance(block, dict) and block.get("type") == "tool_result" for block in content)
+    # GeminiLLM.add_tool_message stores results as model text
+    return role == "model" and isinstance(content, str) and content.startswith("Tool call ")
+
+
+def _shorten_content(content: Any, limit: int) -> Any | None:
+    """Shorten every long text in a message content (string or block list); None if nothing changed."""
+    if isinstance(content, str):
+        return _shorten(content, limit)
+    if not isinstance(content, list):
+        return None
+    changed = False
+    new_content = []
+    for block in content:
+        new_block = block
+        if isinstance(block, dict):
+            if isinstance(block.get("text"), str):
+                shortened = _shorten(block["text"], limit)
+                if shortened is not None:
+                    new_block = {**block, "text": shortened}
+            elif block.get("type") == "tool_result":
+                shortened = _shorten_content(block.get("content"), limit)
+                if shortened is not None:
+                    new_block = {**block, "content": shortened}
+        changed = changed or new_block is not block
+        new_content.append(new_block)
+    return new_content if changed else None
+
+
+def _is_turn_start(message: Dict[str, Any]) -> bool:
+    """Whether a message opens a model turn (OpenAI/Claude "assistant", Gemini "model")."""
+    return message.get("role") in ("assistant", "model") and not is_tool_output(message)
+
+
+def _with_gap_note(message: Dict[str, Any], removed: int) -> Dict[str, Any]:
+    """Copy of a user message with a note about ``removed`` dropped messages appended.
+
+    A note left by an earlier drop is replaced by one with the combined count.
+    """
+    content = message.get("content")
+    if isinstance(content, list):
+        text_type = next((block["type"] for block in content if isinstance(block, dict) and "text" in block), "text")
+        last = content[-1] if content else None
+        match = _GAP_NOTE_PATTERN.fullmatch(last.get("text", "")) if isinstance(last, dict) else None
+        if match:
+            content = content[:-1]
+            removed += int(match.group(1))
+        return {**message, "content": content + [{"type": text_type, "text": GAP_NOTE.format(count=removed)}]}
+    text = content if isinstance(content, str) else ""
+    match = _GAP_NOTE_PATTERN.search(text)
+    if match:
+        text = text[: match.start()].rstrip("\n")
+        removed += int(match.group(1))
+    separator = "\n\n" if text else ""
+    return {**message, "content": text + separator + GAP_NOTE.format(count=removed)}
+
+
+def _is_image_block(block: Any) -> bool:
+    return isinstance(block, dict) and block.get("type") in ("image_url", "image", "input_image")
+
+
+def elide_tool_outputs(manager: "ContextManager", message: Dict[str, Any]) -> Dict[str, Any] | None:
+    """Shorten a tool result message to ``stub_chars``."""
+    if not is_tool_output(message):
+        return None
+    content = _shorten_content(message.get("content"), manager.stub_chars)
+    return None if content is None else {**message, "content": content}
+
+
+def strip_images(manager: "ContextManager", message: Dict[str, Any]) -> Dict[str, Any] | None:
+    """Replace the images of a message with a text placeholder."""
+    content = message.get("content")
+    if not isinstance(content, list) or not any(_is_image_block(block) for block in content):
+        return None
+    new_content = [block for block in content if not _is_image_block(block)]
+    new_content.append({"type": "text", "text": IMAGE_PLACEHOLDER})
+    return {**message, "content": new_content}
+
+
+def truncate_text(manager: "ContextManager", message: Dict[str, Any]) -> Dict[str, Any] | None:
+    """Shorten any long text in a message."""
+    content = _shorten_content(message.get("content"), manager.stub_chars)
+    return None if content is None else {**message, "content": content}
+
+
+MessageStrategy = Callable[["ContextManager", Dict[str, Any]], Dict[str, Any] | None]
+
+# Strategies that rewrite one message at a time; "drop_turns" works on whole turns
+MESSAGE_STRATEGIES: Dict[str, MessageStrategy] = {
+    "elide_tool_outputs": elide_tool_outputs,
+    "strip_images": strip_images,
+    "truncate_text": truncate_text,
+}
+
+
+class ContextManager:
+    """Keeps a message history under a token budget."""
+
+    def __init__(
+        self,
+        max_tokens: int,
+        keep_recent: int = 8,
+        stub_chars: int = 400,
+        low_water: float = 0.8,
+        strategies: List[str] | tuple = DEFAULT_STRATEGIES,
+        estimator: Callable[[List[Dict[str, Any]]], int] | None = None,
+    ):
+        """Initialize the manager.
+
+        Args:
+            max_tokens: Token budget for the whole history
+            keep_recent: Number of most recent messages never modified
+            stub_chars: Characters kept from each shortened text
+            low_water: Fraction of max_tokens to trim down to once the budget is exceeded
+            strategies: Reduction strategies in the order they are applied
+            estimator: Returns the estimated tokens of a message list; defaults to an OpenAI-family ``TokenEstimator``
+        """
+        unknown = [name for name in strategies if name not in MESSAGE_STRATEGIES and name != "drop_turns"]
+        if unknown:
+            raise ValueError(f"Unknown context strategies: {unknown}")
+        self.max_tokens = int(max_tokens)
+        self.keep_recent = max(1, int(keep_recent))
+        self.stub_chars = int(stub_chars)
+        self.low_water = low_water
+        self.strategies = list(strategies)
+        self.estimator = estimator or TokenEstimator()
+
+    @classmethod
+    def from_config(cls, llm_config: Dict[str, Any], model: str, **kwargs: Any) -> "ContextManager | None":
+        """Build a manager from ``controller.args.context_window``, or None if no budget applies.
+
+        ``max_tokens`` is either a number or a mapping of model names to budgets
+        with an optional ``"default"`` entry.
+        """
+        window_config = llm_config.get("context_window") or {}
+        max_tokens = window_config.get("max_tokens")
+        if isinstance(max_tokens, dict):
+            max_tokens = max_tokens.get(model) or max_tokens.get("default")
+        if not max_tokens:
+            return None
+        return cls(
+            max_tokens=max_tokens,
+            keep_recent=window_config.get("keep_recent", 8),
+            stub_chars=window_config.get("stub_chars", 400),
+            low_water=window_config.get("low_water", 0.8),
+            strategies=window_config.get("strategies", DEFAULT_STRATEGIES),
+            **kwargs,
+        )
+
+    @staticmethod
+    def _pinned_prefix(messages: List[Dict[str, Any]]) -> int:
+        """Number of leading messages that hold the task prompt."""
+        for index, message in enumerate(messages):
+            if message.get("role") == "user":
+                return index + 1
+        return 0
+
+    def fit(self, messages: List[Dict[str, Any]]) -> List[str]:
+        """Trim ``messages`` in place until it fits the budget.
+
+        Args:
+            messages: Provider message history; modified in place
+
+        Returns:
+            Human-readable descriptions of what was removed (empty if nothing was)
+        """
+        sizes = [self.estimator([message]) for message in messages]
+        total = sum(sizes)
+        if total <= self.max_tokens:
+            return []
+
+        target = int(self.max_tokens * self.low_water)
+        start = self._pinned_prefix(messages)
+        end = max(start, len(messages) - self.keep_recent)
+        dropped: List[str] = []
+
+        for name in self.strategies:
+            if total <= target:
+                break
+            if name == "drop_turns":
+                total, turns = self._drop_turns(messages, sizes, start, end, total, target)
+                if turns:
+                    dropped.append(f"dropped {turns} old turn(s)")
+                end = max(start, len(messages) - self.keep_recent)
+                continue
+
+            strategy = MESSAGE_STRATEGIES[name]
+            changed = 0
+            saved = 0
+            for index in range(start, end):
+                if total <= target:
+                    break
+                replacement = strategy(self, messages[index])
+                if replacement is None:
+                    continue
+                new_size = self.estimator([replacement])
+                messages[index] = replacement
+                saved += sizes[index] - new_size
+                total -= sizes[index] - new_size
+                sizes[index] = new_size
+                changed += 1
+            if changed:
+                dropped.append(f"{name}: {changed} message(s), ~{saved} tokens")
+
+        if total > self.max_tokens:
+            logger.warning(
+                f"History still ~{total} tokens after trimming (budget {self.max_tokens}); "
+                f"the last {self.keep_recent} messages and the task prompt are never trimmed"
+            )
+        return dropped
+
+    def _drop_turns(
+        self,
+        messages: List[Dict[str, Any]],
+        sizes: List[int],
+        start: int,
+        end: int,
+        total: int,
+        target: int,
+    ) -> tuple[int, int]:
+        """Remove whole assistant turns between ``start`` and ``end``, oldest first.
+
+        A turn is an assistant (or Gemini "model") message plus the tool results
+        and prompts that follow it, so tool calls and their results are always
+        removed together. A note about the gap is appended to the user message
+        before it (usually the task prompt), so no two user messages end up
+        next to each other; a placeholder user message is inserted only when
+        the gap follows a tool result.
+        """
+        # Turn boundaries: model turns in the droppable range
+        boundaries = [index for index in range(start, end) if _is_turn_start(messages[index])]
+        if not boundaries:
+            return total, 0
+        drop_from = boundaries[0]
+        drop_to = drop_from
+        turns = 0
+        removed = 0
+        for position, turn_start in enumerate(boundaries):
+            turn_end = boundaries[position + 1] if position + 1 < len(boundaries) else end
+            # The last droppable turn must end before the kept tail starts with a non-assistant message
+            if turn_end == end and end < len(messages) and not _is_turn_start(messages[end]):
+                break
+            if total - removed <= target:
+                break
+            removed += sum(sizes[turn_start:turn_end])
+            drop_to = turn_end
+            turns += 1
+        if not turns:
+            return total, 0
+
+        previous = drop_from - 1
+        if previous >= 0 and messages[previous].get("role") == "user":
+            del messages[drop_from:drop_to]
+            del sizes[drop_from:drop_to]
+            messages[previous] = _with_gap_note(messages[previous], drop_to - drop_from)
+            new_size = self.estimator([messages[previous]])
+            total += new_size - sizes[previous]
+            sizes[previous] = new_size
+            return total - removed, turns
+
+        placeholder = {"role": "user", "content": GAP_NOTE.format(count=drop_to - drop_from)}
+        messages[drop_from:drop_to] = [placeholder]
+        placeholder_size = self.estimator([placeholder])
+        sizes[drop_from:drop_to] = [placeholder_size]
+        return total - removed + placeholder_size, turns
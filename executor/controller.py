@@ -11,10 +11,35 @@ import re
 import json
 import time
 import base64
-from typing import Any, Dict, List
+import statistics
+import threading
+from concurrent.futures import wait
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List
 from openai import OpenAI
+from openai.types.chat import ChatCompletion
 from .utils import get_logger, colorize
+from .context_manager import ContextManager
+from .endpoints import EndpointPool, resolve_base_urls
+from .hedging import DUPLICATE, ApiAttempt, HedgePolicy, LatencyHistogram, RequestCancelled, latency_histogram, run_hedged
+from .rate_limit import RateLimiter
+from .response_cache import ResponseCache, ResponseCacheMiss
+from .retry import RATE_LIMITED, RetryPolicy, classify_error, error_status_code
+from .streaming import ChatToolCallAccumulator, StreamMonitor
+from .telemetry import record_event
+from .token_estimator import TokenEstimator, provider_family
 from .tools import get_browser_tools, get_unified_tools, map_tool_call_to_action
+from .tool_schemas import (
+    compile_tools,
+    format_tools_as_text,
+    get_toolset,
+    sanitize_gemini_parameters,
+    to_claude_tools,
+    to_gemini_tools,
+    to_responses_tools,
+    tool_schema_hash,
+)
 
 # Try to import Gemini libraries
 try:
@@ -75,6 +100,8 @@ class CostTracker:
     """Provider-specific token parsing + USD cost calculation."""
 
     TOKENS_PER_MILLION = 1_000_000
+    # Prompts above this size are billed at the "*_over_200k" prices where a model has them
+    LONG_CONTEXT_THRESHOLD = 200_000
 
     @staticmethod
     def _norm_model(model_name: str) -> str:
@@ -108,6 +135,105 @@ class CostTracker:
             raise KeyError(f"No pricing configured for model: {model_name}")
         return pricing
 
+    @classmethod
+    def is_long_context(cls, model_name: str, prompt_tokens: int) -> bool:
+        """Whether a prompt of ``prompt_tokens`` falls into the model's long-context pricing tier."""
+        pricing = MODEL_PRICING_REGISTRY.get(cls._norm_model(model_name)) or {}
+        return "input_over_200k" in pricing and prompt_tokens > cls.LONG_CONTEXT_THRESHOLD
+
+    @classmethod
+    def estimate_cost(
+        cls,
+        model_name: str,
+        input_tokens: float,
+        output_tokens: float,
+        cached_input_tokens: float = 0,
+        prompt_tokens_per_call: float | None = None,
+    ) -> float | None:
+        """Approximate USD cost of token counts that have not been billed yet.
+
+        Args:
+            model_name: Model name from MODEL_PRICING_REGISTRY
+            input_tokens: Prompt tokens, including cached ones
+            output_tokens: Completion tokens
+            cached_input_tokens: Share of input_tokens served from the prompt cache
+            prompt_tokens_per_call: Prompt size of a single call, for tiered pricing (default: input_tokens)
+
+        Returns:
+            Cost in USD, or None if the model has no pricing
+        """
+        pricing = MODEL_PRICING_REGISTRY.get(cls._norm_model(model_name))
+        if not pricing:
+            return None
+        per_call = input_tokens if prompt_tokens_per_call is None else prompt_tokens_per_call
+        suffix = "_over_200k" if cls.is_long_context(model_name, per_call) else ""
+        input_price = float(pricing.get(f"input{suffix}", pricing["input"]))
+        cached_price = pricing.get(f"cached_input{suffix}", pricing.get("cached_input", pricing.get("cache_read", pricing["input"])))
+        output_price = float(pricing.get(f"output{suffix}", pricing["output"]))
+        cached_input_tokens = min(cached_input_tokens, input_tokens)
+        return (
+            (input_tokens - cached_input_tokens) * input_price
+            + cached_input_tokens * float(cached_price)
+            + output_tokens * output_price
+        ) / cls.TOKENS_PER_MILLION
+
+    @classmethod
+    def forecast_task_cost(
+        cls,
+        model_name: str,
+        instruction_tokens: int,
+        history: List[Dict[str, Any]],
+    ) -> Dict[str, Any] | None:
+        """Predict the cost of a task from its instruction and earlier results of the same model.
+
+        The prompt of each call is modelled as the instruction plus the median
+        history the model accumulated per call in earlier tasks; calls, output
+        per call and the cached share are taken from those tasks as well.
+
+        Args:
+            model_name: Model that will run the task
+            instruction_tokens: Estimated tokens of the task instruction
+            history: Result summaries (see ``executor.result_index.summarize_result``)
+
+        Returns:
+            Forecast with ``predicted_cost_usd``, ``calls`` and ``based_on`` (number of
+            earlier tasks), or None if there are no usable earlier results or no pricing
+        """
+        model_name = cls._norm_model(model_name)
+        samples = [
+            entry for entry in history
+            if cls._norm_model(entry.get("model")) == model_name
+            and entry.get("status") not in ("error", "timeout")
+            and entry.get("api_calls")
+        ]
+        if not samples or model_name not in MODEL_PRICING_REGISTRY:
+            return None
+
+        calls = statistics.median(entry["api_calls"] for entry in samples)
+        context_per_call = statistics.median(
+            max(0.0, entry.get("total_input_tokens", 0) / entry["api_calls"] - entry.get("instruction_tokens", 0))
+            for entry in samples
+        )
+        output_per_call = statistics.median(entry.get("total_output_tokens", 0) / entry["api_calls"] for entry in samples)
+        total_input = sum(entry.get("total_input_tokens", 0) for entry in samples)
+        cached_share = sum(entry.get("total_cached_tokens", 0) for entry in samples) / total_input if total_input else 0.0
+
+        prompt_per_call = instruction_tokens + context_per_call
+        predicted = cls.estimate_cost(
+            model_name,
+            input_tokens=calls * prompt_per_call,
+            output_tokens=calls * output_per_call,
+            cached_input_tokens=calls * prompt_per_call * cached_share,
+            prompt_tokens_per_call=prompt_per_call,
+        )
+        return {
+            "model": model_name,
+            "predicted_cost_usd": predicted,
+            "calls": calls,
+            "prompt_tokens_per_call": round(prompt_per_call),
+            "based_on": len(samples),
+        }
+
     @classmethod
     def track_openai(cls, usage: Any, model_name: str) -> Dict[str, Any] | None:
         if not cls.supports_openai(model_name):
@@ -181,6 +307,9 @@ class CostTracker:
         cost_cache_read_usd = (cache_read_tokens / cls.TOKENS_PER_MILLION) * float(pricing["cache_read"])
         cost_output_usd = (output_tokens / cls.TOKENS_PER_MILLION) * float(pricing["output"])
         total_cost_usd = cost_input_usd + cost_cache_write_usd + cost_cache_read_usd + cost_output_usd
+        # Share of the prompt served from the prompt cache
+        prompt_tokens = input_tokens + cache_write_tokens + cache_read_tokens
+        cache_hit_ratio = cache_read_tokens / prompt_tokens if prompt_tokens else 0.0
 
         return {
             "provider": "anthropic",
@@ -191,6 +320,7 @@ class CostTracker:
                 "cache_read_input_tokens": cache_read_tokens,
                 "output_tokens": output_tokens,
             },
+            "cache_hit_ratio": cache_hit_ratio,
             "cost_breakdown_usd": {
                 "input_usd": cost_input_usd,
                 "cache_write_usd": cost_cache_write_usd,
@@ -201,7 +331,12 @@ class CostTracker:
         }
 
     @classmethod
-    def track_gemini(cls, response: Any, model_name: str) -> Dict[str, Any] | None:
+    def track_gemini(cls, response: Any, model_name: str, estimated_prompt_tokens: int | None = None) -> Dict[str, Any] | None:
+        """Price a Gemini response.
+
+        ``estimated_prompt_tokens`` (from ``TokenEstimator``) decides the pricing
+        tier when the response does not report its prompt size.
+        """
         if not cls.supports_gemini(model_name):
             return None
         pricing = cls.get_pricing(model_name)
@@ -228,7 +363,7 @@ class CostTracker:
         output_tokens = int(candidates_token_count or 0)
 
         # Tiered pricing: >200K context tokens uses the higher tier
-        over_200k = prompt_tokens > 200_000
+        over_200k = cls.is_long_context(model_name, prompt_tokens or estimated_prompt_tokens or 0)
         input_price = float(pricing.get("input_over_200k", pricing["input"]) if over_200k else pricing["input"])
         cached_price = float(pricing.get("cached_input_over_200k", pricing["cached_input"]) if over_200k else pricing["cached_input"])
         output_price = float(pricing.get("output_over_200k", pricing["output"]) if over_200k else pricing["output"])
@@ -257,55 +392,6 @@ class CostTracker:
         }
 
 
-def format_tools_as_text(tools: List[Dict[str, Any]]) -> str:
-    """Convert OpenAI tool schema to text description for Qwen3-VL models.
-    
-    Args:
-        tools: List of tool definitions in OpenAI format
-        
-    Returns:
-        Formatted text description of all tools
-    """
-    tool_descriptions = []
-    
-    for tool in tools:
-        func = tool.get("function", {})
-        name = func.get("name", "")
-        description = func.get("description", "")
-        parameters = func.get("parameters", {})
-        properties = parameters.get("properties", {})
-        required = parameters.get("required", [])
-        
-        # Build parameter descriptions
-        param_descriptions = []
-        for param_name, param_info in properties.items():
-            param_type = param_info.get("type", "string")
-            param_desc = param_info.get("description", "")
-            param_enum = param_info.get("enum")
-            param_default = param_info.get("default")
-            
-            param_str = f"  - {param_name} ({param_type})"
-            if param_desc:
-                param_str += f": {param_desc}"
-            if param_enum:
-                param_str += f" [options: {', '.join(map(str, param_enum))}]"
-            if param_default is not None:
-                param_str += f" [default: {param_default}]"
-            if param_name in required:
-                param_str += " [required]"
-            
-            param_descriptions.append(param_str)
-        
-        # Format tool description
-        tool_text = f"- {name}: {description}"
-        if param_descriptions:
-            tool_text += "\n" + "\n".join(param_descriptions)
-        
-        tool_descriptions.append(tool_text)
-    
-    return "\n\n".join(tool_descriptions)
-
-
 # Unified agent prompts
 UNIFIED_INITIAL_PROMPT_TEMPLATE = """
 You are a powerful AI agent with access to a comprehensive sandbox environment. You can control a web browser, execute shell commands, manipulate files, and run Python code to solve complex, multi-domain tasks.
@@ -1047,24 +1133,76 @@ class BaseLLM(Controller):
         self.client_type = client_type
         self.use_tools = client_type in ["browser", "file", "code", "jupyter", "shell", "unified"]
         self.max_parse_retries = max(1, int(llm_config.get("max_parse_retries", 5)))
+        # Transport failures are retried per API call by the retry policy, parse failures by max_parse_retries
+        self.retry_policy = RetryPolicy.from_config(llm_config.get("retry"))
+        self._last_api_error: BaseException | None = None
+
+        # Shared client-side rate limiter; built on first use because subclasses finalize self.model
+        self._rate_limit_config = llm_config
+        self._rate_limit_api_key = llm_config.get("api_key") or kwargs.get("api_key") or ""
+        self._rate_limiter: RateLimiter | None = None
+        self._rate_limiter_ready = False
+        # (tokens charged, token usage when charged) of the last call not yet settled
+        self._rate_limit_pending: tuple[int, int] | None = None
+
+        # Offline prompt size estimates for rate limiting, context trimming and pricing tiers
+        self.token_estimator = TokenEstimator(provider_family(type(self).__name__))
+        self._last_prompt_estimate: int | None = None
+
+        # Streaming (controller.args.streaming); the executor sets on_tool_call to start complete tool calls early
+        self.streaming = bool(llm_config.get("streaming", False))
+        self.early_dispatch = self.streaming and bool(llm_config.get("early_dispatch", True))
+        self.on_tool_call: Callable[[Dict[str, Any]], None] | None = None
+        self._early_dispatch_blocked = False
+        self.per_call_timings: list = []
+
+        # The ApiAttempt a thread is making; requests run on helper threads when they are hedged
+        self._thread_state = threading.local()
+        self._default_client: Any = None
+
+        # Hedged requests (controller.args.hedging); histogram and alternate-key client are built on first use
+        self._hedge_policy = HedgePolicy.from_config(llm_config)
+        self._latency_histogram: LatencyHistogram | None = None
+        self._hedge_client: Any = None
+        self._hedge_client_ready = False
+        # (cost generation, attempt, future, tokens charged to the rate limiter) of requests that lost a
+        # hedge race, accounted on the main thread once done
+        self._hedge_losers: list = []
+        # Tokens accounted for hedge losers; kept out of the usage the winner's rate-limit charge is settled against
+        self._hedge_loser_tokens = 0
+        self._cost_generation = 0
+        # (response, hedge record) of the last hedged call, tagged onto its per_call_costs entry
+        self._last_hedge: tuple | None = None
+        self.hedged_api_calls: int = 0
+        self.hedge_wins: int = 0
+
+        # Record/replay store for provider responses (controller.args.response_cache)
+        self._response_cache = ResponseCache.from_config(llm_config)
+        self.replayed_api_calls: int = 0
+
+        # Token-budgeted history trimming (controller.args.context_window); built on first use like the rate limiter
+        self._context_manager: ContextManager | None = None
+        self._context_manager_ready = False
         
-        # Load appropriate tools based on client type
-        if self.use_tools:
-            from .tools import get_browser_tools, get_file_tools, get_code_tools, get_shell_tools, get_unified_tools
-            if client_type == "unified":
-                self.tools = get_unified_tools()
-            elif client_type == "browser":
-                self.tools = get_browser_tools()
-            elif client_type == "file":
-                self.tools = get_file_tools()
-            elif client_type == "code" or client_type == "jupyter":
-                self.tools = get_code_tools()
-            elif client_type == "shell":
-                self.tools = get_shell_tools()
-            else:
-                self.tools = None
-        else:
-            self.tools = None
+        # Tool definitions are shared by all controllers; see executor.tool_schemas
+        self.tools = get_toolset(client_type) if self.use_tools else None
+        # Provider format the tools are sent in, used for the schema hash
+        self.tool_schema_format = "openai"
+
+    @property
+    def client(self) -> Any:
+        """Provider client; while a request is made, the one chosen for that request."""
+        attempt = self._current_attempt()
+        if attempt is not None and attempt.client is not None:
+            return attempt.client
+        return self._default_client
+
+    @client.setter
+    def client(self, client: Any) -> None:
+        self._default_client = client
+
+    def _current_attempt(self) -> ApiAttempt | None:
+        return getattr(self._thread_state, "attempt", None)
     
     def _prepare_message_content(self, prompt: str, images_base64: list = None) -> Any:
         """Prepare message content from prompt and images.
@@ -1161,6 +1299,8 @@ class BaseLLM(Controller):
         # Prepare message content
         message_content = self._prepare_message_content(prompt, images_base64)
         self.messages.append({"role": "user", "content": message_content})
+        # Only the first response to a prompt may start actions early; re-asks replace a rejected response
+        self._early_dispatch_blocked = False
         
         attempt = 0
         max_attempts = self.max_parse_retries
@@ -1171,38 +1311,394 @@ class BaseLLM(Controller):
             
             try:
                 # Call provider-specific API
-                response = self._make_api_call()
+                response = self._invoke_api()
                 
                 # Handle response (provider-specific)
                 parsed_response = self._handle_api_response(response, attempt, max_attempts)
+                self._settle_rate_limit()
                 
                 # Cleanup old images after successful call
                 self._cleanup_old_user_message_images()
                 
                 return parsed_response
             except Exception as e:
-                logger.error(f"Error calling LLM API: {e}")
-                # Don't retry deterministic client errors (4xx except 429)
-                status_code = getattr(e, "status_code", None)
-                if status_code is not None and 400 <= status_code < 500 and status_code != 429:
-                    logger.error(f"Non-retryable client error (HTTP {status_code}), raising immediately")
+                if e is self._last_api_error:
+                    # The API call itself failed and _invoke_api already exhausted its retry policy
+                    logger.error(f"Error calling LLM API: {e}")
                     raise
+                logger.error(f"Error handling LLM response: {e}")
                 if attempt >= max_attempts:
                     raise
-                sleep_time = min(30 * attempt, 120)
-                logger.info(f"Retrying in {sleep_time}s (attempt {attempt}/{max_attempts})...")
-                time.sleep(sleep_time)
+                logger.info(f"Asking again (attempt {attempt}/{max_attempts})...")
                 continue
         
         raise ValueError("Failed to obtain a valid action after retrying LLM response parsing.")
     
-    def _make_api_call(self) -> Any:
-        """Make the actual API call. Must be implemented by subclasses.
-        
+    def get_tool_schema_hash(self) -> str:
+        """Stable hash of the tool schema this controller sends, e.g. for cache keys."""
+        return tool_schema_hash(self.tools, self.tool_schema_format)
+
+    def _get_rate_limiter(self) -> RateLimiter | None:
+        if not self._rate_limiter_ready:
+            self._rate_limiter = RateLimiter.from_config(
+                self._rate_limit_config, type(self).__name__, self.model, self._rate_limit_api_key
+            )
+            self._rate_limiter_ready = True
+            if self._rate_limiter is not None:
+                logger.info(
+                    f"Rate limiting {self.model}: {self._rate_limiter.requests_per_minute or '-'} req/min, "
+                    f"{self._rate_limiter.tokens_per_minute or '-'} tokens/min"
+                )
+        return self._rate_limiter
+
+    def _settle_rate_limit(self) -> None:
+        """Replace the token estimate charged for the last call with its real usage."""
+        if self._rate_limit_pending is None or self._rate_limiter is None:
+            return
+        charged, usage_before = self._rate_limit_pending
+        self._rate_limit_pending = None
+        used = self._usage_tokens() - usage_before
+        self._rate_limiter.settle(used - charged)
+
+    def _usage_tokens(self) -> int:
+        """Tokens used by this controller's own calls, for settling rate-limit charges."""
+        return self.total_input_tokens + self.total_output_tokens - self._hedge_loser_tokens
+
+    def _get_context_manager(self) -> ContextManager | None:
+        if not self._context_manager_ready:
+            self._context_manager = ContextManager.from_config(
+                self._rate_limit_config, self.model, estimator=self.token_estimator
+            )
+            self._context_manager_ready = True
+            if self._context_manager is not None:
+                logger.info(f"Context window budget for {self.model}: {self._context_manager.max_tokens} tokens")
+        return self._context_manager
+
+    def _fit_context_window(self) -> None:
+        """Trim old messages so the history fits the configured token budget."""
+        context_manager = self._get_context_manager()
+        if context_manager is None:
+            return
+        dropped = context_manager.fit(self.messages)
+        if dropped:
+            logger.info(f"Trimmed history of {self.model} to fit the context budget: {'; '.join(dropped)}")
+
+    def estimate_prompt_tokens(self) -> int:
+        """Estimate the prompt tokens the next call sends (history plus tool schemas)."""
+        return self.token_estimator.count_messages(self.messages) + self.token_estimator.count_tools(self.tools)
+
+    def _begin_stream(self) -> StreamMonitor:
+        """Start timing a streamed call; complete tool calls go to ``on_tool_call`` if early dispatch is on."""
+        on_tool_call = self.on_tool_call if self.early_dispatch and not self._early_dispatch_blocked else None
+        attempt = self._current_attempt()
+        monitor = StreamMonitor(
+            lambda tool_call: self.parse_tool_calls_list([tool_call]),
+            on_tool_call,
+            check_cancelled=attempt.check_cancelled if attempt is not None else None,
+        )
+        if attempt is not None:
+            attempt.attach_monitor(monitor)
+        return monitor
+
+    def _sampling_params(self) -> Dict[str, Any]:
+        """Request parameters besides model, messages and tools that shape the response.
+
+        Part of the response cache key; subclasses add what their ``_prepare_api_call`` sends.
+        """
+        return {}
+
+    def _response_cache_key(self) -> str:
+        return self._response_cache.make_key(
+            type(self).__name__,
+            self.model,
+            self.messages,
+            self.get_tool_schema_hash() if self.use_tools and self.tools else None,
+            self._sampling_params(),
+        )
+
+    def _invoke_api(self) -> Any:
+        """Make one provider API call and report its outcome to the run telemetry.
+
+        All API calls, including re-asks from ``_handle_api_response``, go through here.
+        The history is first trimmed to the context budget, if one is configured.
+        With a response cache, recorded responses are replayed without calling the
+        provider and live responses are recorded.
+        If a rate limit is configured for the model, each attempt first waits for quota.
+        With hedging, a slow attempt is raced against a duplicate request.
+        Failed attempts are retried according to ``self.retry_policy``.
+
+        Returns:
+            API response object
+
+        Raises:
+            ResponseCacheMiss: In replay mode when the request was never recorded
+            Exception: The last provider error once the retry policy gives up
+        """
+        self._account_hedge_losers()
+        self._fit_context_window()
+        estimate = self.estimate_prompt_tokens()
+        self._last_prompt_estimate = estimate
+        if CostTracker.is_long_context(self.model, estimate):
+            logger.warning(
+                f"Prompt for {self.model} is ~{estimate} tokens and will be billed at the >200k tier; "
+                f"set controller.args.context_window to stay below it"
+            )
+
+        cache_key = None
+        if self._response_cache is not None:
+            cache_key = self._response_cache_key()
+            try:
+                cached_response = self._response_cache.lookup(cache_key)
+            except ResponseCacheMiss as e:
+                # Not a provider error: retrying cannot help
+                self._last_api_error = e
+                raise
+            if cached_response is not None:
+                self._early_dispatch_blocked = True
+                self.replayed_api_calls += 1
+                logger.debug(f"Replaying recorded response {cache_key[:16]} for {self.model}")
+                return cached_response
+
+        rate_limiter = self._get_rate_limiter()
+        retry_state = self.retry_policy.begin()
+        while True:
+            if rate_limiter is not None:
+                self._settle_rate_limit()
+                rate_limiter.acquire(estimate)
+                self._rate_limit_pending = (estimate, self._usage_tokens())
+
+            started = time.monotonic()
+            attempt = ApiAttempt()
+            attempt.prompt_tokens = estimate
+            try:
+                response, winner = self._call_provider(attempt)
+            except Exception as e:
+                kind = classify_error(e)
+                if attempt.monitor is not None and attempt.monitor.dispatched:
+                    # Those actions already ran; a retried response must not start them a second time
+                    self._early_dispatch_blocked = True
+                    logger.warning(
+                        f"Stream from {self.model} failed after {attempt.monitor.dispatched} action(s) started early"
+                    )
+                record_event(
+                    "llm_call",
+                    model=self.model,
+                    latency=time.monotonic() - started,
+                    outcome="rate_limited" if kind == RATE_LIMITED else "error",
+                    error_kind=kind,
+                    status_code=error_status_code(e),
+                )
+                delay = retry_state.next_delay(e)
+                if delay is None:
+                    logger.error(f"Giving up on {self.model} after {retry_state.attempts} attempt(s) ({kind}): {e}")
+                    self._last_api_error = e
+                    raise
+                logger.warning(
+                    f"API call to {self.model} failed ({kind}): {e}. "
+                    f"Retrying in {delay:.1f}s (attempt {retry_state.attempts}/{self.retry_policy.max_attempts})"
+                )
+                time.sleep(delay)
+                continue
+            # Any later call for the same prompt is a re-ask
+            self._early_dispatch_blocked = True
+            if self._latency_histogram is not None:
+                self._latency_histogram.add(time.monotonic() - winner.started)
+            timings = winner.monitor.timings() if winner.monitor is not None else {}
+            if timings:
+                self.per_call_timings.append(timings)
+                logger.debug(
+                    f"Streamed {self.model} response: first token {timings['ttft_s']}s, "
+                    f"first action {timings['ttfa_s']}s, total {timings['duration_s']}s"
+                )
+            record_event(
+                "llm_call",
+                model=self.model,
+                latency=time.monotonic() - started,
+                outcome="ok",
+                ttft=timings.get("ttft_s"),
+                ttfa=timings.get("ttfa_s"),
+                hedge_winner=self._last_hedge[1]["role"] if self._last_hedge else None,
+            )
+            if cache_key is not None:
+                self._response_cache.store(cache_key, response)
+            return response
+
+    @contextmanager
+    def _endpoint_scope(self, attempt: ApiAttempt):
+        """Context manager around one request; subclasses route it to an endpoint here.
+
+        Args:
+            attempt: The request; a hedged duplicate should go elsewhere than the request it duplicates
+        """
+        if attempt.role == DUPLICATE and self._get_hedge_client() is not None:
+            attempt.client = self._hedge_client
+        yield
+
+    def _run_attempt(self, attempt: ApiAttempt, request: Any) -> Any:
+        """Send a request built by ``_prepare_api_call`` as ``attempt``, on the current thread."""
+        self._thread_state.attempt = attempt
+        try:
+            with self._endpoint_scope(attempt):
+                return self._send_api_call(request)
+        finally:
+            self._thread_state.attempt = None
+
+    def _hedging_supported(self) -> bool:
+        """Whether two requests for the same prompt may run at once; see ``OpenAILLM``."""
+        return True
+
+    def _call_provider(self, attempt: ApiAttempt) -> tuple[Any, ApiAttempt]:
+        """Make one API attempt, hedged once it is slower than the configured latency percentile.
+
+        The request is built once, here on the calling thread, and a hedged duplicate
+        sends the same request, so only sending runs on two threads at once.
+
+        Returns:
+            ``(response, attempt that produced it)``
+        """
+        self._last_hedge = None
+        request = self._prepare_api_call()
+        if self._hedge_policy is None or not self._hedging_supported():
+            return self._run_attempt(attempt, request), attempt
+        if self._latency_histogram is None:
+            self._latency_histogram = latency_histogram(type(self).__name__, self.model, self._hedge_policy.window)
+        delay = self._hedge_policy.delay(self._latency_histogram)
+        if delay is None:
+            return self._run_attempt(attempt, request), attempt
+        hedged = []
+        # Both requests are charged the same estimate; the winner's is settled by _settle_rate_limit
+        loser_charge = 0
+
+        def start_duplicate(primary: ApiAttempt) -> bool:
+            nonlocal loser_charge
+            if not primary.stop_early_dispatch():
+                # The response is already arriving and its actions are running; it is not stuck
+                return False
+            if self._rate_limiter is not None:
+                if not self._rate_limiter.try_acquire(primary.prompt_tokens):
+                    logger.debug(f"Not hedging {self.model} call: no rate limit quota left")
+                    return False
+                loser_charge = primary.prompt_tokens
+            self.hedged_api_calls += 1
+            hedged.append(primary)
+            logger.info(f"{self.model} call still running after {delay:.1f}s; sending a hedged duplicate")
+            return True
+
+        generation = self._cost_generation
+        response, winner = run_hedged(
+            lambda current: self._run_attempt(current, request),
+            attempt,
+            delay,
+            start_duplicate,
+            lambda loser, future: self._hedge_losers.append((generation, loser, future, loser_charge)),
+        )
+        if hedged:
+            self._last_hedge = (response, {"role": winner.role, "won": True})
+            if winner.role == DUPLICATE:
+                self.hedge_wins += 1
+                logger.info(f"Hedged duplicate of the {self.model} call won after {time.monotonic() - attempt.started:.1f}s")
+        return response, winner
+
+    def _get_hedge_client(self) -> Any:
+        if not self._hedge_client_ready:
+            api_key = self._hedge_policy.api_key if self._hedge_policy is not None else None
+            self._hedge_client = self._client_with_key(api_key) if api_key else None
+            self._hedge_client_ready = True
+        return self._hedge_client
+
+    def _client_with_key(self, api_key: str) -> Any:
+        """A provider client like ``self.client`` but authenticating with ``api_key``, or None if unsupported."""
+        return None
+
+    def _account_hedge_losers(self, timeout: float = 0.0) -> None:
+        """Record the cost of requests that lost a hedge race.
+
+        Args:
+            timeout: Seconds to wait for losers still in flight; those still running
+                afterwards are charged an estimated prompt cost now instead
+        """
+        self._hedge_losers = [loser for loser in self._hedge_losers if loser[0] == self._cost_generation]
+        if not self._hedge_losers:
+            return
+        if timeout > 0:
+            wait([loser[2] for loser in self._hedge_losers], timeout=timeout)
+        still_running = []
+        for generation, attempt, future, charged in self._hedge_losers:
+            hedge = {"role": attempt.role, "won": False}
+            usage_before = self.total_input_tokens + self.total_output_tokens
+            if not future.done():
+                if timeout > 0:
+                    # Stats are being reported; its usage would arrive too late to be counted
+                    self._track_estimated_usage(attempt.prompt_tokens, hedge={**hedge, "in_flight": True})
+                else:
+                    still_running.append((generation, attempt, future, charged))
+                    continue
+            else:
+                error = future.exception()
+                if error is None:
+                    self._track_usage(future.result(), hedge=hedge)
+                elif isinstance(error, RequestCancelled):
+                    self._track_estimated_usage(attempt.prompt_tokens, hedge={**hedge, "cancelled": True})
+                else:
+                    logger.debug(f"Hedged {attempt.role} request failed after losing: {error}")
+            # Settled on its own, so it does not skew the settlement of whichever call is pending
+            used = self.total_input_tokens + self.total_output_tokens - usage_before
+            self._hedge_loser_tokens += used
+            if charged and self._rate_limiter is not None:
+                self._rate_limiter.settle(used - charged)
+        self._hedge_losers = still_running
+
+    def _append_call_cost(self, cost_info: Dict[str, Any], response: Any, hedge: Dict[str, Any] | None = None) -> None:
+        """Add a call's cost record to ``per_call_costs``, marked if the call was part of a hedge race."""
+        if hedge is None and self._last_hedge is not None and self._last_hedge[0] is response:
+            hedge = self._last_hedge[1]
+        if hedge is not None:
+            cost_info["hedge"] = hedge
+        self.per_call_costs.append(cost_info)
+
+    def _track_usage(self, response: Any, hedge: Dict[str, Any] | None = None) -> None:
+        """Add a response's token usage and cost to the totals; providers without pricing do nothing."""
+
+    def _track_estimated_usage(self, prompt_tokens: int, hedge: Dict[str, Any]) -> None:
+        """Charge a losing request for its prompt, which the provider bills even though no usage came back (yet)."""
+        cost = CostTracker.estimate_cost(self.model, prompt_tokens, 0)
+        if cost is None:
+            return
+        self.total_cost += cost
+        self.total_input_tokens += prompt_tokens
+        self.total_uncached_input_tokens += prompt_tokens
+        self.total_cost_input_uncached_usd += cost
+        self.api_calls += 1
+        self.per_call_costs.append({
+            "model": self.model,
+            "estimated": True,
+            "tokens": {"prompt_tokens": prompt_tokens},
+            "total_cost_usd": cost,
+            "hedge": hedge,
+        })
+        logger.info(f"Losing hedged {hedge['role']} request charged an estimated ${cost:.6f} for ~{prompt_tokens} prompt tokens")
+
+    def _prepare_api_call(self) -> Any:
+        """Build the provider request for the current history. Must be implemented by subclasses.
+
+        Runs on the calling thread. Anything that updates controller state (conversion
+        caches, cache breakpoints) belongs here, since a hedged call sends the
+        prepared request twice at once.
+
+        Returns:
+            The request, passed to ``_send_api_call``
+        """
+        raise NotImplementedError("Subclasses must implement _prepare_api_call")
+
+    def _send_api_call(self, request: Any) -> Any:
+        """Send a request built by ``_prepare_api_call`` with ``self.client``. Must be implemented by subclasses.
+
+        May run on two threads at once for the same request, so it must not update controller state.
+
         Returns:
             API response object
         """
-        raise NotImplementedError("Subclasses must implement _make_api_call")
+        raise NotImplementedError("Subclasses must implement _send_api_call")
     
     def build_prompt(self, task_description: str = None, feedback: str = None, conversation_history: list = None) -> str:
         """Build the initial prompt for the LLM.
@@ -1215,7 +1711,7 @@ class BaseLLM(Controller):
         # For Qwen3-VL models, include tool descriptions in prompt
         tools_description = ""
         if hasattr(self, 'is_qwen_vl_model') and self.is_qwen_vl_model and self.use_tools and self.tools:
-            tools_description = format_tools_as_text(self.tools)
+            tools_description = compile_tools(self.tools, "text")
         
         if task_description is not None:
             # Initial prompt - only used for first iteration
@@ -1351,6 +1847,8 @@ class BaseLLM(Controller):
         Returns:
             Dictionary with cost and token usage information
         """
+        if self._hedge_policy is not None:
+            self._account_hedge_losers(timeout=self._hedge_policy.loser_timeout)
         return {
             "total_cost_usd": round(self.total_cost, 6),
             "total_cost_input_uncached_usd": round(self.total_cost_input_uncached_usd, 6),
@@ -1369,7 +1867,20 @@ class BaseLLM(Controller):
             "api_calls": self.api_calls,
             "model": self.model,
             "per_call_costs": self.per_call_costs,
-        }
+        } | ({
+            # Time to first token / first complete tool call of each streamed call
+            "per_call_timings": self.per_call_timings,
+        } if self.per_call_timings else {}) | ({
+            # Calls served by the response cache; their costs are the recorded ones
+            "replayed_api_calls": self.replayed_api_calls,
+        } if self.replayed_api_calls else {}) | ({
+            # Duplicate requests sent for slow calls, and how many of them answered first
+            "hedged_api_calls": self.hedged_api_calls,
+            "hedge_wins": self.hedge_wins,
+        } if self.hedged_api_calls else {}) | ({
+            # Only providers that report cache reads separately (Anthropic) set this
+            "cache_hit_ratio": round(self.total_cache_read_input_tokens / self.total_input_tokens, 4),
+        } if self.total_cache_read_input_tokens and self.total_input_tokens else {})
     
     def reset_cost_tracking(self) -> None:
         """Reset cost tracking statistics."""
@@ -1390,7 +1901,15 @@ class BaseLLM(Controller):
         self.total_cost_cache_read_usd = 0.0
 
         self.api_calls = 0
+        self.replayed_api_calls = 0
+        self.hedged_api_calls = 0
+        self.hedge_wins = 0
+        # Hedge losers still running belong to the previous task
+        self._cost_generation += 1
+        self._hedge_losers = []
+        self._hedge_loser_tokens = 0
         self.per_call_costs = []
+        self.per_call_timings = []
         self.last_think = None
     
     def get_last_think(self) -> str | None:
@@ -1504,10 +2023,12 @@ class OpenAILLM(BaseLLM):
             os.getenv("OPENAI_BASE_URL") or
             os.getenv("VLLM_BASE_URL")
         )
+        # Several replicas of the same backend (controller.args.base_urls) take precedence over base_url
+        base_urls = resolve_base_urls(llm_config, **kwargs)
 
         # If no OpenAI key is found, but a base_url is configured/detected, set a placeholder key for vLLM compatibility
         if not api_key:
-            if base_url:
+            if base_url or base_urls:
                 api_key = "EMPTY"  # vLLM does not validate the key, but OpenAI SDK requires a string
                 logger.info("No OPENAI_API_KEY found. Using placeholder key for vLLM.")
             else:
@@ -1516,26 +2037,48 @@ class OpenAILLM(BaseLLM):
                 api_key = "EMPTY"
                 logger.info("No OPENAI_API_KEY or base_url provided. Falling back to local vLLM at http://localhost:8001/v1")
 
-        # Initialize OpenAI client
-        client_kwargs = {}
+        # Initialize OpenAI client; RetryPolicy is the only retry layer, so the SDK must not retry too
+        client_kwargs = {"max_retries": 0}
         if api_key:
             client_kwargs["api_key"] = api_key
         if base_url:
             client_kwargs["base_url"] = base_url
 
         self.client = OpenAI(**client_kwargs)
+        # Calls are routed per attempt; self.client points at the chosen replica while a call is made
+        self._endpoint_pool = EndpointPool.from_config(
+            llm_config,
+            lambda url: OpenAI(**{**client_kwargs, "base_url": url}),
+            api_key=api_key or "",
+            **kwargs,
+        )
+        if self._endpoint_pool is not None:
+            self.client = self._endpoint_pool.endpoints[0].client
+        self._client_kwargs = client_kwargs
+        # Sticky routing key; a new one per task keeps each task on one replica's prefix cache
+        self._routing_key = uuid.uuid4().hex
         self.cleanup_old_user_images: bool = bool(
             llm_config.get("cleanup_old_user_images", kwargs.get("cleanup_old_user_images", False))
         )
 
         self._use_responses_api = isinstance(self.model, str) and self.model.lower() in ["gpt-5.4-pro", "gpt-5.4"]
+        if self._use_responses_api:
+            self.tool_schema_format = "responses"
+        # Responses API input is maintained incrementally: each message's input items are
+        # cached; optionally only new items are sent, chained to the previous response
+        # with previous_response_id
+        self._responses_chaining: bool = bool(llm_config.get("responses_chaining", False))
+        self._responses_items_cache: list = []
+        self._responses_chain: tuple | None = None
 
         logger.info(f"OpenAILLM initialized with model: {self.model} (responses_api={self._use_responses_api})")
         logger.info(
             "OpenAILLM cleanup_old_user_images=%s (false keeps historical images)",
             self.cleanup_old_user_images,
         )
-        if base_url:
+        if self._endpoint_pool is not None:
+            logger.info(f"Using {len(self._endpoint_pool.urls)} load-balanced base_urls")
+        elif base_url:
             logger.info(f"Using custom base_url: {base_url}")
         logger.debug(f"API key configured: {bool(api_key)}")
         logger.debug(f"Client type: {self.client_type}")
@@ -1646,20 +2189,10 @@ class OpenAILLM(BaseLLM):
     
     def _convert_tools_to_responses_api(self, openai_tools: list) -> list:
         """Convert Chat Completions tool definitions to Responses API format (flat, no 'function' wrapper)."""
-        responses_tools = []
-        for tool in openai_tools:
-            if tool.get("type") == "function":
-                func = tool.get("function", {})
-                responses_tools.append({
-                    "type": "function",
-                    "name": func.get("name", ""),
-                    "description": func.get("description", ""),
-                    "parameters": func.get("parameters", {}),
-                })
-        return responses_tools
+        return to_responses_tools(openai_tools)
 
-    def _convert_messages_to_responses_input(self) -> list:
-        """Convert Chat-Completions-style self.messages to Responses API input items.
+    def _convert_message_to_responses_items(self, msg: Dict[str, Any]) -> list:
+        """Convert one Chat-Completions-style message to Responses API input items.
 
         Mapping:
           system   -> {"role": "developer", ...}
@@ -1669,78 +2202,274 @@ class OpenAILLM(BaseLLM):
           tool     -> function_call_output
         """
         items: list = []
-        for msg in self.messages:
-            role = msg.get("role")
-            content = msg.get("content")
-            tool_calls = msg.get("tool_calls")
-
-            if role == "system":
-                items.append({
-                    "role": "developer",
-                    "content": content if isinstance(content, str) else str(content or ""),
-                })
+        role = msg.get("role")
+        content = msg.get("content")
+        tool_calls = msg.get("tool_calls")
+
+        if role == "system":
+            items.append({
+                "role": "developer",
+                "content": content if isinstance(content, str) else str(content or ""),
+            })
 
-            elif role == "user":
-                if isinstance(content, list):
-                    new_parts = []
-                    for part in content:
-                        if not isinstance(part, dict):
-                            continue
-                        if part.get("type") == "text":
-                            new_parts.append({"type": "input_text", "text": part.get("text", "")})
-                        elif part.get("type") == "image_url":
-                            url = part.get("image_url", {}).get("url", "")
-                            new_parts.append({"type": "input_image", "image_url": url})
-                    items.append({"role": "user", "content": new_parts})
-                else:
-                    items.append({"role": "user", "content": str(content or "")})
+        elif role == "user":
+            if isinstance(content, list):
+                new_parts = []
+                for part in content:
+                    if not isinstance(part, dict):
+                        continue
+                    if part.get("type") == "text":
+                        new_parts.append({"type": "input_text", "text": part.get("text", "")})
+                    elif part.get("type") == "image_url":
+                        url = part.get("image_url", {}).get("url", "")
+                        new_parts.append({"type": "input_image", "image_url": url})
+                items.append({"role": "user", "content": new_parts})
+            else:
+                items.append({"role": "user", "content": str(content or "")})
 
-            elif role == "assistant":
-                if tool_calls:
-                    for tc in tool_calls:
-                        func = tc.get("function", {})
-                        items.append({
-                            "type": "function_call",
-                            "call_id": tc.get("id", ""),
-                            "name": func.get("name", ""),
-                            "arguments": func.get("arguments", "{}"),
-                        })
-                if content:
+        elif role == "assistant":
+            if tool_calls:
+                for tc in tool_calls:
+                    func = tc.get("function", {})
                     items.append({
-                        "role": "assistant",
-                        "content": content if isinstance(content, str) else str(content),
+                        "type": "function_call",
+                        "call_id": tc.get("id", ""),
+                        "name": func.get("name", ""),
+                        "arguments": func.get("arguments", "{}"),
                     })
-
-            elif role == "tool":
+            if content:
                 items.append({
-                    "type": "function_call_output",
-                    "call_id": msg.get("tool_call_id", ""),
-                    "output": content if isinstance(content, str) else str(content or ""),
+                    "role": "assistant",
+                    "content": content if isinstance(content, str) else str(content),
                 })
+
+        elif role == "tool":
+            items.append({
+                "type": "function_call_output",
+                "call_id": msg.get("tool_call_id", ""),
+                "output": content if isinstance(content, str) else str(content or ""),
+            })
         return items
 
-    def _make_api_call(self) -> Any:
+    def _update_responses_items(self) -> int | None:
+        """Bring the per-message Responses input cache in line with self.messages.
+
+        Only messages added since the last call, or replaced / given new content
+        (e.g. by image cleanup), are converted again.
+
+        Returns:
+            Index of the first already-sent message that changed, or None
+        """
+        cache = self._responses_items_cache
+        del cache[len(self.messages):]
+        first_changed = None
+        for index, msg in enumerate(self.messages):
+            if index < len(cache):
+                cached_msg, cached_content, _ = cache[index]
+                if cached_msg is msg and cached_content is msg.get("content"):
+                    continue
+                if first_changed is None:
+                    first_changed = index
+                cache[index] = (msg, msg.get("content"), self._convert_message_to_responses_items(msg))
+            else:
+                cache.append((msg, msg.get("content"), self._convert_message_to_responses_items(msg)))
+        return first_changed
+
+    def _convert_messages_to_responses_input(self, start: int = 0) -> list:
+        """Convert Chat-Completions-style self.messages to Responses API input items.
+
+        Args:
+            start: Index of the first message to include
+
+        Returns:
+            Flat list of input items, see ``_convert_message_to_responses_items``
+        """
+        self._update_responses_items()
+        return [item for _, _, items in self._responses_items_cache[start:] for item in items]
+
+    def _chained_responses_start(self, first_changed: int | None) -> int | None:
+        """Return the first message to send with ``previous_response_id``, or None to send everything.
+
+        Chaining is only safe when the assistant message recorded for the previous
+        response is still in place with all of its function calls and nothing
+        before it changed locally.
+        """
+        if not self._responses_chaining or self._responses_chain is None:
+            return None
+        _, assistant_index, function_calls = self._responses_chain
+        if assistant_index >= len(self.messages):
+            return None
+        msg = self.messages[assistant_index]
+        if msg.get("role") != "assistant" or len(msg.get("tool_calls") or []) != function_calls:
+            return None
+        if first_changed is not None and first_changed <= assistant_index:
+            return None
+        return assistant_index + 1
+
+    def _sampling_params(self) -> Dict[str, Any]:
         if self._use_responses_api:
-            input_items = self._convert_messages_to_responses_input()
-            api_params = {
-                "model": self.model,
-                "input": input_items,
-                "reasoning": {"effort": "high"},
-            }
-            if self.use_tools and self.tools:
-                api_params["tools"] = self._convert_tools_to_responses_api(self.tools)
-            return self.client.responses.create(**api_params)
-        else:
-            api_params = {
-                "model": self.model,
-                "messages": self.messages,
-            }
-            if self.use_tools and self.tools:
-                api_params["tools"] = self.tools
-            return self.client.chat.completions.create(**api_params)
+            return {"api": "responses", "reasoning_effort": "high"}
+        return {"api": "chat_completions"}
+
+    @contextmanager
+    def _endpoint_scope(self, attempt: ApiAttempt):
+        """Send the request to a replica from the endpoint pool, if ``base_urls`` is configured.
+
+        A hedged duplicate goes to a replica other than the one serving the original request.
+        """
+        hedge = attempt.role == DUPLICATE
+        if self._endpoint_pool is None or (hedge and len(self._endpoint_pool.urls) < 2):
+            with super()._endpoint_scope(attempt):
+                yield
+            return
+        original = attempt.duplicate_of.endpoint_url if hedge and attempt.duplicate_of is not None else None
+        with self._endpoint_pool.lease(self._routing_key, (original,) if original else ()) as endpoint:
+            logger.debug(f"Routing {self.model} call to {endpoint.url}")
+            attempt.client = endpoint.client
+            attempt.endpoint_url = endpoint.url
+            yield
+
+    def _client_with_key(self, api_key: str) -> Any:
+        return OpenAI(**{**self._client_kwargs, "api_key": api_key})
+
+    def _hedging_supported(self) -> bool:
+        # Responses API input items and the previous_response_id chain are updated by each call
+        return not self._use_responses_api
+
+    def _stream_chat_completion(self, api_params: Dict[str, Any]) -> ChatCompletion:
+        """Make a streamed Chat Completions call and rebuild the complete response from its chunks."""
+        monitor = self._begin_stream()
+        accumulator = ChatToolCallAccumulator()
+        content_parts: list = []
+        reasoning_parts: list = []
+        finish_reason = None
+        usage = None
+        last_chunk = None
+        stream = self.client.chat.completions.create(**api_params, stream=True, stream_options={"include_usage": True})
+        # Closing the stream drops the connection when it is abandoned, e.g. after losing a hedge race
+        with stream:
+            for chunk in stream:
+                last_chunk = chunk
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                finish_reason = choice.finish_reason or finish_reason
+                delta = choice.delta
+                if delta is None:
+                    continue
+                if delta.content:
+                    monitor.token()
+                    content_parts.append(delta.content)
+                # vLLM/SGLang reasoning parsers stream the thinking separately
+                reasoning = getattr(delta, "reasoning_content", None) or getattr(delta, "reasoning", None)
+                if isinstance(reasoning, str) and reasoning:
+                    monitor.token()
+                    reasoning_parts.append(reasoning)
+                if delta.tool_calls:
+                    monitor.token()
+                    for tool_call in accumulator.add(delta.tool_calls):
+                        monitor.tool_call(tool_call)
+        if last_chunk is None:
+            raise RuntimeError(f"Stream from {self.model} returned no chunks")
+
+        message: Dict[str, Any] = {"role": "assistant", "content": "".join(content_parts) or None}
+        if accumulator.tool_calls:
+            message["tool_calls"] = [
+                {**tool_call, "id": tool_call["id"] or f"call_{index}"}
+                for index, tool_call in enumerate(accumulator.tool_calls)
+            ]
+        if reasoning_parts:
+            message["reasoning_content"] = "".join(reasoning_parts)
+        return ChatCompletion.model_validate({
+            "id": last_chunk.id,
+            "object": "chat.completion",
+            "created": last_chunk.created,
+            "model": last_chunk.model or self.model,
+            "choices": [{"index": 0, "finish_reason": finish_reason or "stop", "message": message}],
+            "usage": usage.model_dump() if usage is not None else None,
+        })
+
+    def _create_response(self, **params: Any) -> Any:
+        """Make a Responses API call, streamed if enabled."""
+        if not self.streaming:
+            return self.client.responses.create(**params)
+        monitor = self._begin_stream()
+        final_response = None
+        for event in self.client.responses.create(**params, stream=True):
+            event_type = getattr(event, "type", "")
+            if event_type.endswith(".delta"):
+                monitor.token()
+            elif event_type == "response.output_item.done" and getattr(event.item, "type", None) == "function_call":
+                item = event.item
+                monitor.tool_call({"id": item.call_id, "function": {"name": item.name, "arguments": item.arguments}})
+            elif event_type in ("response.completed", "response.incomplete"):
+                final_response = event.response
+            elif event_type in ("response.failed", "error"):
+                raise RuntimeError(f"Responses stream from {self.model} failed: {getattr(event, 'response', event)}")
+        if final_response is None:
+            raise RuntimeError(f"Responses stream from {self.model} ended without a response")
+        return final_response
+
+    def _prepare_api_call(self) -> Dict[str, Any]:
+        if self._use_responses_api:
+            # Built in _send_responses_call, since each call extends the Responses chain; never hedged
+            return {}
+        api_params = {
+            "model": self.model,
+            "messages": self.messages,
+        }
+        if self.use_tools and self.tools:
+            api_params["tools"] = self.tools
+        return api_params
+
+    def _send_api_call(self, request: Dict[str, Any]) -> Any:
+        if self._use_responses_api:
+            return self._send_responses_call()
+        if self.streaming:
+            return self._stream_chat_completion(request)
+        return self.client.chat.completions.create(**request)
+
+    def _send_responses_call(self) -> Any:
+        """Make a Responses API call, chained to the previous response when possible."""
+        first_changed = self._update_responses_items()
+        api_params = {
+            "model": self.model,
+            "reasoning": {"effort": "high"},
+        }
+        if self.use_tools and self.tools:
+            api_params["tools"] = compile_tools(self.tools, "responses")
+
+        response = None
+        chain_start = self._chained_responses_start(first_changed)
+        message_count = len(self.messages)
+        if chain_start is not None:
+            # The server already holds the earlier turns; only send what was added since
+            try:
+                response = self._create_response(
+                    **api_params,
+                    input=self._convert_messages_to_responses_input(chain_start),
+                    previous_response_id=self._responses_chain[0],
+                )
+            except Exception as e:
+                if getattr(e, "status_code", None) not in (400, 404):
+                    raise
+                logger.warning(f"Chained Responses call failed ({e}); resending the full input")
+        if response is None:
+            response = self._create_response(**api_params, input=self._convert_messages_to_responses_input())
+
+        # The handler appends this response's assistant message at index message_count
+        function_calls = sum(
+            1 for item in (getattr(response, "output", None) or [])
+            if getattr(item, "type", None) == "function_call"
+        )
+        self._responses_chain = (getattr(response, "id", None), message_count, function_calls)
+        if self._responses_chain[0] is None:
+            self._responses_chain = None
+        return response
     
-    def _handle_api_response(self, response: Any, attempt: int, max_attempts: int) -> Dict[str, Any]:
-        """Handle OpenAI API response."""
+    def _track_usage(self, response: Any, hedge: Dict[str, Any] | None = None) -> None:
         if hasattr(response, "usage") and response.usage:
             cost_info = CostTracker.track_openai(response.usage, self.model)
             if cost_info:
@@ -1760,7 +2489,7 @@ class OpenAILLM(BaseLLM):
                 self.total_cost_output_usd += float(breakdown["output_usd"])
 
                 self.api_calls += 1
-                self.per_call_costs.append(cost_info)
+                self._append_call_cost(cost_info, response, hedge)
 
                 logger.info(
                     f"API call #{self.api_calls} cost: ${cost:.6f} | "
@@ -1769,6 +2498,10 @@ class OpenAILLM(BaseLLM):
                     f"Running total: ${self.total_cost:.6f}"
                 )
 
+    def _handle_api_response(self, response: Any, attempt: int, max_attempts: int) -> Dict[str, Any]:
+        """Handle OpenAI API response."""
+        self._track_usage(response)
+
         class MockFunction:
             def __init__(self, name, arguments):
                 self.name = name
@@ -1869,7 +2602,7 @@ class OpenAILLM(BaseLLM):
                     "role": "user",
                     "content": self._build_invalid_tool_call_correction(invalid_tool_calls),
                 })
-                return self._handle_api_response(self._make_api_call(), attempt + 1, max_attempts)
+                return self._handle_api_response(self._invoke_api(), attempt + 1, max_attempts)
 
             self.messages.append({
                 "role": "assistant",
@@ -1909,7 +2642,7 @@ class OpenAILLM(BaseLLM):
                     "content": error_message
                 })
                 # Retry by making another API call
-                return self._handle_api_response(self._make_api_call(), attempt + 1, max_attempts)
+                return self._handle_api_response(self._invoke_api(), attempt + 1, max_attempts)
         else:
             # Regular text response (non-tool calling mode or no tools called)
             assistant_message = message.content if message.content else ""
@@ -1943,7 +2676,7 @@ class OpenAILLM(BaseLLM):
                     "content": correction_prompt
                 })
                 # Retry by making another API call
-                return self._handle_api_response(self._make_api_call(), attempt + 1, max_attempts)
+                return self._handle_api_response(self._invoke_api(), attempt + 1, max_attempts)
 
     def parse_tool_calls_list(self, tool_calls: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Parse a list of tool calls into action format."""
@@ -2027,6 +2760,9 @@ class OpenAILLM(BaseLLM):
         """Clear the message history."""
         logger.debug(f"Clearing message history ({len(self.messages)} messages removed)")
         self.messages = []
+        self._responses_items_cache = []
+        self._responses_chain = None
+        self._routing_key = uuid.uuid4().hex
 
     def add_tool_message(self, tool_call_id: str, content: str) -> None:
         """Append tool call results to the conversation history for OpenAI tool-calling compliance."""
@@ -2084,6 +2820,9 @@ class QwenLLM(OpenAILLM):
         super().__init__(llm_config, client_type, **kwargs)
         model_lower = self.model.lower()
         self.is_qwen_vl_model = "qwen3-vl" in model_lower or "qwen3_vl" in model_lower
+        if self.is_qwen_vl_model:
+            # Qwen3-VL gets the tools as text in the prompt
+            self.tool_schema_format = "text"
         self.is_qwen35_model = "qwen3.5" in model_lower or "qwen3_5" in model_lower
         logger.info(
             f"QwenLLM initialized with model: {self.model} "
@@ -2141,7 +2880,7 @@ class QwenLLM(OpenAILLM):
         # For Qwen3-VL models, include tool descriptions in prompt
         tools_description = ""
         if self.is_qwen_vl_model and self.use_tools and self.tools:
-            tools_description = format_tools_as_text(self.tools)
+            tools_description = compile_tools(self.tools, "text")
         
         if task_description is not None:
             # Initial prompt - only used for first iteration
@@ -2165,8 +2904,11 @@ class QwenLLM(OpenAILLM):
         # Fallback to base implementation if no match
         return super().build_prompt(task_description, feedback, conversation_history)
 
-    def _make_api_call(self) -> Any:
-        """Make OpenAI API call, but exclude tools for Qwen3-VL (text-based tool calling)."""
+    def _sampling_params(self) -> Dict[str, Any]:
+        return {"reasoning": True, "text_tool_calls": self.is_qwen_vl_model}
+
+    def _prepare_api_call(self) -> Dict[str, Any]:
+        """Build the OpenAI request, but exclude tools for Qwen3-VL (text-based tool calling)."""
         # Prepare API call parameters
         api_params = {
             "model": self.model,
@@ -2177,8 +2919,7 @@ class QwenLLM(OpenAILLM):
         # Add tools if in tool calling mode (except for Qwen3-VL text-based tool calls)
         if self.use_tools and self.tools and not self.is_qwen_vl_model:
             api_params["tools"] = self.tools
-        
-        return self.client.chat.completions.create(**api_params)
+        return api_params
 
     def _handle_api_response(self, response: Any, attempt: int, max_attempts: int) -> Dict[str, Any]:
         """Handle API response with Qwen-specific parsing.
@@ -2231,7 +2972,7 @@ class QwenLLM(OpenAILLM):
                         }
                     error_message = f"Error parsing tool calls: {str(parse_error)}\nPlease check the tool parameters."
                     self.messages.append({"role": "user", "content": error_message})
-                    return self._handle_api_response(self._make_api_call(), attempt + 1, max_attempts)
+                    return self._handle_api_response(self._invoke_api(), attempt + 1, max_attempts)
         
         return super()._handle_api_response(response, attempt, max_attempts)
 
@@ -2458,6 +3199,10 @@ class KimiLLM(OpenAILLM):
         return super()._handle_api_response(response, attempt, max_attempts)
 
 
+# Anthropic's limit on cache_control breakpoints per request
+CLAUDE_MAX_CACHE_BREAKPOINTS = 4
+
+
 class ClaudeLLM(BaseLLM):
     """Language model client using Anthropic Claude API."""
 
@@ -2473,6 +3218,7 @@ class ClaudeLLM(BaseLLM):
 
         # Extract model and api_key from llm_config, with fallback to kwargs and env variables
         self.model = llm_config.get("model", kwargs.get("model", "claude-sonnet-4-6"))
+        self.tool_schema_format = "claude"
         api_key = (
             llm_config.get("api_key") or
             kwargs.get("api_key") or
@@ -2489,11 +3235,13 @@ class ClaudeLLM(BaseLLM):
             os.getenv("ANTHROPIC_BASE_URL")
         )
         
-        client_kwargs = {"api_key": api_key}
+        # RetryPolicy is the only retry layer, so the SDK must not retry too
+        client_kwargs = {"api_key": api_key, "max_retries": 0}
         if base_url:
             client_kwargs["base_url"] = base_url
             
         self.client = anthropic.Anthropic(**client_kwargs)
+        self._client_kwargs = client_kwargs
 
         # Set cleanup_old_user_images=false in controller.args to keep all past
         # user-turn images in history (higher token/cost; default true matches prior behavior).
@@ -2501,6 +3249,12 @@ class ClaudeLLM(BaseLLM):
             llm_config.get("cleanup_old_user_images", kwargs.get("cleanup_old_user_images", False))
         )
 
+        # "breakpoints" places explicit cache breakpoints (see _plan_cache_breakpoints),
+        # "auto" uses a single top-level cache_control, "off" disables prompt caching
+        self.prompt_caching: str = llm_config.get("prompt_caching", kwargs.get("prompt_caching", "breakpoints"))
+        self._cached_tools: tuple | None = None
+        self._last_cache_breakpoint: int | None = None
+
         logger.info(f"ClaudeLLM initialized with model: {self.model}")
         logger.info(
             "ClaudeLLM cleanup_old_user_images=%s (false keeps historical images)",
@@ -2512,17 +3266,7 @@ class ClaudeLLM(BaseLLM):
 
     def _convert_openai_tools_to_claude(self, openai_tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Convert OpenAI tool format to Claude tool format."""
-        claude_tools = []
-        for tool in openai_tools:
-            if tool.get("type") == "function":
-                func = tool.get("function", {})
-                claude_tool = {
-                    "name": func.get("name", ""),
-                    "description": func.get("description", ""),
-                    "input_schema": func.get("parameters", {})
-                }
-                claude_tools.append(claude_tool)
-        return claude_tools
+        return to_claude_tools(openai_tools)
 
     def _prepare_message_content(self, prompt: str, images_base64: list = None) -> Any:
         """Prepare message content for Claude API."""
@@ -2557,26 +3301,122 @@ class ClaudeLLM(BaseLLM):
         else:
             return prompt
 
-    def _make_api_call(self) -> Any:
-        """Make Claude API call."""
+    @staticmethod
+    def _with_cache_breakpoint(message: Dict[str, Any]) -> Dict[str, Any] | None:
+        """Return a copy of ``message`` with cache_control on its last cacheable block, or None."""
+        content = message.get("content")
+        if isinstance(content, str):
+            if not content:
+                return None
+            return {**message, "content": [{"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}]}
+        if isinstance(content, list):
+            for i in range(len(content) - 1, -1, -1):
+                block = content[i]
+                if isinstance(block, dict) and block.get("type") not in ("thinking", "redacted_thinking"):
+                    new_content = list(content)
+                    new_content[i] = {**block, "cache_control": {"type": "ephemeral"}}
+                    return {**message, "content": new_content}
+        return None
+
+    def _stable_history_end(self) -> int:
+        """Index of the last message that stays unchanged until the next call."""
+        end = len(self.messages) - 1
+        if self.cleanup_old_user_images:
+            # The newest user turn loses its images after this call, which changes the prefix from there
+            for i in range(end, -1, -1):
+                content = self.messages[i].get("content")
+                if self.messages[i].get("role") == "user" and isinstance(content, list) and any(
+                    isinstance(block, dict) and block.get("type") == "image" for block in content
+                ):
+                    return i - 1
+        return end
+
+    def _plan_cache_breakpoints(self) -> List[int]:
+        """Choose the message indices that get a cache breakpoint.
+
+        Anthropic allows CLAUDE_MAX_CACHE_BREAKPOINTS per request; one goes on the
+        tool block, the rest on:
+          - the first message (system and task prompt), shared by every call of the task
+          - the end of the stable history, written now and read by the next call
+          - the previous call's stable end, so this call reads what that call wrote
+            even when more than 20 blocks were added since
+        """
+        budget = CLAUDE_MAX_CACHE_BREAKPOINTS - (1 if self.use_tools and self.tools else 0)
+        stable_end = self._stable_history_end()
+        rolling = []
+        previous = self._last_cache_breakpoint
+        if previous is not None and 0 < previous < stable_end:
+            rolling.append(previous)
+        if stable_end > 0:
+            rolling.append(stable_end)
+        self._last_cache_breakpoint = stable_end if stable_end > 0 else None
+
+        indices = [0] if self.messages else []
+        # Newest rolling point first, in case the budget is tight
+        for index in reversed(rolling):
+            if len(indices) < budget and index not in indices:
+                indices.append(index)
+        return sorted(indices)
+
+    def _sampling_params(self) -> Dict[str, Any]:
+        return {"max_tokens": 16000, "adaptive_thinking": self._uses_adaptive_thinking()}
+
+    def _uses_adaptive_thinking(self) -> bool:
+        return isinstance(self.model, str) and self.model.lower() in ["claude-opus-4-6", "claude-sonnet-4-6"]
+
+    def _client_with_key(self, api_key: str) -> Any:
+        return anthropic.Anthropic(**{**self._client_kwargs, "api_key": api_key})
+
+    def _stream_message(self, api_params: Dict[str, Any]) -> Any:
+        """Make a streamed Messages call and return the final message."""
+        monitor = self._begin_stream()
+        with self.client.messages.stream(**api_params) as stream:
+            for event in stream:
+                if event.type == "content_block_delta":
+                    monitor.token()
+                elif event.type == "content_block_stop" and event.content_block.type == "tool_use":
+                    block = event.content_block
+                    monitor.tool_call({"id": block.id, "function": {"name": block.name, "arguments": json.dumps(block.input)}})
+            return stream.get_final_message()
+
+    def _prepare_api_call(self) -> Dict[str, Any]:
+        """Build the Claude request, including its cache breakpoints."""
         api_params = {
             "model": self.model,
             "messages": self.messages,
             "max_tokens": 16000,
-            "cache_control": {"type": "ephemeral"},
         }
 
         if self.use_tools and self.tools:
-            api_params["tools"] = self._convert_openai_tools_to_claude(self.tools)
-
-        if isinstance(self.model, str) and self.model.lower() in ["claude-opus-4-6", "claude-sonnet-4-6"]:
+            api_params["tools"] = compile_tools(self.tools, "claude")
+
+        if self.prompt_caching == "auto":
+            api_params["cache_control"] = {"type": "ephemeral"}
+        elif self.prompt_caching == "breakpoints":
+            if "tools" in api_params and api_params["tools"]:
+                tools = api_params["tools"]
+                if self._cached_tools is None or self._cached_tools[0] is not tools:
+                    # The compiled schema is shared; mark a copy of its last tool
+                    self._cached_tools = (tools, tools[:-1] + [{**tools[-1], "cache_control": {"type": "ephemeral"}}])
+                api_params["tools"] = self._cached_tools[1]
+            messages = list(self.messages)
+            for index in self._plan_cache_breakpoints():
+                marked = self._with_cache_breakpoint(messages[index])
+                if marked is not None:
+                    messages[index] = marked
+            api_params["messages"] = messages
+
+        if self._uses_adaptive_thinking():
             api_params["thinking"] = {"type": "adaptive"}
             api_params["output_config"] = {"effort": "high"}
+        return api_params
 
-        return self.client.messages.create(**api_params)
+    def _send_api_call(self, request: Dict[str, Any]) -> Any:
+        if self.streaming:
+            return self._stream_message(request)
+        return self.client.messages.create(**request)
     
-    def _handle_api_response(self, response: Any, attempt: int, max_attempts: int) -> Dict[str, Any]:
-        """Handle Claude API response."""
+    def _track_usage(self, response: Any, hedge: Dict[str, Any] | None = None) -> None:
         if hasattr(response, "usage") and response.usage:
             cost_info = CostTracker.track_anthropic(response.usage, self.model)
             if cost_info:
@@ -2603,15 +3443,20 @@ class ClaudeLLM(BaseLLM):
                 self.total_cost_cache_read_usd += float(breakdown["cache_read_usd"])
 
                 self.api_calls += 1
-                self.per_call_costs.append(cost_info)
+                self._append_call_cost(cost_info, response, hedge)
 
                 logger.info(
                     f"API call #{self.api_calls} cost: ${cost:.6f} | "
                     f"in={tokens['input_tokens']} cache_w={tokens['cache_write_input_tokens']} "
-                    f"cache_r={tokens['cache_read_input_tokens']} out={tokens['output_tokens']} | "
+                    f"cache_r={tokens['cache_read_input_tokens']} out={tokens['output_tokens']} "
+                    f"(cache hit {cost_info['cache_hit_ratio']:.0%}) | "
                     f"Running total: ${self.total_cost:.6f}"
                 )
 
+    def _handle_api_response(self, response: Any, attempt: int, max_attempts: int) -> Dict[str, Any]:
+        """Handle Claude API response."""
+        self._track_usage(response)
+
         # Extract content
         content_blocks = response.content
         text_content = ""
@@ -2683,7 +3528,7 @@ class ClaudeLLM(BaseLLM):
                         }
                     ]
                 })
-                return self._handle_api_response(self._make_api_call(), attempt + 1, max_attempts)
+                return self._handle_api_response(self._invoke_api(), attempt + 1, max_attempts)
         else:
             # Regular text response
             logger.debug(f"Received response from {self.model} (length: {len(text_content)} chars)")
@@ -2705,7 +3550,7 @@ class ClaudeLLM(BaseLLM):
                     "role": "user",
                     "content": [{"type": "text", "text": correction_prompt}]
                 })
-                return self._handle_api_response(self._make_api_call(), attempt + 1, max_attempts)
+                return self._handle_api_response(self._invoke_api(), attempt + 1, max_attempts)
 
     def add_tool_message(self, tool_call_id: str, content: str) -> None:
         """Append tool call results to the conversation history."""
@@ -2820,6 +3665,7 @@ class GeminiLLM(BaseLLM):
 
         # Extract model and api_key from llm_config, with fallback to kwargs and env variables
         self.model = llm_config.get("model", kwargs.get("model", "gemini-3-flash-preview"))
+        self.tool_schema_format = "gemini"
         api_key = (
             llm_config.get("api_key") or
             kwargs.get("api_key") or
@@ -2833,10 +3679,12 @@ class GeminiLLM(BaseLLM):
         # Initialize Gemini client
         # Check if we need v1alpha API version (for media_resolution support)
         use_v1alpha = llm_config.get("use_v1alpha", False)
+        # A single HTTP attempt per request: RetryPolicy is the only retry layer
+        http_options: Dict[str, Any] = {"retry_options": {"attempts": 1}}
         if use_v1alpha:
-            self.client = genai.Client(api_key=api_key, http_options={'api_version': 'v1alpha'})
-        else:
-            self.client = genai.Client(api_key=api_key)
+            http_options["api_version"] = "v1alpha"
+        self._client_kwargs = {"http_options": http_options}
+        self.client = genai.Client(api_key=api_key, **self._client_kwargs)
 
         self.cleanup_old_user_images: bool = bool(
             llm_config.get("cleanup_old_user_images", kwargs.get("cleanup_old_user_images", False))
@@ -2845,6 +3693,9 @@ class GeminiLLM(BaseLLM):
         # Thinking configuration
         self.thinking = llm_config.get("thinking", kwargs.get("thinking", False))
 
+        # (message, content, converted parts) per entry of self.messages, see _converted_message_parts
+        self._gemini_parts_cache: List[tuple] = []
+
         logger.info(f"GeminiLLM initialized with model: {self.model}")
         logger.info(
             "GeminiLLM cleanup_old_user_images=%s (false keeps historical images)",
@@ -2856,33 +3707,7 @@ class GeminiLLM(BaseLLM):
 
     def _sanitize_gemini_parameters(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """Sanitize parameters for Gemini API (e.g. remove non-string enums)."""
-        if not parameters:
-            return parameters
-            
-        new_params = parameters.copy()
-        
-        # Handle properties if present
-        if "properties" in new_params:
-            new_props = {}
-            for name, prop in new_params["properties"].items():
-                new_props[name] = self._sanitize_gemini_parameters(prop)
-            new_params["properties"] = new_props
-            
-        # Handle enum validation
-        if "enum" in new_params:
-            # Check if any enum value is not a string
-            if any(not isinstance(v, str) for v in new_params["enum"]):
-                # Gemini only supports string enums in its Pydantic models
-                # So we remove the enum constraint for non-string types
-                # and add the options to description
-                options_str = ", ".join(map(str, new_params["enum"]))
-                if "description" in new_params:
-                    new_params["description"] += f" (Options: {options_str})"
-                else:
-                    new_params["description"] = f"Options: {options_str}"
-                del new_params["enum"]
-                
-        return new_params
+        return sanitize_gemini_parameters(parameters)
 
     def _convert_openai_tools_to_gemini(self, openai_tools: List[Dict[str, Any]]) -> List[types.Tool]:
         """Convert OpenAI tool format to Gemini tool format.
@@ -2893,128 +3718,203 @@ class GeminiLLM(BaseLLM):
         Returns:
             List of Gemini Tool objects
         """
-        gemini_tools = []
-        for tool in openai_tools:
-            if tool.get("type") == "function":
-                func = tool.get("function", {})
-                
-                # Sanitize parameters
-                parameters = func.get("parameters", {})
-                sanitized_parameters = self._sanitize_gemini_parameters(parameters)
-                
-                gemini_function = {
-                    "name": func.get("name", ""),
-                    "description": func.get("description", ""),
-                    "parameters": sanitized_parameters
-                }
-                gemini_tools.append(types.Tool(function_declarations=[gemini_function]))
-        return gemini_tools
+        return to_gemini_tools(openai_tools)
+
+    def _convert_message_to_gemini_parts(self, message: Dict[str, Any]) -> tuple[str, List[types.Part]] | None:
+        """Convert one OpenAI-format message into Gemini parts.
+
+        Args:
+            message: Message in OpenAI format
+
+        Returns:
+            ``(kind, parts)`` where kind is ``"function_call"`` for assistant messages with
+            tool calls and otherwise the Gemini role, or None for messages Gemini skips
+        """
+        role = message.get("role")
+        content = message.get("content", "")
+        parts = []
+
+        # Handle tool messages (skip for now, Gemini handles tool results differently)
+        if role == "tool":
+            return None
+
+        # Handle assistant messages with tool_calls
+        if role == "assistant" and "tool_calls" in message:
+            # Add text content if present
+            if content:
+                parts.append(types.Part(text=content))
+
+            # Add function call parts
+            for tool_call in message.get("tool_calls", []):
+                func = tool_call.get("function", {})
+                try:
+                    args = json.loads(func.get("arguments", "{}"))
+                except json.JSONDecodeError:
+                    args = {}
+
+                parts.append(types.Part(
+                    function_call=types.FunctionCall(
+                        name=func.get("name", ""),
+                        args=args
+                    )
+                ))
+            return "function_call", parts
+
+        # Map OpenAI roles to Gemini roles
+        gemini_role = "user" if role == "user" else "model"
+
+        # Handle content (can be string or list for multimodal)
+        if isinstance(content, str):
+            if content:
+                parts.append(types.Part(text=content))
+        elif isinstance(content, list):
+            for item in content:
+                if isinstance(item, dict):
+                    if item.get("type") == "text":
+                        parts.append(types.Part(text=item.get("text", "")))
+                    elif item.get("type") == "image_url":
+                        # Extract base64 data from data URL
+                        image_url = item.get("image_url", {}).get("url", "")
+                        if image_url.startswith("data:image"):
+                            # Format: data:image/png;base64,<base64_data>
+                            base64_data = image_url.split(",", 1)[1] if "," in image_url else ""
+                            if base64_data:
+                                try:
+                                    image_data = base64.b64decode(base64_data)
+                                    mime_type = "image/png"  # Default
+                                    if "image/jpeg" in image_url or "image/jpg" in image_url:
+                                        mime_type = "image/jpeg"
+                                    elif "image/gif" in image_url:
+                                        mime_type = "image/gif"
+                                    elif "image/webp" in image_url:
+                                        mime_type = "image/webp"
+
+                                    parts.append(types.Part(
+                                        inline_data=types.Blob(
+                                            mime_type=mime_type,
+                                            data=image_data
+                                        )
+                                    ))
+                                except Exception as e:
+                                    logger.warning(f"Failed to decode image: {e}")
+        return gemini_role, parts
+
+    def _converted_message_parts(self, index: int, message: Dict[str, Any]) -> tuple[str, List[types.Part]] | None:
+        """Return the Gemini parts of ``self.messages[index]``, converting it only if it changed.
+
+        Cache entries remember the message and content objects they were built from,
+        so replaced messages or reassigned content are converted again.
+        """
+        cache = self._gemini_parts_cache
+        if index < len(cache):
+            cached_message, cached_content, converted = cache[index]
+            if cached_message is message and cached_content is message.get("content"):
+                return converted
+        converted = self._convert_message_to_gemini_parts(message)
+        entry = (message, message.get("content"), converted)
+        if index < len(cache):
+            cache[index] = entry
+        else:
+            cache.extend([(None, None, None)] * (index - len(cache)))
+            cache.append(entry)
+        return converted
 
     def _convert_openai_messages_to_gemini_contents(self, messages: List[Dict[str, Any]]) -> List[types.Content]:
         """Convert OpenAI message format to Gemini contents format.
-        
+
+        Per-message conversions of ``self.messages`` are cached, so each turn only
+        converts messages added (or changed) since the previous call.
+
         Args:
             messages: List of messages in OpenAI format
-            
+
         Returns:
             List of Gemini Content objects
         """
+        cached = messages is self.messages
+        if cached:
+            # Drop entries past the end, e.g. after clear_history
+            del self._gemini_parts_cache[len(messages):]
+
         contents = []
         current_role = None
         current_parts = []
-        
-        for message in messages:
-            role = message.get("role")
-            content = message.get("content", "")
-            
-            # Handle tool messages (skip for now, Gemini handles tool results differently)
-            if role == "tool":
+
+        for index, message in enumerate(messages):
+            if cached:
+                converted = self._converted_message_parts(index, message)
+            else:
+                converted = self._convert_message_to_gemini_parts(message)
+            if converted is None:
                 continue
-            
-            # Handle assistant messages with tool_calls
-            if role == "assistant" and "tool_calls" in message:
+            kind, parts = converted
+
+            if kind == "function_call":
                 # For assistant messages with tool calls, we need to add the function call parts
                 if current_parts:
                     contents.append(types.Content(role=current_role, parts=current_parts))
                     current_parts = []
-                
-                # Add text content if present
-                if content:
-                    current_parts.append(types.Part(text=content))
-                
-                # Add function call parts
-                for tool_call in message.get("tool_calls", []):
-                    func = tool_call.get("function", {})
-                    try:
-                        args = json.loads(func.get("arguments", "{}"))
-                    except json.JSONDecodeError:
-                        args = {}
-                    
-                    current_parts.append(types.Part(
-                        function_call=types.FunctionCall(
-                            name=func.get("name", ""),
-                            args=args
-                        )
-                    ))
-                
-                if current_parts:
-                    contents.append(types.Content(role="model", parts=current_parts))
-                    current_parts = []
+                if parts:
+                    contents.append(types.Content(role="model", parts=list(parts)))
                 continue
-            
-            # Map OpenAI roles to Gemini roles
-            gemini_role = "user" if role == "user" else "model"
-            
+
             # If role changed, save previous content
-            if current_role is not None and current_role != gemini_role and current_parts:
+            if current_role is not None and current_role != kind and current_parts:
                 contents.append(types.Content(role=current_role, parts=current_parts))
                 current_parts = []
-            
-            current_role = gemini_role
-            
-            # Handle content (can be string or list for multimodal)
-            if isinstance(content, str):
-                if content:
-                    current_parts.append(types.Part(text=content))
-            elif isinstance(content, list):
-                for item in content:
-                    if isinstance(item, dict):
-                        if item.get("type") == "text":
-                            current_parts.append(types.Part(text=item.get("text", "")))
-                        elif item.get("type") == "image_url":
-                            # Extract base64 data from data URL
-                            image_url = item.get("image_url", {}).get("url", "")
-                            if image_url.startswith("data:image"):
-                                # Format: data:image/png;base64,<base64_data>
-                                base64_data = image_url.split(",", 1)[1] if "," in image_url else ""
-                                if base64_data:
-                                    try:
-                                        image_data = base64.b64decode(base64_data)
-                                        mime_type = "image/png"  # Default
-                                        if "image/jpeg" in image_url or "image/jpg" in image_url:
-                                            mime_type = "image/jpeg"
-                                        elif "image/gif" in image_url:
-                                            mime_type = "image/gif"
-                                        elif "image/webp" in image_url:
-                                            mime_type = "image/webp"
-                                        
-                                        current_parts.append(types.Part(
-                                            inline_data=types.Blob(
-                                                mime_type=mime_type,
-                                                data=image_data
-                                            )
-                                        ))
-                                    except Exception as e:
-                                        logger.warning(f"Failed to decode image: {e}")
-        
+
+            current_role = kind
+            current_parts.extend(parts)
+
         # Add remaining content
         if current_parts:
             contents.append(types.Content(role=current_role, parts=current_parts))
-        
+
         return contents
 
-    def _make_api_call(self) -> Any:
-        """Make Gemini API call."""
+    def _sampling_params(self) -> Dict[str, Any]:
+        return {"thinking": bool(self.thinking)}
+
+    def _client_with_key(self, api_key: str) -> Any:
+        return genai.Client(api_key=api_key, **self._client_kwargs)
+
+    def _stream_generate_content(self, api_params: Dict[str, Any]) -> Any:
+        """Make a streamed generate_content call and merge the chunks into one response."""
+        monitor = self._begin_stream()
+        parts = []
+        function_calls = 0
+        last_chunk = None
+        stream = self.client.models.generate_content_stream(**api_params)
+        try:
+            for chunk in stream:
+                last_chunk = chunk
+                candidate = chunk.candidates[0] if chunk.candidates else None
+                if candidate is None or not candidate.content or not candidate.content.parts:
+                    continue
+                for part in candidate.content.parts:
+                    parts.append(part)
+                    if part.function_call:
+                        # Same ids as _handle_api_response assigns
+                        monitor.tool_call({
+                            "id": f"call_{function_calls}",
+                            "function": {"name": part.function_call.name or "", "arguments": json.dumps(part.function_call.args or {})},
+                        })
+                        function_calls += 1
+                    elif part.text:
+                        monitor.token()
+        finally:
+            # Drops the connection when the stream is abandoned, e.g. after losing a hedge race
+            stream.close()
+        if last_chunk is None:
+            raise RuntimeError(f"Stream from {self.model} returned no chunks")
+        finish_reason = last_chunk.candidates[0].finish_reason if last_chunk.candidates else None
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=parts), finish_reason=finish_reason)],
+            usage_metadata=last_chunk.usage_metadata,
+        )
+
+    def _prepare_api_call(self) -> Dict[str, Any]:
+        """Build the Gemini request; converted messages are cached across calls."""
         # Convert messages to Gemini contents format
         contents = self._convert_openai_messages_to_gemini_contents(self.messages)
         
@@ -3029,7 +3929,7 @@ class GeminiLLM(BaseLLM):
 
         # Add tools if in tool calling mode
         if self.use_tools and self.tools:
-            gemini_tools = self._convert_openai_tools_to_gemini(self.tools)
+            gemini_tools = compile_tools(self.tools, "gemini")
             if gemini_tools:
                 config_kwargs["tools"] = gemini_tools
 
@@ -3039,22 +3939,17 @@ class GeminiLLM(BaseLLM):
 
         if config_kwargs:
             api_params["config"] = types.GenerateContentConfig(**config_kwargs)
+        return api_params
 
-        response = self.client.models.generate_content(**api_params)
-        self.api_calls += 1
-        return response
+    def _send_api_call(self, request: Dict[str, Any]) -> Any:
+        if self.streaming:
+            return self._stream_generate_content(request)
+        return self.client.models.generate_content(**request)
     
-    def _handle_api_response(self, response: Any, attempt: int, max_attempts: int) -> Dict[str, Any]:
-        """Handle Gemini API response."""
-        # Extract response content
-        if not response.candidates:
-            raise ValueError("No candidates in Gemini response")
-        
-        candidate = response.candidates[0]
-        if not candidate.content or not candidate.content.parts:
-            raise ValueError("No content parts in Gemini response")
-
-        cost_info = CostTracker.track_gemini(response, self.model)
+    def _track_usage(self, response: Any, hedge: Dict[str, Any] | None = None) -> None:
+        # Counted here rather than when sending so replayed responses and hedge losers count too
+        self.api_calls += 1
+        cost_info = CostTracker.track_gemini(response, self.model, self._last_prompt_estimate)
         if cost_info:
             cost = float(cost_info["total_cost_usd"])
             tokens = cost_info["tokens"]
@@ -3070,12 +3965,23 @@ class GeminiLLM(BaseLLM):
             self.total_cost_input_cached_usd += float(breakdown["input_cached_usd"])
             self.total_cost_output_usd += float(breakdown["output_usd"])
 
-            self.per_call_costs.append(cost_info)
+            self._append_call_cost(cost_info, response, hedge)
             logger.info(
                 f"API call #{self.api_calls} cost: ${cost:.6f} ({cost_info.get('pricing_tier','')}) | "
                 f"in={tokens['prompt_token_count']} cached={tokens['cached_content_token_count']} "
                 f"out={tokens['candidates_token_count']} | Running total: ${self.total_cost:.6f}"
             )
+
+    def _handle_api_response(self, response: Any, attempt: int, max_attempts: int) -> Dict[str, Any]:
+        """Handle Gemini API response."""
+        self._track_usage(response)
+        # Extract response content
+        if not response.candidates:
+            raise ValueError("No candidates in Gemini response")
+        
+        candidate = response.candidates[0]
+        if not candidate.content or not candidate.content.parts:
+            raise ValueError("No content parts in Gemini response")
         
         # Check for function calls
         function_calls = []
@@ -3155,7 +4061,7 @@ class GeminiLLM(BaseLLM):
                     "content": error_message
                 })
                 # Retry by making another API call
-                return self._handle_api_response(self._make_api_call(), attempt + 1, max_attempts)
+                return self._handle_api_response(self._invoke_api(), attempt + 1, max_attempts)
         else:
             # Regular text response
             assistant_message = {"role": "assistant", "content": text_content}
@@ -3187,7 +4093,7 @@ class GeminiLLM(BaseLLM):
                     "content": correction_prompt
                 })
                 # Retry by making another API call
-                return self._handle_api_response(self._make_api_call(), attempt + 1, max_attempts)
+                return self._handle_api_response(self._invoke_api(), attempt + 1, max_attempts)
     
     def parse_tool_calls(self, tool_calls) -> Dict[str, Any]:
         """Parse tool calls from Gemini API response into action format.
@@ -3219,6 +4125,7 @@ class GeminiLLM(BaseLLM):
         """Clear the message history."""
         logger.debug(f"Clearing message history ({len(self.messages)} messages removed)")
         self.messages = []
+        self._gemini_parts_cache = []
 
     def add_tool_message(self, tool_call_id: str, content: str) -> None:
         """Append tool call results to the conversation history for Gemini tool-calling compliance."""
@@ -3291,6 +4198,9 @@ class GeminiLLM(BaseLLM):
                         if has_images:
                             # Remove images, keep only text
                             self.messages[i] = self._remove_images_from_message(self.messages[i])
+                            # The cached conversion still holds the image parts
+                            if i < len(self._gemini_parts_cache):
+                                self._gemini_parts_cache[i] = (None, None, None)
                             logger.debug(f"Removed images from old user message at index {i}")
 
 
@@ -0,0 +1,363 @@
+"""
+Docker backends used to build images and manage sandbox containers.
+
+``DockerCLIBackend`` shells out to the ``docker`` CLI. ``DockerEngineBackend``
+talks to the Docker Engine API over the daemon's unix socket with a small pool
+of keep-alive connections, which avoids forking a CLI process per operation when
+many workers start containers at the same time. Select one with
+``sandbox.docker_backend`` (``"cli"`` or ``"engine"``).
+"""
+
+import http.client
+import io
+import json
+import os
+import queue
+import socket
+import struct
+import subprocess
+import tarfile
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+from .utils import get_logger
+
+logger = get_logger("docker_backend")
+
+DEFAULT_DOCKER_SOCKET = "/var/run/docker.sock"
+SANDBOX_CONTAINER_PORT = 8080
+
+
+class DockerBackendError(RuntimeError):
+    """Raised when the Docker daemon rejects a request."""
+
+
+def build_context_tar(context_dir: str | Path) -> bytes:
+    """Pack a build context directory into an in-memory tar archive."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        tar.add(str(context_dir), arcname=".")
+    return buffer.getvalue()
+
+
+def _owned_by_root(info: tarfile.TarInfo) -> tarfile.TarInfo:
+    info.uid = info.gid = 0
+    info.uname = info.gname = "root"
+    return info
+
+
+def path_tar(host_path: str | Path, arcname: str) -> bytes:
+    """Pack a host file or directory into an in-memory tar archive under ``arcname``.
+
+    Entries are owned by root, which is what a plain ``docker cp`` leaves in the
+    container; ``put_archive`` keeps the ownership recorded in the archive.
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        tar.add(str(host_path), arcname=arcname, filter=_owned_by_root)
+    return buffer.getvalue()
+
+
+class DockerCLIBackend:
+    """Docker operations implemented with the ``docker`` CLI."""
+
+    name = "cli"
+
+    def _run(self, args: list[str], timeout: int = 120, **kwargs) -> subprocess.CompletedProcess:
+        return subprocess.run(["docker", *args], capture_output=True, timeout=timeout, **kwargs)
+
+    def image_exists(self, tag: str) -> bool:
+        return self._run(["image", "inspect", tag], timeout=30).returncode == 0
+
+    def build_image(
+        self,
+        tag: str,
+        context_dir: str | Path,
+        dockerfile: str = "Dockerfile",
+        timeout: int = 120,
+        nocache: bool = False,
+    ) -> None:
+        args = ["build", "-t", tag, "-f", str(Path(context_dir) / dockerfile)]
+        if nocache:
+            args.append("--no-cache")
+        result = self._run(
+            [*args, str(context_dir)],
+            timeout=timeout,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise DockerBackendError(result.stderr)
+
+    def run_container(
+        self,
+        name: str,
+        image: str,
+        host_port: int | None = None,
+        labels: Dict[str, str] | None = None,
+    ) -> None:
+        args = ["run", "-d", "--name", name]
+        for key, value in (labels or {}).items():
+            args += ["--label", f"{key}={value}"]
+        # A host_port of None lets Docker pick a free port
+        port_mapping = f"{host_port}:{SANDBOX_CONTAINER_PORT}" if host_port else str(SANDBOX_CONTAINER_PORT)
+        args += ["--security-opt", "seccomp=unconfined", "-p", port_mapping, "-i", "-t", image]
+        result = self._run(args, text=True)
+        if result.returncode != 0:
+            raise DockerBackendError(result.stderr.strip())
+
+    def container_host_port(self, name: str, container_port: int = SANDBOX_CONTAINER_PORT) -> Optional[int]:
+        result = self._run(["port", name, str(container_port)], timeout=30, text=True)
+        if result.returncode != 0 or not result.stdout.strip():
+            return None
+        return int(result.stdout.strip().splitlines()[0].rsplit(":", 1)[1])
+
+    def exec(self, name: str, cmd: list[str], timeout: int = 30, user: str | None = None) -> Tuple[int, str]:
+        args = ["exec"] + (["-u", user] if user else []) + [name, *cmd]
+        result = self._run(args, timeout=timeout, text=True)
+        return result.returncode, result.stdout + result.stderr
+
+    def put_archive(self, name: str, path: str, data: bytes, timeout: int = 60) -> None:
+        # "-" reads a tar stream from stdin and keeps the ownership recorded in it (-a)
+        result = self._run(["cp", "-a", "-", f"{name}:{path}"], timeout=timeout, input=data)
+        if result.returncode != 0:
+            raise DockerBackendError(result.stderr.decode(errors="replace").strip())
+
+    def remove_container(self, name: str, timeout: int = 60) -> bool:
+        result = self._run(["rm", "-f", name], timeout=timeout, text=True)
+        if result.returncode != 0 and "No such container" not in result.stderr:
+            logger.warning(f"Failed to remove container {name}: {result.stderr.strip()}")
+            return False
+        return True
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that connects to a unix domain socket."""
+
+    def __init__(self, socket_path: str, timeout: float = 120):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class DockerEngineBackend:
+    """Docker operations implemented against the Engine API over the unix socket."""
+
+    name = "engine"
+
+    def __init__(self, socket_path: str | None = None, max_connections: int = 8, timeout: float = 120):
+        """Initialize the backend.
+
+        Args:
+            socket_path: Docker daemon socket (default: DOCKER_HOST unix socket or /var/run/docker.sock)
+            max_connections: Idle keep-alive connections kept for reuse
+            timeout: Socket timeout in seconds for a single request
+        """
+        if socket_path is None:
+            docker_host = os.environ.get("DOCKER_HOST", "")
+            socket_path = docker_host[len("unix://"):] if docker_host.startswith("unix://") else DEFAULT_DOCKER_SOCKET
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[_UnixHTTPConnection]" = queue.LifoQueue(maxsize=max_connections)
+
+    def _acquire(self, timeout: float | None) -> _UnixHTTPConnection:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = _UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout or self.timeout)
+        conn.timeout = timeout or self.timeout
+        return conn
+
+    def _release(self, conn: _UnixHTTPConnection, reusable: bool) -> None:
+        if reusable:
+            try:
+                self._idle.put_nowait(conn)
+                return
+            except queue.Full:
+                pass
+        conn.close()
+
+    def _request(
+        self,
+        method: str,
+        path: str,
+        params: Dict[str, Any] | None = None,
+        body: Any = None,
+        headers: Dict[str, str] | None = None,
+        timeout: float | None = None,
+    ) -> Tuple[int, bytes]:
+        """Send one API request and return ``(status, body)``, reusing pooled connections."""
+        url = path + (f"?{urlencode(params)}" if params else "")
+        request_headers = dict(headers or {})
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+            request_headers.setdefault("Content-Type", "application/json")
+
+        for attempt in range(2):
+            conn = self._acquire(timeout)
+            reused = conn.sock is not None
+            try:
+                conn.request(method, url, body=body, headers=request_headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (ConnectionError, http.client.RemoteDisconnected, BrokenPipeError) as e:
+                conn.close()
+                # A pooled keep-alive connection may have been closed by the daemon; retry on a fresh one
+                if reused and attempt == 0:
+                    continue
+                raise DockerBackendError(f"Docker API {method} {path} failed: {e}") from e
+            except Exception:
+                conn.close()
+                raise
+            self._release(conn, reusable=not response.will_close)
+            return response.status, data
+        raise DockerBackendError(f"Docker API {method} {path} failed")
+
+    @staticmethod
+    def _error_message(data: bytes) -> str:
+        try:
+            return json.loads(data).get("message", "")
+        except (ValueError, AttributeError):
+            return data.decode(errors="replace").strip()
+
+    def image_exists(self, tag: str) -> bool:
+        status, _ = self._request("GET", f"/images/{quote(tag, safe='')}/json", timeout=30)
+        return status == 200
+
+    def build_image(
+        self,
+        tag: str,
+        context_dir: str | Path,
+        dockerfile: str = "Dockerfile",
+        timeout: int = 120,
+        nocache: bool = False,
+    ) -> None:
+        status, data = self._request(
+            "POST",
+            "/build",
+            params={"t": tag, "dockerfile": dockerfile, "rm": 1, "nocache": int(nocache)},
+            body=build_context_tar(context_dir),
+            headers={"Content-Type": "application/x-tar"},
+            timeout=timeout,
+        )
+        if status != 200:
+            raise DockerBackendError(self._error_message(data))
+        # The build streams one JSON object per line; failures arrive as an "error" entry
+        for line in data.splitlines():
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if "error" in message:
+                raise DockerBackendError(str(message.get("error")).strip())
+
+    def run_container(
+        self,
+        name: str,
+        image: str,
+        host_port: int | None = None,
+        labels: Dict[str, str] | None = None,
+    ) -> None:
+        port_key = f"{SANDBOX_CONTAINER_PORT}/tcp"
+        spec = {
+            "Image": image,
+            "Tty": True,
+            "OpenStdin": True,
+            "Labels": labels or {},
+            "ExposedPorts": {port_key: {}},
+            "HostConfig": {
+                "SecurityOpt": ["seccomp=unconfined"],
+                # An empty HostPort lets Docker pick a free port
+                "PortBindings": {port_key: [{"HostPort": str(host_port) if host_port else ""}]},
+            },
+        }
+        status, data = self._request("POST", "/containers/create", params={"name": name}, body=spec)
+        if status == 409:
+            # Same fixed name as compose would use; replace a stale container like `compose up` does
+            logger.info(f"Replacing existing container {name}")
+            self.remove_container(name)
+            status, data = self._request("POST", "/containers/create", params={"name": name}, body=spec)
+        if status != 201:
+            raise DockerBackendError(self._error_message(data))
+
+        status, data = self._request("POST", f"/containers/{name}/start")
+        if status not in (204, 304):
+            self.remove_container(name)
+            raise DockerBackendError(self._error_message(data))
+
+    def container_host_port(self, name: str, container_port: int = SANDBOX_CONTAINER_PORT) -> Optional[int]:
+        status, data = self._request("GET", f"/containers/{name}/json", timeout=30)
+        if status != 200:
+            return None
+        ports = (json.loads(data).get("NetworkSettings") or {}).get("Ports") or {}
+        bindings = ports.get(f"{container_port}/tcp") or []
+        return int(bindings[0]["HostPort"]) if bindings else None
+
+    @staticmethod
+    def _demultiplex(data: bytes) -> str:
+        """Join stdout/stderr frames of a non-TTY attach stream."""
+        chunks = []
+        offset = 0
+        while offset + 8 <= len(data):
+            _, size = struct.unpack(">BxxxL", data[offset:offset + 8])
+            chunks.append(data[offset + 8:offset + 8 + size])
+            offset += 8 + size
+        return b"".join(chunks).decode(errors="replace")
+
+    def exec(self, name: str, cmd: list[str], timeout: int = 30, user: str | None = None) -> Tuple[int, str]:
+        spec: Dict[str, Any] = {"Cmd": cmd, "AttachStdout": True, "AttachStderr": True}
+        if user:
+            spec["User"] = user
+        status, data = self._request("POST", f"/containers/{name}/exec", body=spec, timeout=timeout)
+        if status != 201:
+            raise DockerBackendError(self._error_message(data))
+        exec_id = json.loads(data)["Id"]
+
+        status, data = self._request(
+            "POST", f"/exec/{exec_id}/start", body={"Detach": False, "Tty": False}, timeout=timeout
+        )
+        if status != 200:
+            raise DockerBackendError(self._error_message(data))
+        output = self._demultiplex(data)
+
+        status, info = self._request("GET", f"/exec/{exec_id}/json", timeout=timeout)
+        exit_code = json.loads(info).get("ExitCode", -1) if status == 200 else -1
+        return exit_code, output
+
+    def put_archive(self, name: str, path: str, data: bytes, timeout: int = 60) -> None:
+        status, body = self._request(
+            "PUT",
+            f"/containers/{name}/archive",
+            # copyUIDGID keeps the uid/gid recorded in the tar entries, like `docker cp -a`
+            params={"path": path, "copyUIDGID": "true"},
+            body=data,
+            headers={"Content-Type": "application/x-tar"},
+            timeout=timeout,
+        )
+        if status != 200:
+            raise DockerBackendError(self._error_message(body))
+
+    def remove_container(self, name: str, timeout: int = 60) -> bool:
+        status, data = self._request("DELETE", f"/containers/{name}", params={"force": 1, "v": 1}, timeout=timeout)
+        if status not in (204, 404):
+            logger.warning(f"Failed to remove container {name}: {self._error_message(data)}")
+            return False
+        return True
+
+
+def create_docker_backend(sandbox_config: Dict[str, Any] | None = None) -> DockerCLIBackend | DockerEngineBackend:
+    """Create the backend selected by ``sandbox.docker_backend`` (default: ``"cli"``)."""
+    sandbox_config = sandbox_config or {}
+    backend = sandbox_config.get("docker_backend", "cli")
+    if backend == "engine":
+        return DockerEngineBackend(socket_path=sandbox_config.get("docker_socket"))
+    if backend != "cli":
+        logger.warning(f"Unknown docker_backend '{backend}', falling back to the docker CLI")
+    return DockerCLIBackend()
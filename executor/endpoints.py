@@ -0,0 +1,204 @@
+"""
+Load balancing across replicas of an OpenAI-compatible backend.
+
+Self-hosted models (Qwen, GLM, Kimi on vLLM/SGLang) are often served by several
+identical replicas. With ``controller.args.base_urls`` an ``EndpointPool``
+spreads calls over them:
+
+- least outstanding requests: each call goes to the healthy replica with the
+  fewest calls in flight from this process
+- sticky routing: calls carrying the same routing key (one per task) prefer
+  the same replica, chosen by rendezvous hashing, so the replica's prefix cache
+  keeps the task's growing history; a call only spills over to another replica
+  when its own has ``sticky_slack`` more calls in flight than the least busy one
+- health ejection: a replica that fails ``eject_after`` calls in a row with
+  server, timeout or connection errors is skipped for ``eject_seconds``; after
+  that it gets a single probe call, and another failure ejects it again
+
+Pools are shared by every controller in the process that uses the same
+replicas and key, so concurrent agent loops (``async_inference``) see each
+other's in-flight calls.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from .retry import CONNECTION_ERROR, SERVER_ERROR, TIMEOUT, classify_error
+from .utils import get_logger
+
+logger = get_logger("endpoints")
+
+# Error kinds that say something about the replica rather than the request or the quota
+UNHEALTHY_ERRORS = frozenset({SERVER_ERROR, TIMEOUT, CONNECTION_ERROR})
+
+_POOLS: Dict[Tuple[Any, ...], "EndpointPool"] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def resolve_base_urls(llm_config: Dict[str, Any], **kwargs: Any) -> List[str]:
+    """Replica URLs from ``base_urls`` in the config or kwargs, or the comma-separated ``VLLM_BASE_URLS``."""
+    base_urls = llm_config.get("base_urls") or kwargs.get("base_urls") or os.getenv("VLLM_BASE_URLS") or []
+    if isinstance(base_urls, str):
+        base_urls = base_urls.split(",")
+    # Keep the configured order but drop blanks and duplicates
+    return list(dict.fromkeys(url.strip() for url in base_urls if url and url.strip()))
+
+
+class Endpoint:
+    """One replica with its client and health state."""
+
+    def __init__(self, url: str, client: Any):
+        self.url = url
+        self.client = client
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+
+class EndpointPool:
+    """Routes calls over a fixed set of replicas."""
+
+    def __init__(
+        self,
+        base_urls: List[str],
+        make_client: Callable[[str], Any],
+        eject_after: int = 3,
+        eject_seconds: float = 30.0,
+        sticky_slack: int = 2,
+    ):
+        """Initialize the pool.
+
+        Args:
+            base_urls: Replica base URLs
+            make_client: Builds the API client for a base URL
+            eject_after: Consecutive unhealthy failures before a replica is skipped
+            eject_seconds: How long an ejected replica is skipped before it is probed again
+            sticky_slack: Extra in-flight calls tolerated on a call's preferred replica before it spills over
+        """
+        if not base_urls:
+            raise ValueError("EndpointPool needs at least one base URL")
+        self.endpoints = [Endpoint(url, make_client(url)) for url in base_urls]
+        self.eject_after = max(1, int(eject_after))
+        self.eject_seconds = float(eject_seconds)
+        self.sticky_slack = max(0, int(sticky_slack))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(
+        cls,
+        llm_config: Dict[str, Any],
+        make_client: Callable[[str], Any],
+        api_key: str = "",
+        **kwargs: Any,
+    ) -> "EndpointPool | None":
+        """Return the process-wide pool for ``controller.args.base_urls``, or None if it is not set.
+
+        Controllers with the same replicas and API key share one pool.
+        """
+        base_urls = resolve_base_urls(llm_config, **kwargs)
+        if not base_urls:
+            return None
+        balancing = llm_config.get("load_balancing") or {}
+        key = (
+            tuple(base_urls),
+            hashlib.sha256((api_key or "").encode()).hexdigest(),
+            balancing.get("eject_after", 3),
+            balancing.get("eject_seconds", 30.0),
+            balancing.get("sticky_slack", 2),
+        )
+        with _POOLS_LOCK:
+            pool = _POOLS.get(key)
+            if pool is None:
+                pool = cls(
+                    base_urls,
+                    make_client,
+                    eject_after=key[2],
+                    eject_seconds=key[3],
+                    sticky_slack=key[4],
+                )
+                _POOLS[key] = pool
+                logger.info(f"Balancing over {len(base_urls)} endpoint(s): {', '.join(base_urls)}")
+        return pool
+
+    @property
+    def urls(self) -> List[str]:
+        return [endpoint.url for endpoint in self.endpoints]
+
+    @staticmethod
+    def _affinity(routing_key: str, endpoint: Endpoint) -> bytes:
+        return hashlib.sha256(f"{routing_key}|{endpoint.url}".encode()).digest()
+
+    def _select(self, routing_key: str | None, exclude: Tuple[str, ...]) -> Endpoint:
+        now = time.monotonic()
+        candidates = [endpoint for endpoint in self.endpoints if endpoint.url not in exclude] or self.endpoints
+        healthy = [endpoint for endpoint in candidates if endpoint.available(now)]
+        if not healthy:
+            # Everything is ejected; try the replica that comes back first rather than failing the call
+            return min(candidates, key=lambda endpoint: endpoint.ejected_until)
+        least_busy = min(healthy, key=lambda endpoint: endpoint.outstanding)
+        if routing_key is None:
+            return least_busy
+        preferred = max(healthy, key=lambda endpoint: self._affinity(routing_key, endpoint))
+        if preferred.outstanding - least_busy.outstanding > self.sticky_slack:
+            return least_busy
+        return preferred
+
+    def acquire(self, routing_key: str | None = None, exclude: Tuple[str, ...] = ()) -> Endpoint:
+        """Pick a replica for one call and count the call as in flight on it.
+
+        Args:
+            routing_key: Calls with the same key prefer the same replica, e.g. one key per task
+            exclude: URLs not to use unless nothing else is left
+
+        Returns:
+            The endpoint; pass it to ``release`` when the call finished
+        """
+        with self._lock:
+            endpoint = self._select(routing_key, exclude)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            if endpoint.consecutive_failures >= self.eject_after:
+                # Probe of an ejected replica: keep other calls off it until this one has answered
+                endpoint.ejected_until = time.monotonic() + self.eject_seconds
+            return endpoint
+
+    def release(self, endpoint: Endpoint, error: BaseException | None = None) -> None:
+        """Finish a call started with ``acquire`` and update the replica's health."""
+        with self._lock:
+            endpoint.outstanding = max(0, endpoint.outstanding - 1)
+            if error is None:
+                if endpoint.consecutive_failures >= self.eject_after:
+                    logger.info(f"Endpoint {endpoint.url} recovered")
+                endpoint.consecutive_failures = 0
+                endpoint.ejected_until = 0.0
+                return
+            if classify_error(error) not in UNHEALTHY_ERRORS:
+                return
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.eject_after:
+                endpoint.ejected_until = time.monotonic() + self.eject_seconds
+                logger.warning(
+                    f"Ejecting endpoint {endpoint.url} for {self.eject_seconds:.0f}s after "
+                    f"{endpoint.consecutive_failures} consecutive failures: {error}"
+                )
+
+    @contextmanager
+    def lease(self, routing_key: str | None = None, exclude: Tuple[str, ...] = ()) -> Iterator[Endpoint]:
+        """``acquire`` an endpoint for the duration of a call and ``release`` it with the call's outcome."""
+        endpoint = self.acquire(routing_key, exclude)
+        try:
+            yield endpoint
+        except BaseException as e:
+            self.release(endpoint, e)
+            raise
+        self.release(endpoint)
@@ -0,0 +1,246 @@
+"""
+Hedged LLM requests for tail-latency control.
+
+Provider latency has a heavy tail: most calls return in a few seconds, a few
+take minutes, and each of those stalls an agent iteration. With
+``controller.args.hedging`` a call that is still running after a high
+percentile of recent call latencies gets a duplicate request, sent to another
+replica (``base_urls``) or with an alternate API key when one is configured.
+The first response to arrive is used and the other request is cancelled:
+
+- a streamed request is abandoned at its next chunk and its connection closed;
+  its prompt is still billed, so its cost is estimated from the prompt size
+- a non-streamed request cannot be interrupted; it finishes in the background
+  and its reported usage is recorded when it arrives, or, if it is still
+  running ``loser_timeout`` seconds after the task's costs are reported, its
+  prompt cost is estimated
+
+Hedging delays come from ``LatencyHistogram``, a rolling window of recent call
+latencies shared by every controller of the same provider and model in the
+process. No call is hedged until the window holds ``min_samples`` latencies.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, Dict, Tuple
+
+from .logger import with_current_context
+from .streaming import StreamMonitor
+from .utils import get_logger
+
+logger = get_logger("hedging")
+
+PRIMARY = "primary"
+DUPLICATE = "duplicate"
+
+_HISTOGRAMS: Dict[Tuple[str, str], "LatencyHistogram"] = {}
+_HISTOGRAMS_LOCK = threading.Lock()
+
+
+class LatencyHistogram:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=max(1, int(window)))
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(float(seconds))
+
+    def percentile(self, percent: float) -> float | None:
+        """Nearest-rank percentile of the window, or None while it is empty."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = min(len(samples) - 1, max(0, round(percent / 100 * len(samples)) - 1))
+        return samples[rank]
+
+
+def latency_histogram(provider: str, model: str, window: int = 200) -> LatencyHistogram:
+    """Process-wide histogram for a provider and model."""
+    with _HISTOGRAMS_LOCK:
+        histogram = _HISTOGRAMS.get((provider, model))
+        if histogram is None:
+            histogram = _HISTOGRAMS[(provider, model)] = LatencyHistogram(window)
+        return histogram
+
+
+class HedgePolicy:
+    """When to send a duplicate request."""
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        min_samples: int = 20,
+        min_delay: float = 1.0,
+        max_delay: float | None = None,
+        window: int = 200,
+        api_key: str | None = None,
+        loser_timeout: float = 30.0,
+    ):
+        """Initialize the policy.
+
+        Args:
+            percentile: Latency percentile after which a running call is hedged
+            min_samples: Latencies needed in the histogram before any call is hedged
+            min_delay: Lower bound of the hedging delay in seconds
+            max_delay: Upper bound of the hedging delay in seconds, or None
+            window: Number of recent latencies the histogram keeps
+            api_key: Alternate API key for duplicates, used when there is no other replica
+            loser_timeout: Seconds cost reporting waits for losing requests still in flight
+        """
+        self.percentile = float(percentile)
+        self.min_samples = max(1, int(min_samples))
+        self.min_delay = float(min_delay)
+        self.max_delay = float(max_delay) if max_delay is not None else None
+        self.window = int(window)
+        self.api_key = api_key
+        self.loser_timeout = float(loser_timeout)
+
+    @classmethod
+    def from_config(cls, llm_config: Dict[str, Any]) -> "HedgePolicy | None":
+        """Build the policy from ``controller.args.hedging``, or None if hedging is off."""
+        hedge_config = llm_config.get("hedging") or {}
+        if not hedge_config or not hedge_config.get("enabled", True):
+            return None
+        return cls(
+            percentile=hedge_config.get("percentile", 95.0),
+            min_samples=hedge_config.get("min_samples", 20),
+            min_delay=hedge_config.get("min_delay", 1.0),
+            max_delay=hedge_config.get("max_delay"),
+            window=hedge_config.get("window", 200),
+            api_key=hedge_config.get("api_key"),
+            loser_timeout=hedge_config.get("loser_timeout", 30.0),
+        )
+
+    def delay(self, histogram: LatencyHistogram) -> float | None:
+        """Seconds to wait before hedging, or None while the histogram has too few samples."""
+        if len(histogram) < self.min_samples:
+            return None
+        delay = max(self.min_delay, histogram.percentile(self.percentile) or 0.0)
+        if self.max_delay is not None:
+            delay = min(delay, self.max_delay)
+        return delay
+
+
+class RequestCancelled(Exception):
+    """Raised inside a streamed request that lost a hedge race."""
+
+
+class ApiAttempt:
+    """One in-flight provider request; the controller code running it sees it as its current attempt."""
+
+    def __init__(self, role: str = PRIMARY, duplicate_of: "ApiAttempt | None" = None):
+        self.role = role
+        # The request a hedged duplicate races against
+        self.duplicate_of = duplicate_of
+        self.started = time.monotonic()
+        self.cancelled = threading.Event()
+        # Client override for this request, e.g. the replica or alternate key it goes to, and that replica's URL
+        self.client: Any = None
+        self.endpoint_url: str | None = None
+        self.monitor: StreamMonitor | None = None
+        # Prompt estimate, for the cost of a cancelled request
+        self.prompt_tokens = 0
+        self._allow_dispatch = role == PRIMARY
+        self._lock = threading.Lock()
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    def check_cancelled(self) -> None:
+        """Raise ``RequestCancelled`` if the request lost its hedge race."""
+        if self.cancelled.is_set():
+            raise RequestCancelled(f"{self.role} request cancelled")
+
+    def attach_monitor(self, monitor: StreamMonitor) -> None:
+        with self._lock:
+            if not self._allow_dispatch:
+                monitor.cancel_dispatch()
+            self.monitor = monitor
+
+    def stop_early_dispatch(self) -> bool:
+        """Stop this request from starting actions early, unless it already started some.
+
+        Returns:
+            True if no action was started, so a duplicate may race it
+        """
+        with self._lock:
+            if self.monitor is not None and not self.monitor.cancel_dispatch():
+                return False
+            self._allow_dispatch = False
+            return True
+
+
+def _start(run: Callable[[ApiAttempt], Any], attempt: ApiAttempt) -> Future:
+    # Daemon threads: an abandoned non-streamed request must not keep the process alive
+    future: Future = Future()
+
+    def target() -> None:
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(run(attempt))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=with_current_context(target), name=f"llm-{attempt.role}", daemon=True).start()
+    return future
+
+
+def run_hedged(
+    run: Callable[[ApiAttempt], Any],
+    primary: ApiAttempt,
+    delay: float,
+    start_duplicate: Callable[[ApiAttempt], bool],
+    on_abandoned: Callable[[ApiAttempt, Future], None],
+) -> Tuple[Any, ApiAttempt]:
+    """Run ``primary`` and race a duplicate against it if it takes longer than ``delay``.
+
+    Both attempts run ``run`` on helper threads at the same time, so it must only
+    send a request prepared beforehand and not update shared state.
+
+    Args:
+        run: Makes the request described by an attempt and returns the response
+        primary: The original request
+        delay: Seconds to wait before sending the duplicate
+        start_duplicate: Called with the primary once the delay passed; returns False to not hedge
+        on_abandoned: Receives the losing attempt and its future once the winner is known
+
+    Returns:
+        ``(response, winning attempt)``
+
+    Raises:
+        Exception: The primary's error if no attempt succeeded
+    """
+    futures = {_start(run, primary): primary}
+    done, _ = wait(futures, timeout=delay)
+    if not done and start_duplicate(primary):
+        duplicate = ApiAttempt(DUPLICATE, duplicate_of=primary)
+        duplicate.prompt_tokens = primary.prompt_tokens
+        futures[_start(run, duplicate)] = duplicate
+
+    errors: Dict[str, BaseException] = {}
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            attempt = futures[future]
+            error = future.exception()
+            if error is not None:
+                errors[attempt.role] = error
+                if pending:
+                    logger.info(f"Hedged {attempt.role} request failed ({error}); waiting for the other one")
+                continue
+            for loser_future in pending:
+                loser = futures[loser_future]
+                loser.cancel()
+                on_abandoned(loser, loser_future)
+            return future.result(), attempt
+    raise errors.get(PRIMARY) or errors[DUPLICATE]
@@ -0,0 +1,225 @@
+"""
+Content-addressed image cache for task sandboxes.
+
+Most task Dockerfiles are the same one-line ``FROM ghcr.io/agent-infra/sandbox:latest``.
+Instead of running ``docker compose build --no-cache`` for every task, images are
+tagged with a hash of the Dockerfile plus the build-context files it copies, so tasks
+with identical contexts share one image and the build is skipped when that tag
+already exists locally.
+"""
+
+import fcntl
+import hashlib
+import json
+import shlex
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from .docker_backend import DockerBackendError, DockerCLIBackend
+from .utils import get_logger
+
+logger = get_logger("image_cache")
+
+IMAGE_CACHE_REPOSITORY = "cocoa-task-cache"
+DEFAULT_LOCK_DIR = Path(tempfile.gettempdir()) / "cocoa-agent-image-locks"
+_WILDCARD_CHARS = set("*?[")
+
+
+def _normalize_dockerfile(text: str) -> str:
+    """Drop blank lines and trailing whitespace so cosmetic differences share a hash."""
+    lines = [line.rstrip() for line in text.splitlines()]
+    return "\n".join(line for line in lines if line)
+
+
+def _iter_instructions(text: str) -> Iterator[tuple[str, str]]:
+    """Yield ``(INSTRUCTION, arguments)`` pairs, joining backslash continuations."""
+    pending = ""
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not pending and (not line or line.startswith("#")):
+            continue
+        if line.endswith("\\"):
+            pending += line[:-1] + " "
+            continue
+        line = pending + line
+        pending = ""
+        parts = line.split(None, 1)
+        yield parts[0].upper(), parts[1] if len(parts) > 1 else ""
+    if pending.strip():
+        parts = pending.split(None, 1)
+        yield parts[0].upper(), parts[1] if len(parts) > 1 else ""
+
+
+def _split_copy_arguments(arguments: str) -> List[str]:
+    """Split COPY/ADD arguments in either shell or JSON-array form."""
+    stripped = arguments.strip()
+    if stripped.startswith("["):
+        try:
+            tokens = json.loads(stripped)
+            if isinstance(tokens, list):
+                return [str(token) for token in tokens]
+        except json.JSONDecodeError:
+            pass
+    return shlex.split(stripped)
+
+
+def copy_sources(dockerfile_text: str) -> Optional[List[str]]:
+    """Return the build-context paths referenced by COPY/ADD instructions.
+
+    Returns None when a source cannot be resolved statically (``.``, wildcards),
+    in which case the whole build context has to be hashed.
+    """
+    sources: List[str] = []
+    for instruction, arguments in _iter_instructions(dockerfile_text):
+        if instruction not in ("COPY", "ADD"):
+            continue
+        tokens = _split_copy_arguments(arguments)
+        flags = [token for token in tokens if token.startswith("--")]
+        paths = [token for token in tokens if not token.startswith("--")]
+        if any(flag.startswith("--from") for flag in flags):
+            # Copies from another build stage or image, not from the context
+            continue
+        for source in paths[:-1]:
+            if "://" in source:
+                # Remote ADD sources are identified by the URL in the Dockerfile text
+                continue
+            normalized = source.lstrip("/").rstrip("/")
+            if normalized in ("", ".") or _WILDCARD_CHARS & set(normalized):
+                return None
+            sources.append(normalized)
+    return sources
+
+
+def _iter_context_files(context_dir: Path, sources: Optional[List[str]]) -> List[Path]:
+    if sources is None:
+        candidates = [path for path in context_dir.rglob("*") if path.is_file()]
+    else:
+        candidates = []
+        for source in sources:
+            path = context_dir / source
+            if path.is_dir():
+                candidates.extend(child for child in path.rglob("*") if child.is_file())
+            elif path.is_file():
+                candidates.append(path)
+            else:
+                logger.warning(f"COPY source '{source}' not found in build context {context_dir}")
+    return sorted(set(candidates))
+
+
+def compute_build_hash(task_dir: str | Path, dockerfile: str = "Dockerfile") -> str:
+    """Hash a task's Dockerfile together with the context files it copies.
+
+    Args:
+        task_dir: Task directory used as the docker build context
+        dockerfile: Dockerfile name relative to task_dir
+
+    Returns:
+        Hex SHA-256 digest identifying the image this context builds
+    """
+    context_dir = Path(task_dir)
+    dockerfile_text = (context_dir / dockerfile).read_text()
+
+    digest = hashlib.sha256()
+    digest.update(b"dockerfile\0")
+    digest.update(_normalize_dockerfile(dockerfile_text).encode("utf-8"))
+
+    for path in _iter_context_files(context_dir, copy_sources(dockerfile_text)):
+        digest.update(b"\0file\0")
+        digest.update(path.relative_to(context_dir).as_posix().encode("utf-8"))
+        digest.update(b"\0")
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class ImageCache:
+    """Builds task images at most once per distinct Dockerfile + context hash."""
+
+    def __init__(self, lock_dir: str | Path | None = None, build_timeout: int = 120, backend=None):
+        """Initialize the image cache.
+
+        Args:
+            lock_dir: Directory for per-hash build lock files shared by all workers
+            build_timeout: Timeout in seconds for a single ``docker build``
+            backend: Docker backend used to inspect and build images (default: docker CLI)
+        """
+        self.lock_dir = Path(lock_dir) if lock_dir else DEFAULT_LOCK_DIR
+        self.build_timeout = build_timeout
+        self.backend = backend or DockerCLIBackend()
+
+    @staticmethod
+    def image_tag(build_hash: str) -> str:
+        """Return the local image tag for a build hash."""
+        return f"{IMAGE_CACHE_REPOSITORY}:{build_hash[:16]}"
+
+    def image_exists(self, tag: str) -> bool:
+        """Check whether an image tag already exists in the local Docker daemon."""
+        return self.backend.image_exists(tag)
+
+    @contextmanager
+    def _build_lock(self, build_hash: str):
+        """Serialize builds of the same hash across threads and worker processes."""
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_dir / f"{build_hash}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def ensure_image(self, task_dir: str | Path, dockerfile: str = "Dockerfile") -> Optional[str]:
+        """Return a local image tag for the task, building it only on a cache miss.
+
+        Args:
+            task_dir: Task directory containing the Dockerfile
+            dockerfile: Dockerfile name relative to task_dir
+
+        Returns:
+            Image tag, or None if the build failed
+        """
+        build_hash = compute_build_hash(task_dir, dockerfile)
+        tag = self.image_tag(build_hash)
+
+        if self.image_exists(tag):
+            logger.info(f"Image cache hit for {task_dir}: {tag}")
+            return tag
+
+        with self._build_lock(build_hash):
+            # Another worker may have finished the same build while we waited
+            if self.image_exists(tag):
+                logger.info(f"Image cache hit for {task_dir} after waiting for build: {tag}")
+                return tag
+
+            logger.info(f"Image cache miss for {task_dir}, building {tag}")
+            try:
+                self.backend.build_image(tag, task_dir, dockerfile, timeout=self.build_timeout)
+            except (subprocess.TimeoutExpired, TimeoutError):
+                logger.error(f"Building {tag} timed out after {self.build_timeout} seconds")
+                return None
+            except DockerBackendError as e:
+                logger.error(f"Failed to build {tag}: {e}")
+                return None
+
+        logger.info(f"Built and cached image {tag}")
+        return tag
+
+    def ensure_dockerfile_image(self, dockerfile_text: str) -> Optional[str]:
+        """Return a cached image for a Dockerfile that copies nothing from a build context.
+
+        Hashes the same way as a task directory holding only this Dockerfile, so
+        e.g. ``FROM <base>`` resolves to the image plain tasks already share.
+
+        Args:
+            dockerfile_text: Dockerfile contents
+
+        Returns:
+            Image tag, or None if the build failed
+        """
+        with tempfile.TemporaryDirectory(prefix="cocoa-image-") as context_dir:
+            (Path(context_dir) / "Dockerfile").write_text(dockerfile_text + "\n")
+            return self.ensure_image(context_dir)
@@ -3,8 +3,12 @@ Unified logging configuration for the executor environment.
 Provides consistent log formatting and logger management across all modules.
 """
 
+import functools
 import logging
-from typing import Optional
+import sys
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from contextvars import ContextVar, copy_context
+from typing import Any, Callable, Iterator, Optional, TextIO
 from colorama import Fore, Style
 
 DATE_FORMAT = "%H:%M:%S"
@@ -19,6 +23,8 @@ LEVEL_COLORS = {
 
 _setup_done = False
 _root_logger: Optional[logging.Logger] = None
+# Per-task output stream for concurrent tasks sharing one process (see route_output_by_context)
+_task_output_stream: ContextVar[Optional[TextIO]] = ContextVar("task_output_stream", default=None)
 
 
 class ColoredFormatter(logging.Formatter):
@@ -61,3 +67,85 @@ def get_logger(name: Optional[str] = None) -> logging.Logger:
     if not _setup_done:
         setup_logging()
     return logging.getLogger(f"executor.{name}" if name else "executor")
+
+
+@contextmanager
+def redirect_output(stream: TextIO) -> Iterator[None]:
+    """Send executor log records, stdout and stderr to ``stream`` within the block.
+
+    Used by long-lived worker processes so each task's output lands in its own log file.
+    """
+    logger = logging.getLogger("executor")
+    stream_handlers = [
+        handler for handler in logger.handlers
+        if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler)
+    ]
+    previous_streams = [handler.setStream(stream) for handler in stream_handlers]
+    try:
+        with redirect_stdout(stream), redirect_stderr(stream):
+            yield
+    finally:
+        for handler, previous in zip(stream_handlers, previous_streams):
+            handler.setStream(previous or sys.stderr)
+
+
+class _ContextRoutedStream:
+    """File-like object writing to the current task's stream, or to a default stream outside tasks."""
+
+    def __init__(self, default: TextIO):
+        self._default = default
+
+    def _target(self) -> TextIO:
+        return _task_output_stream.get() or self._default
+
+    def write(self, data: str) -> int:
+        return self._target().write(data)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def isatty(self) -> bool:
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._default, name)
+
+
+def route_output_by_context() -> None:
+    """Route executor logs, stdout and stderr per task for tasks running concurrently in one process.
+
+    After this call, output produced inside ``task_output(stream)`` goes to that
+    task's stream; everything else keeps going to the original streams. This
+    includes threads started with ``asyncio.to_thread``, which copy the context,
+    and threads the executor starts itself, which run their work through
+    ``with_current_context``.
+    """
+    logger = logging.getLogger("executor")
+    for handler in logger.handlers:
+        if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
+            if not isinstance(handler.stream, _ContextRoutedStream):
+                handler.setStream(_ContextRoutedStream(handler.stream))
+    if not isinstance(sys.stdout, _ContextRoutedStream):
+        sys.stdout = _ContextRoutedStream(sys.stdout)
+    if not isinstance(sys.stderr, _ContextRoutedStream):
+        sys.stderr = _ContextRoutedStream(sys.stderr)
+
+
+@contextmanager
+def task_output(stream: TextIO) -> Iterator[None]:
+    """Send output routed by ``route_output_by_context`` to ``stream`` within the current context."""
+    token = _task_output_stream.set(stream)
+    try:
+        yield
+    finally:
+        _task_output_stream.reset(token)
+
+
+def with_current_context(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Bind ``func`` to a copy of the current context, for running it on another thread.
+
+    Plain threads and executor pools start with an empty context, so their
+    output would otherwise miss the task stream set by ``task_output``. Bind
+    once per call: a context cannot run on two threads at the same time.
+    """
+    return functools.partial(copy_context().run, func)
@@ -0,0 +1,167 @@
+"""
+Host-wide client-side rate limiting for LLM API calls.
+
+Concurrent workers usually share one API key, so each process pacing itself is
+not enough. A ``RateLimiter`` keeps a requests/min and a tokens/min token bucket
+in a small JSON file guarded by ``fcntl.flock``; every process using the same
+provider, model and key reads and updates the same buckets before each call.
+Token usage is charged from an estimate (see ``token_estimator``) up front and settled against the real
+usage afterwards, so under-estimates become debt that slows the next calls.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+from .utils import get_logger
+
+logger = get_logger("rate_limit")
+
+DEFAULT_STATE_DIR = Path(tempfile.gettempdir()) / "cocoa-agent-rate-limits"
+
+# Longest single sleep, so updated limits from other processes are picked up
+MAX_WAIT_SLICE = 5.0
+
+
+def resolve_rate_limit(llm_config: Dict[str, Any], model: str) -> Dict[str, Any] | None:
+    """Pick the rate limit for ``model`` from ``llm_config["rate_limits"]``.
+
+    The section maps model names to ``{"requests_per_minute", "tokens_per_minute"}``;
+    a ``"default"`` entry applies to models without their own entry.
+
+    Returns:
+        The limit dict, or None if the model is not rate limited
+    """
+    rate_limits = llm_config.get("rate_limits") or {}
+    limit = rate_limits.get(model) or rate_limits.get("default")
+    if not limit or not (limit.get("requests_per_minute") or limit.get("tokens_per_minute")):
+        return None
+    return limit
+
+
+class RateLimiter:
+    """Requests/min and tokens/min token buckets shared by all processes on the host."""
+
+    def __init__(
+        self,
+        bucket_id: str,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        state_dir: str | Path | None = None,
+    ):
+        """Initialize the limiter.
+
+        Args:
+            bucket_id: Identifies the shared quota, e.g. provider, model and API key
+            requests_per_minute: Request quota, or None for no request limit
+            tokens_per_minute: Token quota (input plus output), or None for no token limit
+            state_dir: Directory holding the shared bucket files
+        """
+        # The API key may be part of bucket_id; only its hash reaches the file system
+        self.bucket_name = hashlib.sha256(bucket_id.encode()).hexdigest()[:20]
+        self.requests_per_minute = float(requests_per_minute) if requests_per_minute else None
+        self.tokens_per_minute = float(tokens_per_minute) if tokens_per_minute else None
+        self.state_dir = Path(state_dir) if state_dir else DEFAULT_STATE_DIR
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self.state_path = self.state_dir / f"{self.bucket_name}.json"
+        self.lock_path = self.state_dir / f"{self.bucket_name}.lock"
+
+    @classmethod
+    def from_config(cls, llm_config: Dict[str, Any], provider: str, model: str, api_key: str = "") -> "RateLimiter | None":
+        """Build the limiter for a controller, or return None if its model has no limit configured."""
+        limit = resolve_rate_limit(llm_config, model)
+        if limit is None:
+            return None
+        return cls(
+            bucket_id=f"{provider}|{model}|{api_key}",
+            requests_per_minute=limit.get("requests_per_minute"),
+            tokens_per_minute=limit.get("tokens_per_minute"),
+            state_dir=llm_config.get("rate_limit_dir"),
+        )
+
+    @contextmanager
+    def _locked_state(self) -> Iterator[Dict[str, float]]:
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                try:
+                    with open(self.state_path, "r") as f:
+                        state = json.load(f)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    state = {"requests": self.requests_per_minute or 0.0, "tokens": self.tokens_per_minute or 0.0, "updated": now}
+
+                # Refill both buckets for the time since the last update, capped at one minute of quota
+                elapsed = max(0.0, now - state["updated"])
+                if self.requests_per_minute:
+                    state["requests"] = min(self.requests_per_minute, state["requests"] + elapsed * self.requests_per_minute / 60)
+                if self.tokens_per_minute:
+                    state["tokens"] = min(self.tokens_per_minute, state["tokens"] + elapsed * self.tokens_per_minute / 60)
+                state["updated"] = now
+
+                yield state
+
+                tmp_path = self.state_path.with_name(f".{self.state_path.name}.{os.getpid()}.tmp")
+                with open(tmp_path, "w") as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, self.state_path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until one request and ``tokens`` tokens are available, then take them.
+
+        Args:
+            tokens: Estimated tokens of the upcoming call
+
+        Returns:
+            Seconds spent waiting
+        """
+        started = time.monotonic()
+        while True:
+            with self._locked_state() as state:
+                wait = self._take(state, tokens)
+                if wait <= 0:
+                    waited = time.monotonic() - started
+                    if waited >= 1:
+                        logger.info(f"Rate limiter delayed call by {waited:.1f}s")
+                    return waited
+            time.sleep(min(wait, MAX_WAIT_SLICE))
+
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """Take one request and ``tokens`` tokens if they are available right now, without waiting."""
+        with self._locked_state() as state:
+            return self._take(state, tokens) <= 0
+
+    def _take(self, state: Dict[str, float], tokens: int) -> float:
+        """Take quota from locked bucket state; return 0, or the seconds until it is available."""
+        # A single call larger than the whole bucket only has to wait for a full bucket
+        needed_tokens = min(float(tokens), self.tokens_per_minute) if self.tokens_per_minute else 0.0
+        wait = 0.0
+        if self.requests_per_minute and state["requests"] < 1:
+            wait = max(wait, (1 - state["requests"]) * 60 / self.requests_per_minute)
+        if self.tokens_per_minute and state["tokens"] < needed_tokens:
+            wait = max(wait, (needed_tokens - state["tokens"]) * 60 / self.tokens_per_minute)
+        if wait <= 0:
+            if self.requests_per_minute:
+                state["requests"] -= 1
+            if self.tokens_per_minute:
+                state["tokens"] -= float(tokens)
+        return wait
+
+    def settle(self, token_delta: int) -> None:
+        """Correct the token bucket once real usage is known.
+
+        Args:
+            token_delta: Actual minus charged tokens; positive values become debt
+        """
+        if not self.tokens_per_minute or not token_delta:
+            return
+        with self._locked_state() as state:
+            state["tokens"] = min(self.tokens_per_minute, state["tokens"] - float(token_delta))
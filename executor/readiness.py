@@ -0,0 +1,214 @@
+"""
+Adaptive readiness probing for sandbox containers.
+
+Polls the sandbox HTTP endpoints the clients depend on, starting with a short
+interval and backing off, instead of sleeping a fixed 5 s between health checks.
+Optionally listens on the Docker event stream so a ``health_status`` or ``die``
+event for the container wakes the prober immediately.
+"""
+
+import json
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Sequence
+
+import requests
+
+from .logger import with_current_context
+from .utils import get_logger
+
+logger = get_logger("readiness")
+
+# Endpoints UnifiedSandboxClient._initialize_sdk_client relies on: the sandbox
+# itself, shell sessions, the Jupyter kernel manager and the browser.
+DEFAULT_READINESS_ENDPOINTS = (
+    "/v1/sandbox",
+    "/v1/shell/sessions",
+    "/v1/jupyter/info",
+    "/v1/browser/info",
+)
+
+
+@dataclass
+class ReadinessResult:
+    """Outcome of a readiness wait."""
+
+    ready: bool
+    elapsed: float
+    probes: int
+    endpoint_ready_at: Dict[str, float] = field(default_factory=dict)
+    reason: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "elapsed": round(self.elapsed, 3),
+            "probes": self.probes,
+            "endpoint_ready_at": {k: round(v, 3) for k, v in self.endpoint_ready_at.items()},
+            "reason": self.reason,
+        }
+
+
+class _DockerEventWatcher:
+    """Wakes the prober on Docker ``health_status`` / ``die`` events for one container."""
+
+    def __init__(self, container: str, wake: threading.Event):
+        self.container = container
+        self.wake = wake
+        self.died = False
+        self.healthy = False
+        self._process: Optional[subprocess.Popen] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        try:
+            self._process = subprocess.Popen(
+                [
+                    "docker", "events",
+                    "--filter", f"container={self.container}",
+                    "--filter", "event=health_status",
+                    "--filter", "event=die",
+                    "--format", "{{json .}}",
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+            )
+        except OSError as e:
+            logger.debug(f"Docker event stream unavailable, polling only: {e}")
+            return
+        self._thread = threading.Thread(target=with_current_context(self._read), daemon=True, name=f"readiness-events-{self.container}")
+        self._thread.start()
+
+    def _read(self) -> None:
+        for line in self._process.stdout:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            status = str(event.get("status") or event.get("Action") or "")
+            if status == "die":
+                self.died = True
+            elif status.startswith("health_status") and status.endswith("healthy") and "unhealthy" not in status:
+                self.healthy = True
+            else:
+                continue
+            logger.debug(f"Docker event for {self.container}: {status}")
+            self.wake.set()
+
+    def stop(self) -> None:
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+
+
+class ReadinessProber:
+    """Waits until every readiness endpoint of a sandbox answers 200."""
+
+    def __init__(
+        self,
+        endpoints: Sequence[str] = DEFAULT_READINESS_ENDPOINTS,
+        initial_interval: float = 0.2,
+        max_interval: float = 2.0,
+        backoff: float = 1.5,
+        request_timeout: float = 2.0,
+        docker_events: bool = False,
+    ):
+        """Initialize the prober.
+
+        Args:
+            endpoints: Sandbox paths that must all return 200
+            initial_interval: Seconds between the first probes
+            max_interval: Upper bound for the backed-off probe interval
+            backoff: Multiplier applied to the interval after each unsuccessful round
+            request_timeout: Timeout for a single probe request
+            docker_events: Also wake on Docker health/die events for the container
+        """
+        self.endpoints = tuple(endpoints)
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.request_timeout = request_timeout
+        self.docker_events = docker_events
+
+    @classmethod
+    def from_config(cls, sandbox_config: Dict[str, Any] | None) -> "ReadinessProber":
+        """Build a prober from the optional ``sandbox.readiness`` config section."""
+        readiness_config = (sandbox_config or {}).get("readiness") or {}
+        return cls(
+            endpoints=readiness_config.get("endpoints", DEFAULT_READINESS_ENDPOINTS),
+            initial_interval=readiness_config.get("initial_interval", 0.2),
+            max_interval=readiness_config.get("max_interval", 2.0),
+            backoff=readiness_config.get("backoff", 1.5),
+            docker_events=readiness_config.get("docker_events", False),
+        )
+
+    def _probe(self, session: requests.Session, base_url: str, endpoint: str) -> bool:
+        try:
+            response = session.get(f"{base_url}{endpoint}", timeout=self.request_timeout)
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    def wait(self, base_url: str, timeout: float, container: str | None = None) -> ReadinessResult:
+        """Block until the sandbox at ``base_url`` is ready or ``timeout`` expires.
+
+        Args:
+            base_url: Sandbox base URL, e.g. http://localhost:8080
+            timeout: Maximum seconds to wait
+            container: Container name, used for the optional Docker event stream
+
+        Returns:
+            ReadinessResult with timing details
+        """
+        base_url = base_url.rstrip("/")
+        started = time.monotonic()
+        deadline = started + timeout
+        pending = list(self.endpoints)
+        endpoint_ready_at: Dict[str, float] = {}
+        probes = 0
+        interval = self.initial_interval
+
+        wake = threading.Event()
+        watcher = None
+        if self.docker_events and container:
+            watcher = _DockerEventWatcher(container, wake)
+            watcher.start()
+
+        try:
+            with requests.Session() as session:
+                while True:
+                    probes += 1
+                    # Endpoints that answered once stay ready; only re-probe the rest
+                    for endpoint in list(pending):
+                        if self._probe(session, base_url, endpoint):
+                            endpoint_ready_at[endpoint] = time.monotonic() - started
+                            pending.remove(endpoint)
+                        else:
+                            # Later endpoints depend on the server being up; stop this round early
+                            break
+
+                    elapsed = time.monotonic() - started
+                    if not pending:
+                        return ReadinessResult(True, elapsed, probes, endpoint_ready_at)
+                    if watcher is not None and watcher.died:
+                        return ReadinessResult(False, elapsed, probes, endpoint_ready_at, "container exited")
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return ReadinessResult(
+                            False, elapsed, probes, endpoint_ready_at, f"not ready: {', '.join(pending)}"
+                        )
+                    if wake.wait(timeout=min(interval, remaining)):
+                        # A Docker event arrived; probe again right away
+                        wake.clear()
+                    else:
+                        interval = min(interval * self.backoff, self.max_interval)
+        finally:
+            if watcher is not None:
+                watcher.stop()
@@ -0,0 +1,233 @@
+"""
+Content-addressed record/replay cache for LLM API responses.
+
+Re-running a task after changing only the evaluation or executor code should
+not pay the provider again. ``ResponseCache`` stores each provider response on
+local disk under a key derived from everything that shapes the request: the
+controller class, model, normalised message history, tool schema hash and
+sampling parameters. Modes:
+
+- ``record``: always call the provider and store every response
+- ``replay``: only serve stored responses; a miss raises ``ResponseCacheMiss``
+- ``replay_or_live``: serve stored responses and record misses live
+
+Responses are the provider SDKs' pydantic models; they are stored as JSON with
+their class name and rebuilt with ``model_validate`` on replay, so response
+handlers see the same objects as for a live call. The directory is bounded by
+``max_bytes``; the least recently used entries are evicted first.
+"""
+
+import hashlib
+import importlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from .utils import get_logger
+
+logger = get_logger("response_cache")
+
+MODES = ("off", "record", "replay", "replay_or_live")
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "cocoa-agent" / "responses"
+DEFAULT_MAX_BYTES = 2 * 1024**3
+# Bump when the key material or entry format changes
+CACHE_VERSION = 1
+
+# Request-only annotations that do not change what the model sees
+_VOLATILE_KEYS = frozenset({"cache_control"})
+
+
+class ResponseCacheMiss(LookupError):
+    """Raised in ``replay`` mode when no response was recorded for a request."""
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items() if key not in _VOLATILE_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, str):
+        return value.rstrip()
+    return value
+
+
+class ResponseCache:
+    """On-disk LLM response store with size-bounded LRU eviction."""
+
+    def __init__(
+        self,
+        mode: str = "record",
+        cache_dir: str | Path | None = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        """Initialize the cache.
+
+        Args:
+            mode: ``record``, ``replay`` or ``replay_or_live``
+            cache_dir: Directory holding the entries, shared by all processes
+            max_bytes: Size the directory is trimmed to after writes
+        """
+        if mode not in MODES or mode == "off":
+            raise ValueError(f"Unknown response cache mode: {mode!r} (expected one of {MODES[1:]})")
+        self.mode = mode
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir else DEFAULT_CACHE_DIR
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        # Size of the directory, computed on the first write and kept up to date afterwards
+        self._size_bytes: int | None = None
+        # id(message) -> (message, content, digest)
+        self._message_digests: Dict[int, Tuple[Any, Any, str]] = {}
+
+    @classmethod
+    def from_config(cls, llm_config: Dict[str, Any]) -> "ResponseCache | None":
+        """Build the cache from ``controller.args.response_cache``, or None if it is off."""
+        cache_config = llm_config.get("response_cache") or {}
+        mode = cache_config.get("mode", "off")
+        if mode == "off":
+            return None
+        return cls(
+            mode=mode,
+            cache_dir=cache_config.get("dir"),
+            max_bytes=cache_config.get("max_bytes", DEFAULT_MAX_BYTES),
+        )
+
+    @property
+    def reads(self) -> bool:
+        return self.mode in ("replay", "replay_or_live")
+
+    @property
+    def live_allowed(self) -> bool:
+        return self.mode in ("record", "replay_or_live")
+
+    def _message_digest(self, message: Dict[str, Any]) -> str:
+        cached = self._message_digests.get(id(message))
+        content = message.get("content") if isinstance(message, dict) else None
+        if cached is not None and cached[0] is message and cached[1] is content:
+            return cached[2]
+        payload = json.dumps(_normalize(message), sort_keys=True, separators=(",", ":"), default=str)
+        digest = hashlib.sha256(payload.encode()).hexdigest()
+        if len(self._message_digests) >= 8192:
+            self._message_digests.clear()
+        self._message_digests[id(message)] = (message, content, digest)
+        return digest
+
+    def make_key(
+        self,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        tool_schema_hash: str | None,
+        params: Dict[str, Any],
+    ) -> str:
+        """Content address of a request.
+
+        Args:
+            provider: Controller class name
+            model: Model name
+            messages: Message history sent with the request
+            tool_schema_hash: ``BaseLLM.get_tool_schema_hash()``, or None without tools
+            params: Sampling and request parameters that change the output
+        """
+        material = {
+            "version": CACHE_VERSION,
+            "provider": provider,
+            "model": model,
+            "messages": [self._message_digest(message) for message in messages],
+            "tools": tool_schema_hash,
+            "params": params,
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def lookup(self, key: str) -> Any | None:
+        """Return the stored response for ``key``, or None if the request should go to the provider.
+
+        Raises:
+            ResponseCacheMiss: In ``replay`` mode when nothing was recorded for ``key``
+        """
+        if not self.reads:
+            return None
+        path = self._entry_path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+            module_name, _, class_name = entry["type"].rpartition(".")
+            response_class = getattr(importlib.import_module(module_name), class_name)
+            response = response_class.model_validate(entry["response"])
+        except FileNotFoundError:
+            response = None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable response cache entry {path.name}: {e}")
+            response = None
+
+        if response is None:
+            if not self.live_allowed:
+                raise ResponseCacheMiss(f"No recorded response for request {key[:16]} in {self.cache_dir}")
+            return None
+        try:
+            # Mark the entry as recently used for eviction
+            os.utime(path)
+        except OSError:
+            pass
+        return response
+
+    def store(self, key: str, response: Any) -> None:
+        """Record a live response; responses that are not pydantic models are skipped."""
+        if not hasattr(response, "model_dump"):
+            logger.debug(f"Not caching response of type {type(response).__name__}")
+            return
+        response_type = type(response)
+        entry = {
+            "type": f"{response_type.__module__}.{response_type.__qualname__}",
+            "recorded_at": time.time(),
+            "response": response.model_dump(mode="json"),
+        }
+        path = self._entry_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Failed to record response {key[:16]}: {e}")
+            return
+
+        if self._size_bytes is None:
+            self._size_bytes = self._scan()[1]
+        else:
+            self._size_bytes += path.stat().st_size
+        if self._size_bytes > self.max_bytes:
+            self._evict()
+
+    def _scan(self) -> Tuple[List[Tuple[float, int, Path]], int]:
+        entries = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries, sum(size for _, size, _ in entries)
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache is below 90% of max_bytes."""
+        entries, total = self._scan()
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self._size_bytes = total
+        if removed:
+            logger.info(f"Evicted {removed} response cache entries to stay under {self.max_bytes} bytes")
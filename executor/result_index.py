@@ -0,0 +1,228 @@
+"""
+Incremental index of per-task result files.
+
+Result JSONs can be many MB of base64 screenshots, so re-reading all of them to
+refresh ``statistics.txt`` after every task grows quadratically over a run. The
+index keeps a compact summary per result file, keyed by the file's mtime and
+size, and is persisted next to the results as ``statistics.json``. Only new or
+changed result files are parsed again.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .token_estimator import TokenEstimator, provider_family
+from .utils import get_logger
+
+logger = get_logger("result_index")
+
+INDEX_FILENAME = "statistics.json"
+STATISTICS_FILENAME = "statistics.txt"
+INDEX_VERSION = 2
+
+
+def is_result_file(path: Path) -> bool:
+    """Return True for per-task result JSONs, excluding the index itself."""
+    return path.suffix == ".json" and path.stem != Path(INDEX_FILENAME).stem
+
+
+def summarize_result(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the fields statistics and scheduling need from a full result dict."""
+    cost_stats = data.get("api_cost_stats") or {}
+    eval_result = data.get("eval") or {}
+    model = cost_stats.get("model")
+    instruction = data.get("instruction")
+    return {
+        "status": data.get("status"),
+        "model": model,
+        # Lets cost forecasts separate the instruction from the history a task accumulates
+        "instruction_tokens": TokenEstimator(provider_family(model)).count_text(instruction) if isinstance(instruction, str) else 0,
+        "passed": eval_result.get("passed", False) is True if isinstance(eval_result, dict) else False,
+        "total_cost_usd": float(cost_stats.get("total_cost_usd", 0) or 0),
+        "total_input_tokens": int(cost_stats.get("total_input_tokens", 0) or 0),
+        "total_output_tokens": int(cost_stats.get("total_output_tokens", 0) or 0),
+        "total_cached_tokens": int(cost_stats.get("total_cached_tokens", 0) or 0),
+        "api_calls": int(cost_stats.get("api_calls", 0) or 0),
+        "execution_time": data.get("execution_time"),
+        "iterations": data.get("iterations"),
+    }
+
+
+class ResultIndex:
+    """Running aggregate over the result JSONs of one output directory."""
+
+    def __init__(self, output_dir: str | Path):
+        """Initialize an empty index for ``output_dir``; use ``load`` to start from the persisted one."""
+        self.output_dir = Path(output_dir)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def index_path(self) -> Path:
+        return self.output_dir / INDEX_FILENAME
+
+    @classmethod
+    def load(cls, output_dir: str | Path) -> "ResultIndex":
+        """Load the persisted index of ``output_dir``, or start empty if there is none."""
+        index = cls(output_dir)
+        try:
+            with open(index.index_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                index.entries = data.get("tasks", {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable result index {index.index_path}: {e}")
+        return index
+
+    @staticmethod
+    def _signature(path: Path) -> Tuple[int, int]:
+        stat = path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def update_file(self, path: str | Path) -> Optional[Dict[str, Any]]:
+        """Parse one result file into the index if it is new or changed.
+
+        Returns:
+            The task's index entry, or None if the file is missing or unreadable
+        """
+        path = Path(path)
+        task_name = path.stem
+        try:
+            mtime_ns, size = self._signature(path)
+        except FileNotFoundError:
+            self.entries.pop(task_name, None)
+            return None
+
+        entry = self.entries.get(task_name)
+        if entry and entry.get("mtime_ns") == mtime_ns and entry.get("size") == size:
+            return entry
+
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading {path}: {e}")
+            self.entries.pop(task_name, None)
+            return None
+
+        entry = summarize_result(data) | {"mtime_ns": mtime_ns, "size": size}
+        self.entries[task_name] = entry
+        return entry
+
+    def refresh(self) -> "ResultIndex":
+        """Bring the index in line with the directory, parsing only new or changed files."""
+        if not self.output_dir.is_dir():
+            self.entries = {}
+            return self
+        present = set()
+        for path in sorted(self.output_dir.glob("*.json")):
+            if not is_result_file(path):
+                continue
+            present.add(path.stem)
+            self.update_file(path)
+        for task_name in set(self.entries) - present:
+            del self.entries[task_name]
+        return self
+
+    def save(self) -> None:
+        """Persist the index atomically next to the results."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_name(f".{INDEX_FILENAME}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"version": INDEX_VERSION, "tasks": self.entries}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def totals(self) -> Dict[str, Any]:
+        """Aggregate counts, tokens and costs over all indexed tasks."""
+        passed = sorted(name for name, entry in self.entries.items()
+                        if entry.get("status") not in ("error", "timeout") and entry.get("passed"))
+        errors = sorted(name for name, entry in self.entries.items() if entry.get("status") == "error")
+        timeouts = sorted(name for name, entry in self.entries.items() if entry.get("status") == "timeout")
+        total = len(self.entries)
+        return {
+            "total_tasks": total,
+            "passed_tasks": len(passed),
+            "failed_tasks": total - len(passed) - len(errors) - len(timeouts),
+            "error_tasks": len(errors),
+            "timeout_tasks": len(timeouts),
+            "success_rate": (len(passed) / total * 100) if total > 0 else 0.0,
+            "passed_list": passed,
+            "error_list": errors,
+            "timeout_list": timeouts,
+            "total_cost_usd": sum(entry.get("total_cost_usd", 0.0) for entry in self.entries.values()),
+            "total_input_tokens": sum(entry.get("total_input_tokens", 0) for entry in self.entries.values()),
+            "total_output_tokens": sum(entry.get("total_output_tokens", 0) for entry in self.entries.values()),
+            "total_cached_tokens": sum(entry.get("total_cached_tokens", 0) for entry in self.entries.values()),
+        }
+
+    def history(self) -> List[Dict[str, Any]]:
+        """Summaries of all indexed tasks, e.g. for ``CostTracker.forecast_task_cost``."""
+        return list(self.entries.values())
+
+    def per_task_costs(self) -> List[Tuple[str, float, int]]:
+        """Return ``(task_name, cost, api_calls)`` for tasks with a cost, most expensive first."""
+        costs = [
+            (name, entry.get("total_cost_usd", 0.0), entry.get("api_calls", 0))
+            for name, entry in self.entries.items()
+            if entry.get("total_cost_usd", 0.0) > 0
+        ]
+        return sorted(costs, key=lambda item: (-item[1], item[0]))
+
+    def render_statistics(self) -> str:
+        """Render the ``statistics.txt`` content from the index."""
+        totals = self.totals()
+        stats_content = (
+            f"Total Tasks: {totals['total_tasks']}\n"
+            f"Passed: {totals['passed_tasks']}\n"
+            f"Failed: {totals['failed_tasks']}\n"
+            f"Errors: {totals['error_tasks']}\n"
+        )
+        if totals["timeout_tasks"]:
+            stats_content += f"Timeouts: {totals['timeout_tasks']}\n"
+        stats_content += f"Success Rate: {totals['success_rate']:.2f}%\n"
+
+        if totals["passed_list"]:
+            stats_content += "\nPassed Tasks:\n"
+            for task_name in totals["passed_list"]:
+                stats_content += f"  - {task_name}\n"
+
+        if totals["error_list"]:
+            stats_content += "\nError Tasks:\n"
+            for task_name in totals["error_list"]:
+                stats_content += f"  - {task_name}\n"
+
+        if totals["timeout_list"]:
+            stats_content += "\nTimeout Tasks:\n"
+            for task_name in totals["timeout_list"]:
+                stats_content += f"  - {task_name}\n"
+
+        stats_content += (
+            f"\n--- Cost Summary ---\n"
+            f"Grand Total Cost: ${totals['total_cost_usd']:.6f}\n"
+            f"Total Input Tokens: {totals['total_input_tokens']}\n"
+            f"Total Output Tokens: {totals['total_output_tokens']}\n"
+            f"Total Cached Tokens: {totals['total_cached_tokens']}\n"
+        )
+
+        per_task_costs = self.per_task_costs()
+        if per_task_costs:
+            stats_content += "\nPer-Task Costs:\n"
+            for task_name, task_cost, task_calls in per_task_costs:
+                stats_content += f"  {task_name}: ${task_cost:.6f} ({task_calls} calls)\n"
+
+        return stats_content
+
+    def write_statistics(self) -> Path:
+        """Persist the index and write ``statistics.txt`` rendered from it.
+
+        Returns:
+            Path of the written statistics.txt
+        """
+        self.save()
+        stats_file = self.output_dir / STATISTICS_FILENAME
+        with open(stats_file, "w") as f:
+            f.write(self.render_statistics())
+        return stats_file
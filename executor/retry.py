@@ -0,0 +1,191 @@
+"""
+Retry policy for LLM API calls.
+
+Classifies provider errors (rate limit, server error, timeout, connection
+failure, non-retryable client error), honours server ``Retry-After`` hints and
+otherwise backs off with decorrelated jitter. Every logical call gets a total
+time budget across all of its attempts, so a flaky provider cannot stall a task
+indefinitely.
+"""
+
+import email.utils
+import random
+import re
+import time
+from typing import Any, Dict
+
+from .utils import get_logger
+
+logger = get_logger("retry")
+
+RATE_LIMITED = "rate_limited"
+SERVER_ERROR = "server_error"
+TIMEOUT = "timeout"
+CONNECTION_ERROR = "connection_error"
+CLIENT_ERROR = "client_error"
+UNKNOWN_ERROR = "unknown_error"
+
+# First backoff step per error kind; later steps grow with decorrelated jitter
+BASE_DELAYS = {
+    RATE_LIMITED: 5.0,
+    SERVER_ERROR: 2.0,
+    TIMEOUT: 1.0,
+    CONNECTION_ERROR: 1.0,
+    UNKNOWN_ERROR: 2.0,
+}
+
+
+def error_status_code(error: BaseException) -> int | None:
+    """HTTP status of a provider SDK error, or None for transport-level failures."""
+    # OpenAI/Anthropic errors carry status_code, google-genai errors an int code
+    status_code = getattr(error, "status_code", None)
+    if status_code is None and isinstance(getattr(error, "code", None), int):
+        status_code = error.code
+    if status_code is None:
+        response = getattr(error, "response", None)
+        status_code = getattr(response, "status_code", None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def classify_error(error: BaseException) -> str:
+    """Classify an exception raised while making an API call."""
+    status_code = error_status_code(error)
+    if status_code is not None:
+        if status_code == 429:
+            return RATE_LIMITED
+        if status_code >= 500:
+            return SERVER_ERROR
+        if status_code == 408:
+            return TIMEOUT
+        if 400 <= status_code < 500:
+            return CLIENT_ERROR
+    # Match by class name so no provider SDK has to be imported here
+    class_names = [cls.__name__ for cls in type(error).__mro__]
+    if any("Timeout" in name for name in class_names):
+        return TIMEOUT
+    if any(marker in name for name in class_names for marker in ("Connection", "Transport", "RemoteProtocol")):
+        return CONNECTION_ERROR
+    return UNKNOWN_ERROR
+
+
+def _parse_duration(value: Any) -> float | None:
+    """Parse ``Retry-After`` style values: seconds, an HTTP date, or ``"12.5s"``."""
+    if value is None:
+        return None
+    text = str(value).strip()
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)s?", text)
+    if match:
+        return float(match.group(1))
+    try:
+        retry_at = email.utils.parsedate_to_datetime(text)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def retry_after_hint(error: BaseException) -> float | None:
+    """Seconds the server asked us to wait before retrying, if it said so."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        try:
+            retry_after_ms = headers.get("retry-after-ms")
+            if retry_after_ms is not None:
+                return float(retry_after_ms) / 1000
+            hint = _parse_duration(headers.get("retry-after"))
+            if hint is not None:
+                return hint
+        except (TypeError, ValueError):
+            pass
+
+    # Gemini reports the delay as a RetryInfo detail in the error body
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        for detail in (details.get("error") or {}).get("details", []) or []:
+            if isinstance(detail, dict) and "retryDelay" in detail:
+                return _parse_duration(detail["retryDelay"])
+    return None
+
+
+class RetryState:
+    """Backoff state of one logical API call."""
+
+    def __init__(self, policy: "RetryPolicy"):
+        self.policy = policy
+        self.started = time.monotonic()
+        self.attempts = 0
+        self._previous_delay: float | None = None
+
+    def next_delay(self, error: BaseException) -> float | None:
+        """Record a failed attempt and decide whether to retry.
+
+        Args:
+            error: Exception raised by the attempt
+
+        Returns:
+            Seconds to sleep before the next attempt, or None to give up
+        """
+        self.attempts += 1
+        kind = classify_error(error)
+        if kind == CLIENT_ERROR:
+            return None
+        if self.attempts >= self.policy.max_attempts:
+            return None
+
+        hint = retry_after_hint(error)
+        if hint is not None:
+            # Server hint wins; a little jitter keeps workers from retrying in lockstep
+            delay = hint + random.uniform(0, min(1.0, hint * 0.1 + 0.1))
+        else:
+            base = BASE_DELAYS.get(kind, 1.0) * self.policy.base_delay
+            previous = self._previous_delay or base
+            # Decorrelated jitter: sleep = min(cap, uniform(base, previous * 3))
+            delay = min(self.policy.max_delay, random.uniform(base, previous * 3))
+        self._previous_delay = delay
+
+        remaining = self.policy.total_budget - (time.monotonic() - self.started)
+        if delay > remaining:
+            logger.warning(
+                f"Retry budget of {self.policy.total_budget:.0f}s exhausted after {self.attempts} attempt(s)"
+            )
+            return None
+        return delay
+
+
+class RetryPolicy:
+    """Limits and backoff parameters for retrying failed API calls."""
+
+    def __init__(
+        self,
+        max_attempts: int = 8,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        total_budget: float = 600.0,
+    ):
+        """Initialize the policy.
+
+        Args:
+            max_attempts: Attempts per logical call, including the first
+            base_delay: Multiplier on the per-error-kind first backoff step
+            max_delay: Upper bound for a jittered backoff sleep
+            total_budget: Seconds a logical call may spend across all attempts and sleeps
+        """
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.total_budget = total_budget
+
+    @classmethod
+    def from_config(cls, retry_config: Dict[str, Any] | None) -> "RetryPolicy":
+        """Build a policy from the optional ``controller.args.retry`` section."""
+        retry_config = retry_config or {}
+        return cls(
+            max_attempts=retry_config.get("max_attempts", 8),
+            base_delay=retry_config.get("base_delay", 1.0),
+            max_delay=retry_config.get("max_delay", 60.0),
+            total_budget=retry_config.get("total_budget", 600.0),
+        )
+
+    def begin(self) -> RetryState:
+        """Start tracking a new logical call."""
+        return RetryState(self)
@@ -13,6 +13,11 @@ from pathlib import Path
 import requests
 from PIL import Image
 from .utils import retry_request, validate_response, get_logger, colorize
+from .assets import AssetInjectionPlan, asset_injection_plan, build_assets_tar
+from .cdp_session import CDPSession
+from .docker_backend import DockerBackendError, create_docker_backend, path_tar
+from .image_cache import ImageCache
+from .readiness import ReadinessProber
 
 from agent_sandbox import Sandbox
 from agent_sandbox.browser import (
@@ -40,9 +45,34 @@ class SandboxClient:
         self.container_id: Optional[str] = None
         self.task_name: Optional[str] = None
         self.task_dir: Optional[str] = None
+        self.image_name: Optional[str] = None
+        # docker CLI + compose by default; sandbox.docker_backend="engine" uses the Engine API socket
+        self.docker_backend = create_docker_backend(sandbox_config)
+        # Content-addressed image cache; set sandbox.image_cache=false to rebuild every task
+        self.image_cache: Optional[ImageCache] = (
+            ImageCache(backend=self.docker_backend) if sandbox_config.get("image_cache", True) else None
+        )
+        # Run asset-only task Dockerfiles as the shared base image plus a streamed-in tar of assets/
+        self.inject_assets = sandbox_config.get("inject_assets", True)
+        self.readiness_prober = ReadinessProber.from_config(sandbox_config)
+        # Timings of the most recent container start, in seconds
+        self.setup_timings: Dict[str, Any] = {}
         self.llm_provider = sandbox_config.get("llm_provider") or os.getenv("COCOA_LLM_PROVIDER")
         self.llm_model = sandbox_config.get("llm_model") or os.getenv("COCOA_LLM_MODEL")
         self.browser_resolution = sandbox_config.get("browser_resolution")
+        # Playwright connection to the container's browser, kept open across DOM operations
+        self._cdp_session: Optional[CDPSession] = None
+
+    def _get_cdp_session(self) -> CDPSession:
+        if self._cdp_session is None:
+            self._cdp_session = CDPSession(lambda: self.sdk_client.browser.get_info().data.cdp_url)
+        return self._cdp_session
+
+    def _close_cdp_session(self) -> None:
+        """Disconnect from the container's browser; the next DOM operation connects again."""
+        if self._cdp_session is not None:
+            self._cdp_session.close()
+            self._cdp_session = None
 
     def _configure_browser_resolution(self) -> None:
         """Apply optional browser viewport configuration."""
@@ -142,10 +172,87 @@ class SandboxClient:
 
         return retry_request(_request)
 
+    def _compose_up(self, docker_compose_path: str, container_name: str, setup_started: float) -> bool:
+        """Build (if the image cache is disabled) and start the task container with docker-compose."""
+        # Set up environment variables for docker-compose
+        env = {
+            "TASK_DOCKER_IMAGE_NAME": self.image_name,
+            "TASK_DOCKER_CONTAINER_NAME": container_name,
+            "HOST_PORT": str(self.port)
+        }
+
+        up_command = ["docker", "compose", "-f", docker_compose_path, "up", "-d"]
+        if self.image_cache is not None:
+            logger.info(f"Starting container for task '{self.task_name}' from cached image {self.image_name}")
+            up_command.append("--no-build")
+        else:
+            # Build without cache and start using docker-compose
+            logger.info(f"Building and starting container for task '{self.task_name}' using docker-compose")
+
+            # Build the image without cache
+            build_result = subprocess.run(
+                ["docker", "compose", "-f", docker_compose_path, "build", "--no-cache"],
+                capture_output=True,
+                text=True,
+                timeout=120,
+                env={**subprocess.os.environ, **env}
+            )
+
+            if build_result.returncode != 0:
+                logger.error(f"Failed to build container with docker-compose: {build_result.stderr}")
+                return False
+
+        self.setup_timings["image"] = round(time.monotonic() - setup_started, 3)
+
+        # Start the container
+        start_started = time.monotonic()
+        result = subprocess.run(
+            up_command,
+            capture_output=True,
+            text=True,
+            timeout=120,
+            env={**subprocess.os.environ, **env}
+        )
+
+        if result.returncode != 0:
+            logger.error(f"Failed to start container with docker-compose: {result.stderr}")
+            return False
+
+        self.setup_timings["container_start"] = round(time.monotonic() - start_started, 3)
+        return True
+
+    def _engine_up(self, task_dir: str, container_name: str, setup_started: float) -> bool:
+        """Build (if the image cache is disabled) and start the task container through the Docker Engine API.
+
+        The container gets the same spec as the tasks' docker-compose.yaml: fixed name,
+        ``seccomp=unconfined``, ``HOST_PORT:8080`` and an interactive TTY.
+        """
+        try:
+            if self.image_cache is None:
+                logger.info(f"Building image {self.image_name} for task '{self.task_name}' via the Docker Engine API")
+                self.docker_backend.build_image(self.image_name, task_dir, nocache=True)
+            self.setup_timings["image"] = round(time.monotonic() - setup_started, 3)
+
+            start_started = time.monotonic()
+            logger.info(f"Starting container for task '{self.task_name}' from image {self.image_name} via the Docker Engine API")
+            self.docker_backend.run_container(container_name, self.image_name, host_port=self.port)
+        except DockerBackendError as e:
+            logger.error(f"Failed to start container via the Docker Engine API: {e}")
+            return False
+
+        self.setup_timings["container_start"] = round(time.monotonic() - start_started, 3)
+        return True
+
     def create_docker_environment(self, task: Dict[str, Any], wait_time: int = 60) -> bool:
         """
         Create and start an agent server container using task's docker-compose.yaml.
 
+        The image comes from the content-addressed image cache, so tasks sharing a
+        Dockerfile and build context reuse one image. With ``image_cache`` disabled
+        the task image is rebuilt without cache as before. With the ``engine``
+        docker backend the same container is created through the Docker Engine API
+        instead of ``docker compose``.
+
         Args:
             task: Task object containing task_dir (path to task directory with docker-compose.yaml)
             wait_time: Time to wait for server to be ready (default: 60 seconds)
@@ -164,59 +271,49 @@ class SandboxClient:
             self.task_name = task_name
             self.task_dir = task_dir
             docker_compose_path = f"{task_dir}/docker-compose.yaml"
+            self.setup_timings = {"source": "engine" if self.docker_backend.name == "engine" else "compose"}
+            setup_started = time.monotonic()
+
+            asset_plan = None
+            if self.image_cache is not None:
+                # Reuse an image shared by every task with the same Dockerfile + context
+                self.image_name, asset_plan = self.resolve_task_image(task_dir)
+                if self.image_name is None:
+                    return False
+            else:
+                self.image_name = f"task-{task_name}:latest"
 
-            # Set up environment variables for docker-compose
-            env = {
-                "TASK_DOCKER_IMAGE_NAME": f"task-{task_name}:latest",
-                "TASK_DOCKER_CONTAINER_NAME": f"task-{task_name}-container",
-                "HOST_PORT": str(self.port)
-            }
-
-            # Build without cache and start using docker-compose
-            logger.info(f"Building and starting container for task '{task_name}' using docker-compose")
-
-            # Build the image without cache
-            build_result = subprocess.run(
-                ["docker", "compose", "-f", docker_compose_path, "build", "--no-cache"],
-                capture_output=True,
-                text=True,
-                timeout=120,
-                env={**subprocess.os.environ, **env}
-            )
-
-            if build_result.returncode != 0:
-                logger.error(f"Failed to build container with docker-compose: {build_result.stderr}")
-                return False
-
-            # Start the container
-            result = subprocess.run(
-                ["docker", "compose", "-f", docker_compose_path, "up", "-d"],
-                capture_output=True,
-                text=True,
-                timeout=120,
-                env={**subprocess.os.environ, **env}
-            )
-
-            if result.returncode != 0:
-                logger.error(f"Failed to start container with docker-compose: {result.stderr}")
+            container_name = f"task-{task_name}-container"
+            if self.docker_backend.name == "engine":
+                started = self._engine_up(task_dir, container_name, setup_started)
+            else:
+                started = self._compose_up(docker_compose_path, container_name, setup_started)
+            if not started:
                 return False
 
-            # Extract container ID from docker-compose
-            self.container_id = env["TASK_DOCKER_CONTAINER_NAME"]
+            self.container_id = container_name
             logger.info(f"Container started successfully. Container name: {self.container_id}")
 
-            # Wait for server to be ready
-            waited = 0
-            while waited < wait_time:
-                if self.health_check():
-                    logger.info("Docker environment ready")
-                    return True
-                else:
-                    waited += 5
-                    logger.info(f"Docker environment not ready yet. Waiting ... ({waited}/{wait_time} seconds)")
-                    time.sleep(5)
+            if asset_plan is not None:
+                assets_started = time.monotonic()
+                if not self.inject_task_assets(task_dir, asset_plan):
+                    return False
+                self.setup_timings["assets"] = round(time.monotonic() - assets_started, 3)
+
+            # Wait for the server and the services the clients use to be ready
+            readiness = self.readiness_prober.wait(self.base_url, wait_time, container=self.container_id)
+            self.setup_timings["readiness"] = readiness.to_dict()
+            self.setup_timings["total"] = round(time.monotonic() - setup_started, 3)
+            if readiness.ready:
+                logger.info(
+                    f"Docker environment ready after {readiness.elapsed:.2f}s "
+                    f"({readiness.probes} probe rounds, setup total {self.setup_timings['total']:.2f}s)"
+                )
+                return True
 
-            logger.error(f"Docker environment failed to become ready within timeout of {wait_time} seconds")
+            logger.error(
+                f"Docker environment failed to become ready within timeout of {wait_time} seconds: {readiness.reason}"
+            )
             return False
 
         except subprocess.TimeoutExpired:
@@ -226,6 +323,60 @@ class SandboxClient:
             logger.error(f"Error creating agent server: {e}")
             return False
 
+    def resolve_task_image(self, task_dir: str) -> tuple[Optional[str], Optional[AssetInjectionPlan]]:
+        """
+        Return the cached image to run for a task and, if its Dockerfile only adds assets, the assets to inject.
+
+        Args:
+            task_dir: Task directory containing the Dockerfile
+
+        Returns:
+            Tuple of (image tag or None if the build failed, injection plan or None)
+        """
+        image_cache = self.image_cache or ImageCache(backend=self.docker_backend)
+        asset_plan = asset_injection_plan(task_dir) if self.inject_assets else None
+        if asset_plan is None:
+            return image_cache.ensure_image(task_dir), None
+        logger.info(f"Assets of {task_dir} will be injected into the shared base image {asset_plan.base_image}")
+        return image_cache.ensure_dockerfile_image(asset_plan.base_dockerfile), asset_plan
+
+    def inject_task_assets(self, task_dir: str, plan: Optional[AssetInjectionPlan] = None) -> bool:
+        """
+        Stream a task's assets into the running container as a single tar archive.
+
+        The archive entries carry the uid/gid the task Dockerfile's ``chown -R``
+        would set, so no separate mkdir/chown step runs in the container.
+
+        Args:
+            task_dir: Task directory containing assets/ and the Dockerfile
+            plan: Injection plan (default: derived from the task Dockerfile)
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if not self.container_id:
+            logger.error("No container running. Call create_docker_environment first.")
+            return False
+        plan = plan or asset_injection_plan(task_dir)
+        if plan is None:
+            logger.error(f"Dockerfile in {task_dir} does not describe injectable assets")
+            return False
+
+        try:
+            data = build_assets_tar(task_dir, plan)
+            self.docker_backend.put_archive(self.container_id, "/", data)
+        except (FileNotFoundError, DockerBackendError) as e:
+            logger.error(f"Failed to inject assets into container {self.container_id}: {e}")
+            return False
+        except (subprocess.TimeoutExpired, TimeoutError):
+            logger.error("Docker asset injection timed out")
+            return False
+
+        logger.info(
+            f"Injected {len(plan.copies)} asset path(s) ({len(data)} bytes) into container {self.container_id}"
+        )
+        return True
+
     def copy_to_container(self, host_path: str, container_path: str) -> bool:
         """
         Copy file or directory from host to running container.
@@ -252,18 +403,21 @@ class SandboxClient:
             # Create parent directory in container if needed
             parent_dir = str(Path(container_path).parent)
             if parent_dir and parent_dir != "/":
-                mkdir_result = subprocess.run(
-                    ["docker", "exec", self.container_id, "mkdir", "-p", parent_dir],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                if mkdir_result.returncode != 0:
-                    logger.error(f"Failed to create parent directory: {mkdir_result.stderr}")
+                exit_code, output = self.docker_backend.exec(self.container_id, ["mkdir", "-p", parent_dir])
+                if exit_code != 0:
+                    logger.error(f"Failed to create parent directory: {output}")
                     return False
 
             logger.info(f"Copying {host_path} to container {self.container_id}:{container_path}")
 
+            if self.docker_backend.name == "engine":
+                # Stream an in-memory tar straight to the archive endpoint
+                self.docker_backend.put_archive(
+                    self.container_id, parent_dir or "/", path_tar(host_file, Path(container_path).name)
+                )
+                logger.info(f"Successfully copied {host_path} to container")
+                return True
+
             # Use docker cp to copy the file/directory
             result = subprocess.run(
                 ["docker", "cp", str(host_file), f"{self.container_id}:{container_path}"],
@@ -279,26 +433,68 @@ class SandboxClient:
                 logger.error(f"Failed to copy file to container: {result.stderr}")
                 return False
 
-        except subprocess.TimeoutExpired:
+        except (subprocess.TimeoutExpired, TimeoutError):
             logger.error("Docker copy command timed out")
             return False
         except Exception as e:
             logger.error(f"Error copying file to container: {e}")
             return False
 
+    def attach_container(self, task: Dict[str, Any], container_name: str, host_port: int) -> bool:
+        """
+        Point this client at an already running sandbox container, e.g. one leased from a ContainerPool.
+
+        Args:
+            task: Task object containing task_name and task_dir
+            container_name: Name of the running container
+            host_port: Host port mapped to the sandbox server
+
+        Returns:
+            True if the container answers health checks, False otherwise
+        """
+        self._close_cdp_session()
+        self.task_name = task.get("task_name", "task")
+        self.task_dir = task.get("task_dir")
+        self.container_id = container_name
+        self.port = host_port
+        self.base_url = f"http://localhost:{host_port}"
+
+        if not self.health_check():
+            logger.error(f"Attached container {container_name} is not healthy on port {host_port}")
+            return False
+        logger.info(f"Attached to container {container_name} on port {host_port} for task '{self.task_name}'")
+        return True
+
+    def detach_container(self) -> None:
+        """Forget the attached container without stopping it; its owner is responsible for teardown."""
+        logger.debug(f"Detaching from container {self.container_id}")
+        self._close_cdp_session()
+        self.container_id = None
+        self.task_name = None
+        self.task_dir = None
 
     def cleanup_docker_environment(self) -> bool:
         """
-        Stop and remove the agent server container using docker-compose.
+        Stop and remove the agent server container using docker-compose (or the
+        Docker Engine API with the ``engine`` docker backend).
 
         Returns:
             True if successful, False otherwise
         """
+        self._close_cdp_session()
         try:
-            if self.task_dir and self.task_name:
+            if self.task_dir and self.task_name and self.docker_backend.name == "engine":
+                container_name = f"task-{self.task_name}-container"
+                logger.info(f"Removing container {container_name} via the Docker Engine API")
+                if not self.docker_backend.remove_container(container_name):
+                    return False
+                logger.info("Agent server container stopped successfully")
+                self.container_id = None
+                return True
+            elif self.task_dir and self.task_name:
                 docker_compose_path = f"{self.task_dir}/docker-compose.yaml"
                 env = {
-                    "TASK_DOCKER_IMAGE_NAME": f"task-{self.task_name}:latest",
+                    "TASK_DOCKER_IMAGE_NAME": self.image_name or f"task-{self.task_name}:latest",
                     "TASK_DOCKER_CONTAINER_NAME": f"task-{self.task_name}-container",
                     "HOST_PORT": str(self.port)
                 }
@@ -529,69 +725,14 @@ class BrowserSandboxClient(SandboxClient):
             logger.error(f"Failed to get browser info: {e}")
             return f"Failed to get browser info: {str(e)}"
     
-    def _run_async(self, coro):
-        """Run an async coroutine, handling both sync and async contexts.
-        
-        Args:
-            coro: Coroutine to run
-            
-        Returns:
-            Result of the coroutine
-        """
-        import asyncio
-        try:
-            # Try to get the current event loop
-            loop = asyncio.get_running_loop()
-            # If we're in an async context, we need to use a different approach
-            # Create a new event loop in a thread
-            import concurrent.futures
-            import threading
-            
-            def run_in_thread():
-                new_loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(new_loop)
-                try:
-                    return new_loop.run_until_complete(coro)
-                finally:
-                    new_loop.close()
-            
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(run_in_thread)
-                return future.result(timeout=60)  # Increased timeout for complex pages
-        except RuntimeError:
-            # No running event loop, use asyncio.run()
-            return asyncio.run(coro)
-
     def _with_page(self, func, wait_timeout: int = 5000):
-        """Connect to the running browser via CDP and run an async function on the active page.
+        """Run an async function on the active page over the sandbox's persistent CDP session.
         
         Args:
             func: Async function that takes a page and returns a result
             wait_timeout: Timeout in ms for waiting for page load (default 5000ms, use 0 to skip wait)
         """
-        import asyncio
-        from playwright.async_api import async_playwright
-
-        async def runner():
-            browser_info = self.sdk_client.browser.get_info().data
-            async with async_playwright() as p:
-                browser = await p.chromium.connect_over_cdp(browser_info.cdp_url)
-                try:
-                    context = browser.contexts[0] if browser.contexts else await browser.new_context()
-                    page = context.pages[0] if context.pages else await context.new_page()
-                    # Use shorter timeout for DOM operations on already-loaded pages
-                    if wait_timeout > 0:
-                        try:
-                            await page.wait_for_load_state("domcontentloaded", timeout=wait_timeout)
-                        except Exception:
-                            # If page is already loaded or timeout, continue anyway
-                            pass
-                    return await func(page)
-                finally:
-                    # Closing the Playwright client disconnects but does not shut down the remote browser
-                    await browser.close()
-
-        return self._run_async(runner())
+        return self._get_cdp_session().run(func, wait_timeout=wait_timeout)
 
     def _dom_get_text(self, max_chars: int = 8000) -> str:
         """Return page text (innerText of body)."""
@@ -1444,21 +1585,11 @@ class BrowserSandboxClient(SandboxClient):
         if not url:
             raise ValueError("browser_navigate requires 'url' parameter")
         try:
-            from playwright.async_api import async_playwright
+            async def op(page):
+                await page.goto(url, wait_until="domcontentloaded")
+                return f"Successfully navigated to {url}"
 
-            async def op():
-                browser_info = self.sdk_client.browser.get_info().data
-                async with async_playwright() as p:
-                    browser = await p.chromium.connect_over_cdp(browser_info.cdp_url)
-                    try:
-                        context = browser.contexts[0] if browser.contexts else await browser.new_context()
-                        page = context.pages[0] if context.pages else await context.new_page()
-                        await page.goto(url, wait_until="domcontentloaded")
-                        return f"Successfully navigated to {url}"
-                    finally:
-                        await browser.close()
-
-            return self._run_async(op())
+            return self._with_page(op, wait_timeout=0)
         except Exception as e:
             logger.error(f"Failed to navigate: {e}")
             logger.exception("Full traceback:")
@@ -1786,6 +1917,16 @@ class BrowserSandboxClient(SandboxClient):
         self._initialize_sdk_client()
         return True
 
+    def attach_container(self, task: Dict[str, Any], container_name: str, host_port: int) -> bool:
+        """Attach to a running container and reset per-container browser state."""
+        self.sdk_client = None
+        self._cached_browser_viewport = None
+        if not super().attach_container(task, container_name, host_port):
+            return False
+        self.clear_history()
+        self._initialize_sdk_client()
+        return True
+
 class UnifiedSandboxClient(SandboxClient):
     """Unified client that can handle browser, file, code, and shell operations."""
     
@@ -1919,6 +2060,7 @@ class UnifiedSandboxClient(SandboxClient):
         browser_client.llm_model = self.llm_model
         browser_client.browser_resolution = self.browser_resolution
         browser_client.sdk_client = self.sdk_client
+        browser_client._cdp_session = self._get_cdp_session()
         browser_client.execution_history = []
         browser_client._cached_browser_viewport = None
         feedback = browser_client.get_feedback(action)
@@ -2210,3 +2352,14 @@ class UnifiedSandboxClient(SandboxClient):
         self.clear_history()
         self._initialize_sdk_client()
         return True
+
+    def attach_container(self, task: Dict[str, Any], container_name: str, host_port: int) -> bool:
+        """Attach to a running container and open fresh shell/Jupyter sessions in it."""
+        self.sdk_client = None
+        self.shell_session_id = None
+        self.jupyter_session_id = None
+        if not super().attach_container(task, container_name, host_port):
+            return False
+        self.clear_history()
+        self._initialize_sdk_client()
+        return True
@@ -0,0 +1,264 @@
+"""
+Streaming support for LLM controllers.
+
+With ``controller.args.streaming`` enabled, controllers consume provider streams
+instead of waiting for the complete response. While a response streams in:
+
+- ``StreamMonitor`` records time-to-first-token and time-to-first-action (the
+  moment the first tool call is complete) for the call
+- each tool call is handed to the controller's ``on_tool_call`` callback as soon
+  as it is complete, so the executor can start running it while the model is
+  still writing the rest of the message
+
+``EarlyActionDispatcher`` is the executor side: it runs those actions on a
+background thread in order and hands their feedback to the agent loop when the
+loop reaches the same tool call in the final response.
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+from .logger import with_current_context
+from .utils import get_logger
+
+logger = get_logger("streaming")
+
+# Actions that end the task are never started early; everything after them must not run either
+NON_DISPATCHABLE_ACTIONS = frozenset({"task_complete"})
+
+
+def _field(obj: Any, name: str, default: Any = None) -> Any:
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+class StreamMonitor:
+    """Timing and early tool-call hand-off for one streamed API call."""
+
+    def __init__(
+        self,
+        parse_tool_call: Callable[[Dict[str, Any]], Dict[str, Any]],
+        on_tool_call: Callable[[Dict[str, Any]], None] | None = None,
+        check_cancelled: Callable[[], None] | None = None,
+    ):
+        """Initialize the monitor.
+
+        Args:
+            parse_tool_call: Maps an OpenAI-style tool call dict to an executor action
+            on_tool_call: Receives each complete action while the response streams, or None
+            check_cancelled: Called on every chunk; raises to abandon the stream (see ``hedging``)
+        """
+        self.started = time.monotonic()
+        self.time_to_first_token: float | None = None
+        self.time_to_first_action: float | None = None
+        self.dispatched = 0
+        self._parse_tool_call = parse_tool_call
+        self._on_tool_call = on_tool_call
+        self._check_cancelled = check_cancelled
+        self._seen_ids: set = set()
+        self._dispatch_lock = threading.Lock()
+
+    def cancel_dispatch(self) -> bool:
+        """Stop handing tool calls to ``on_tool_call`` unless some already went out.
+
+        Returns:
+            True if no action was dispatched, False if dispatching continues
+        """
+        with self._dispatch_lock:
+            if self.dispatched:
+                return False
+            self._on_tool_call = None
+            return True
+
+    def token(self) -> None:
+        """Note that content (text, reasoning or tool-call arguments) arrived."""
+        if self._check_cancelled is not None:
+            self._check_cancelled()
+        if self.time_to_first_token is None:
+            self.time_to_first_token = time.monotonic() - self.started
+
+    def tool_call(self, tool_call: Dict[str, Any]) -> None:
+        """Note a complete tool call and hand its action to ``on_tool_call``.
+
+        Args:
+            tool_call: ``{"id": ..., "function": {"name": ..., "arguments": json_string}}``
+        """
+        call_id = tool_call.get("id")
+        if call_id in self._seen_ids:
+            return
+        self._seen_ids.add(call_id)
+        self.token()
+        if self.time_to_first_action is None:
+            self.time_to_first_action = time.monotonic() - self.started
+        with self._dispatch_lock:
+            if self._on_tool_call is None:
+                return
+            try:
+                action = self._parse_tool_call(tool_call)
+            except Exception as e:
+                # Leave this and all later calls to the regular path, which reports the error
+                logger.debug(f"Not dispatching tool call {call_id} early: {e}")
+                self._on_tool_call = None
+                return
+            if action.get("action_type") in NON_DISPATCHABLE_ACTIONS:
+                self._on_tool_call = None
+                return
+            self._on_tool_call(action)
+            self.dispatched += 1
+
+    def timings(self) -> Dict[str, Any]:
+        """Per-call timing record, in seconds."""
+        return {
+            "ttft_s": None if self.time_to_first_token is None else round(self.time_to_first_token, 3),
+            "ttfa_s": None if self.time_to_first_action is None else round(self.time_to_first_action, 3),
+            "duration_s": round(time.monotonic() - self.started, 3),
+            "early_actions": self.dispatched,
+        }
+
+
+class ChatToolCallAccumulator:
+    """Assembles Chat Completions ``tool_calls`` deltas into complete tool calls."""
+
+    def __init__(self):
+        self.tool_calls: List[Dict[str, Any]] = []
+        self._reported: set = set()
+
+    def add(self, deltas: List[Any]) -> List[Dict[str, Any]]:
+        """Merge one chunk's tool-call deltas.
+
+        Returns:
+            Tool calls that became complete with this chunk, i.e. whose arguments
+            now form a JSON object
+        """
+        for delta in deltas or []:
+            index = _field(delta, "index", None)
+            if index is None:
+                index = len(self.tool_calls)
+            while len(self.tool_calls) <= index:
+                self.tool_calls.append({"id": None, "type": "function", "function": {"name": "", "arguments": ""}})
+            tool_call = self.tool_calls[index]
+            if _field(delta, "id"):
+                tool_call["id"] = _field(delta, "id")
+            function = _field(delta, "function")
+            if function is not None:
+                if _field(function, "name"):
+                    tool_call["function"]["name"] += _field(function, "name")
+                if _field(function, "arguments"):
+                    tool_call["function"]["arguments"] += _field(function, "arguments")
+        return [self.tool_calls[index] for index in self._complete_indices()]
+
+    def _complete_indices(self) -> List[int]:
+        complete = []
+        for index, tool_call in enumerate(self.tool_calls):
+            if index in self._reported or not tool_call["function"]["name"]:
+                continue
+            try:
+                json.loads(tool_call["function"]["arguments"] or "{}")
+            except json.JSONDecodeError:
+                # Still streaming; later calls can only complete after this one
+                break
+            self._reported.add(index)
+            complete.append(index)
+        return complete
+
+
+class EarlyActionDispatcher:
+    """Runs actions handed over by a streaming controller in order on a background thread."""
+
+    def __init__(
+        self,
+        execute: Callable[[Dict[str, Any]], Dict[str, Any]],
+        hold: Callable[[Dict[str, Any]], bool] | None = None,
+    ):
+        """Initialize the dispatcher.
+
+        Args:
+            execute: Runs one action and returns its feedback, e.g. ``sandbox_client.get_feedback``
+            hold: Actions after which the dispatcher pauses until ``resume``, because the agent
+                loop still uses the sandbox for them (e.g. a screenshot after a browser action)
+        """
+        self._execute = execute
+        self._hold = hold
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="early-action")
+        self._pending: List[Tuple[Dict[str, Any], Future]] = []
+        self._stopped = False
+        self._resumed = threading.Event()
+        self._resumed.set()
+        # Set while discarding; discarded actions run without pausing
+        self._draining = False
+        self._lock = threading.Lock()
+
+    def submit(self, action: Dict[str, Any]) -> None:
+        """Queue an action; it starts as soon as the previous early action finished."""
+        logger.debug(f"Dispatching {action.get('action_type')} before the response is complete")
+        self._pending.append((action, self._pool.submit(with_current_context(self._run), action)))
+
+    def _run(self, action: Dict[str, Any]) -> Dict[str, Any] | None:
+        self._resumed.wait()
+        # The agent loop stops at the first finished action; do not run the ones after it
+        if self._stopped:
+            return None
+        with self._lock:
+            if not self._draining and self._hold is not None and self._hold(action):
+                self._resumed.clear()
+        feedback = self._execute(action)
+        if isinstance(feedback, dict) and feedback.get("done"):
+            self._stopped = True
+        return feedback
+
+    def resume(self) -> None:
+        """Let queued early actions run again once the agent loop is done with the last one it took."""
+        self._resumed.set()
+
+    def take(self, action: Dict[str, Any]) -> Dict[str, Any] | None:
+        """Return the feedback of ``action`` if it was started early, waiting for it to finish.
+
+        Early actions are matched to the final response by tool call id, in order.
+
+        Returns:
+            The feedback, or None if the action was not dispatched early and must be run now
+        """
+        if not self._pending:
+            return None
+        if self._pending[0][0].get("tool_call_id") != action.get("tool_call_id"):
+            # The early actions belong to a rejected response; let them finish before anything else runs
+            self.discard_pending()
+            return None
+        early_action, future = self._pending.pop(0)
+        if early_action != action:
+            logger.warning(f"Early action {early_action} differs from final action {action}; keeping its result")
+        return future.result()
+
+    def discard_pending(self) -> int:
+        """Wait for early actions the agent loop did not consume and drop their feedback.
+
+        This happens when the final response was rejected (e.g. a parse error
+        triggered a re-ask) after some of its tool calls had already started.
+
+        Returns:
+            Number of discarded actions
+        """
+        discarded = 0
+        with self._lock:
+            # Nothing will follow up on these actions
+            self._draining = True
+            self._resumed.set()
+        while self._pending:
+            action, future = self._pending.pop(0)
+            try:
+                future.result()
+            except Exception as e:
+                logger.debug(f"Discarded early action failed: {e}")
+            logger.warning(f"Early action {action.get('action_type')} ran but its response was not used")
+            discarded += 1
+        self._stopped = False
+        self._draining = False
+        return discarded
+
+    def close(self) -> None:
+        self.discard_pending()
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,73 @@
+"""
+Run-level telemetry shared between worker processes.
+
+Workers append one JSON line per event (currently one per LLM API call) to the
+file named by ``COCOA_TELEMETRY_FILE``. Each event is a single ``O_APPEND``
+write, so concurrent processes never interleave partial lines. The parent
+runner tails the file to observe rate limiting and latency across all workers.
+When the variable is unset, recording is a no-op.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .utils import get_logger
+
+logger = get_logger("telemetry")
+
+TELEMETRY_ENV = "COCOA_TELEMETRY_FILE"
+
+
+def record_event(event: str, **fields: Any) -> None:
+    """Append an event to the run's telemetry file, if one is configured.
+
+    Args:
+        event: Event type, e.g. ``llm_call``
+        **fields: JSON-serialisable event fields
+    """
+    path = os.environ.get(TELEMETRY_ENV)
+    if not path:
+        return
+    line = json.dumps({"event": event, "ts": time.time(), "pid": os.getpid(), **fields}, default=str) + "\n"
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.debug(f"Failed to record telemetry event: {e}")
+
+
+class TelemetryTail:
+    """Incrementally reads events appended to a telemetry file."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._offset = 0
+        self._partial = b""
+
+    def read_new(self) -> List[Dict[str, Any]]:
+        """Return the events appended since the previous call."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        self._offset += len(data)
+        lines = (self._partial + data).split(b"\n")
+        # The last element is an incomplete line (or empty); keep it for the next read
+        self._partial = lines.pop()
+        events = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return events
@@ -0,0 +1,231 @@
+"""
+Fast offline token estimates for message histories.
+
+Providers only report token usage after a call returns, but the rate limiter,
+the context window manager, cost forecasts and the Gemini long-context pricing
+tier all need a number before the call. ``TokenEstimator`` approximates the
+prompt size locally, without a tokenizer:
+
+- text is counted per provider family from its average characters per token,
+  with non-ASCII characters (CJK, emoji) counted as roughly one token each
+- images are charged from their pixel dimensions, read from the PNG/JPEG/GIF
+  header of the base64 payload, using each provider's published image formula
+
+Counts are memoized per message object, so re-estimating a growing history on
+every iteration only costs the messages added since the previous call.
+"""
+
+import base64
+import binascii
+import json
+import math
+import struct
+from typing import Any, Dict, List, Tuple
+
+from .utils import get_logger
+
+logger = get_logger("tokens")
+
+# Average characters per token of English text and code, per provider family
+CHARS_PER_TOKEN = {
+    "openai": 4.0,
+    "claude": 3.5,
+    "gemini": 4.0,
+}
+
+# Per-message framing (role, separators) added by chat formats
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Charged for an image whose dimensions cannot be read
+DEFAULT_IMAGE_TOKENS = 1000
+
+IMAGE_BLOCK_TYPES = ("image_url", "image", "input_image")
+
+# Base64 characters decoded while looking for JPEG dimensions (EXIF blocks can be large)
+_JPEG_HEADER_CHARS = (4096, 262144)
+
+
+def provider_family(name: str | None) -> str:
+    """Map a model or controller class name to a token-counting family."""
+    name = (name or "").lower()
+    if "claude" in name:
+        return "claude"
+    if "gemini" in name:
+        return "gemini"
+    return "openai"
+
+
+def _decode_prefix(data: str, chars: int) -> bytes:
+    prefix = data[: chars - chars % 4]
+    try:
+        return base64.b64decode(prefix)
+    except (binascii.Error, ValueError):
+        return b""
+
+
+def _jpeg_dimensions(header: bytes) -> Tuple[int, int] | None:
+    offset = 2
+    while offset + 9 < len(header):
+        if header[offset] != 0xFF:
+            return None
+        marker = header[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        # SOF0..SOF15 carry the frame size; C4 (DHT), C8 and CC (DAC) share the range
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", header[offset + 5 : offset + 9])
+            return width, height
+        segment_length = struct.unpack(">H", header[offset + 2 : offset + 4])[0]
+        offset += 2 + segment_length
+    return None
+
+
+def image_dimensions(data: str) -> Tuple[int, int] | None:
+    """Read ``(width, height)`` from a base64 image or data URL, decoding only its header.
+
+    Returns:
+        The dimensions, or None for unknown formats and non-base64 URLs
+    """
+    if data.startswith("data:"):
+        data = data.partition(",")[2]
+    header = _decode_prefix(data, 32)
+    if header.startswith(b"\x89PNG\r\n\x1a\n") and len(header) >= 24:
+        return struct.unpack(">II", header[16:24])
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return struct.unpack("<HH", header[6:10])
+    if header.startswith(b"\xff\xd8"):
+        for chars in _JPEG_HEADER_CHARS:
+            dimensions = _jpeg_dimensions(_decode_prefix(data, chars))
+            if dimensions is not None or chars >= len(data):
+                return dimensions
+    return None
+
+
+def _scale_to_fit(width: int, height: int, max_width: float, max_height: float) -> Tuple[float, float]:
+    scale = min(1.0, max_width / width, max_height / height)
+    return width * scale, height * scale
+
+
+def image_tokens(width: int, height: int, family: str = "openai") -> int:
+    """Tokens a provider charges for an image of the given size.
+
+    - openai: fit into 2048x2048, shortest side to 768, then 170 per 512px tile plus 85
+    - claude: fit into 1568px and about 1.15 megapixels, then width * height / 750
+    - gemini: 258 for images up to 384x384, otherwise 258 per 768x768 tile
+    """
+    if width <= 0 or height <= 0:
+        return DEFAULT_IMAGE_TOKENS
+    if family == "claude":
+        w, h = _scale_to_fit(width, height, 1568, 1568)
+        megapixels = w * h / 1_000_000
+        if megapixels > 1.15:
+            shrink = math.sqrt(1.15 / megapixels)
+            w, h = w * shrink, h * shrink
+        return max(1, math.ceil(w * h / 750))
+    if family == "gemini":
+        if width <= 384 and height <= 384:
+            return 258
+        return math.ceil(width / 768) * math.ceil(height / 768) * 258
+    w, h = _scale_to_fit(width, height, 2048, 2048)
+    shortest = min(w, h)
+    if shortest > 768:
+        w, h = w * 768 / shortest, h * 768 / shortest
+    return 85 + 170 * math.ceil(w / 512) * math.ceil(h / 512)
+
+
+class TokenEstimator:
+    """Approximate prompt token counter for one provider family."""
+
+    # Memoized entries kept before the per-message cache is reset
+    MAX_CACHED_MESSAGES = 8192
+
+    def __init__(self, family: str = "openai"):
+        """Initialize the estimator.
+
+        Args:
+            family: ``"openai"``, ``"claude"`` or ``"gemini"``; see ``provider_family``
+        """
+        self.family = family if family in CHARS_PER_TOKEN else "openai"
+        self.chars_per_token = CHARS_PER_TOKEN[self.family]
+        # id(message) -> (message, content, tokens); holding the message keeps its id from being reused
+        self._message_cache: Dict[int, Tuple[Any, Any, int]] = {}
+        # Image header -> tokens; equal headers mean equal dimensions
+        self._image_cache: Dict[Tuple[int, str, str], int] = {}
+        # id(tools) -> (tools, tokens)
+        self._tools_cache: Tuple[Any, int] | None = None
+
+    def count_text(self, text: str) -> int:
+        """Estimate the tokens of a text."""
+        if not text:
+            return 0
+        if text.isascii():
+            return math.ceil(len(text) / self.chars_per_token)
+        ascii_chars = len(text.encode("ascii", "ignore"))
+        return math.ceil(ascii_chars / self.chars_per_token) + (len(text) - ascii_chars)
+
+    def count_image(self, data: str | None) -> int:
+        """Estimate the tokens of a base64 image or data URL from its dimensions."""
+        if not data:
+            return DEFAULT_IMAGE_TOKENS
+        key = (len(data), data[:128], data[-32:])
+        tokens = self._image_cache.get(key)
+        if tokens is None:
+            dimensions = image_dimensions(data)
+            tokens = image_tokens(*dimensions, family=self.family) if dimensions else DEFAULT_IMAGE_TOKENS
+            if len(self._image_cache) >= self.MAX_CACHED_MESSAGES:
+                self._image_cache.clear()
+            self._image_cache[key] = tokens
+        return tokens
+
+    @staticmethod
+    def _image_data(block: Dict[str, Any]) -> str | None:
+        """Base64 payload or data URL of an OpenAI, Responses or Claude image block."""
+        image_url = block.get("image_url")
+        if isinstance(image_url, dict):
+            return image_url.get("url")
+        if isinstance(image_url, str):
+            return image_url
+        source = block.get("source")
+        if isinstance(source, dict):
+            return source.get("data")
+        return None
+
+    def _count_value(self, value: Any) -> int:
+        if isinstance(value, str):
+            if value.startswith("data:image"):
+                return self.count_image(value)
+            return self.count_text(value)
+        if isinstance(value, dict):
+            if value.get("type") in IMAGE_BLOCK_TYPES:
+                return self.count_image(self._image_data(value))
+            return sum(self._count_value(item) for item in value.values())
+        if isinstance(value, (list, tuple)):
+            return sum(self._count_value(item) for item in value)
+        return 0
+
+    def count_message(self, message: Dict[str, Any]) -> int:
+        """Estimate the tokens of one message; repeated calls for the same object are free."""
+        cached = self._message_cache.get(id(message))
+        content = message.get("content") if isinstance(message, dict) else None
+        if cached is not None and cached[0] is message and cached[1] is content:
+            return cached[2]
+        tokens = MESSAGE_OVERHEAD_TOKENS + self._count_value(message)
+        if len(self._message_cache) >= self.MAX_CACHED_MESSAGES:
+            self._message_cache.clear()
+        self._message_cache[id(message)] = (message, content, tokens)
+        return tokens
+
+    def count_messages(self, messages: List[Dict[str, Any]]) -> int:
+        """Estimate the prompt tokens of a message list."""
+        return sum(self.count_message(message) for message in messages)
+
+    __call__ = count_messages
+
+    def count_tools(self, tools: List[Dict[str, Any]] | None) -> int:
+        """Estimate the tokens of a tool schema list; shared schema lists are counted once."""
+        if not tools:
+            return 0
+        if self._tools_cache is None or self._tools_cache[0] is not tools:
+            self._tools_cache = (tools, self.count_text(json.dumps(tools, separators=(",", ":"))))
+        return self._tools_cache[1]
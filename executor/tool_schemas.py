@@ -0,0 +1,250 @@
+"""
+Precompiled tool schemas per provider format.
+
+Tool definitions are written once in OpenAI format (``executor.tools``). Each
+provider needs them in its own shape: Responses API, Anthropic, Gemini
+``types.Tool`` objects or, for Qwen3-VL, a text description. The registry
+builds every tool set once per process, compiles it once per provider format
+and shares the result between all controllers. ``tool_schema_hash`` gives a
+stable identifier of a compiled schema for prompt- and response-cache keys.
+
+Compiled schemas are shared; callers must treat them as read-only.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, List
+
+from .tools import get_browser_tools, get_code_tools, get_file_tools, get_shell_tools, get_unified_tools
+from .utils import get_logger
+
+try:
+    from google.genai import types as gemini_types
+except ImportError:
+    gemini_types = None
+
+logger = get_logger("tool_schemas")
+
+# Bump when a converter changes its output, so schema hashes change with it
+SCHEMA_VERSION = 1
+
+TOOLSET_LOADERS: Dict[str, Callable[[], List[Dict[str, Any]]]] = {
+    "unified": get_unified_tools,
+    "browser": get_browser_tools,
+    "file": get_file_tools,
+    "code": get_code_tools,
+    "jupyter": get_code_tools,
+    "shell": get_shell_tools,
+}
+
+
+def format_tools_as_text(tools: List[Dict[str, Any]]) -> str:
+    """Convert OpenAI tool schema to text description for Qwen3-VL models.
+    
+    Args:
+        tools: List of tool definitions in OpenAI format
+        
+    Returns:
+        Formatted text description of all tools
+    """
+    tool_descriptions = []
+    
+    for tool in tools:
+        func = tool.get("function", {})
+        name = func.get("name", "")
+        description = func.get("description", "")
+        parameters = func.get("parameters", {})
+        properties = parameters.get("properties", {})
+        required = parameters.get("required", [])
+        
+        # Build parameter descriptions
+        param_descriptions = []
+        for param_name, param_info in properties.items():
+            param_type = param_info.get("type", "string")
+            param_desc = param_info.get("description", "")
+            param_enum = param_info.get("enum")
+            param_default = param_info.get("default")
+            
+            param_str = f"  - {param_name} ({param_type})"
+            if param_desc:
+                param_str += f": {param_desc}"
+            if param_enum:
+                param_str += f" [options: {', '.join(map(str, param_enum))}]"
+            if param_default is not None:
+                param_str += f" [default: {param_default}]"
+            if param_name in required:
+                param_str += " [required]"
+            
+            param_descriptions.append(param_str)
+        
+        # Format tool description
+        tool_text = f"- {name}: {description}"
+        if param_descriptions:
+            tool_text += "\n" + "\n".join(param_descriptions)
+        
+        tool_descriptions.append(tool_text)
+    
+    return "\n\n".join(tool_descriptions)
+
+
+def to_responses_tools(openai_tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Convert Chat Completions tool definitions to Responses API format (flat, no 'function' wrapper)."""
+    responses_tools = []
+    for tool in openai_tools:
+        if tool.get("type") == "function":
+            func = tool.get("function", {})
+            responses_tools.append({
+                "type": "function",
+                "name": func.get("name", ""),
+                "description": func.get("description", ""),
+                "parameters": func.get("parameters", {}),
+            })
+    return responses_tools
+
+
+def to_claude_tools(openai_tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Convert OpenAI tool format to Claude tool format."""
+    claude_tools = []
+    for tool in openai_tools:
+        if tool.get("type") == "function":
+            func = tool.get("function", {})
+            claude_tool = {
+                "name": func.get("name", ""),
+                "description": func.get("description", ""),
+                "input_schema": func.get("parameters", {})
+            }
+            claude_tools.append(claude_tool)
+    return claude_tools
+
+
+def sanitize_gemini_parameters(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Sanitize parameters for Gemini API (e.g. remove non-string enums)."""
+    if not parameters:
+        return parameters
+
+    new_params = parameters.copy()
+
+    # Handle properties if present
+    if "properties" in new_params:
+        new_props = {}
+        for name, prop in new_params["properties"].items():
+            new_props[name] = sanitize_gemini_parameters(prop)
+        new_params["properties"] = new_props
+
+    # Handle enum validation
+    if "enum" in new_params:
+        # Check if any enum value is not a string
+        if any(not isinstance(v, str) for v in new_params["enum"]):
+            # Gemini only supports string enums in its Pydantic models
+            # So we remove the enum constraint for non-string types
+            # and add the options to description
+            options_str = ", ".join(map(str, new_params["enum"]))
+            if "description" in new_params:
+                new_params["description"] += f" (Options: {options_str})"
+            else:
+                new_params["description"] = f"Options: {options_str}"
+            del new_params["enum"]
+
+    return new_params
+
+
+def to_gemini_tools(openai_tools: List[Dict[str, Any]]) -> List[Any]:
+    """Convert OpenAI tool format to a list of Gemini ``types.Tool`` objects."""
+    if gemini_types is None:
+        raise ImportError("Google Gemini libraries not available. Install with: pip install google-genai")
+    gemini_tools = []
+    for tool in openai_tools:
+        if tool.get("type") == "function":
+            func = tool.get("function", {})
+            gemini_function = {
+                "name": func.get("name", ""),
+                "description": func.get("description", ""),
+                "parameters": sanitize_gemini_parameters(func.get("parameters", {}))
+            }
+            gemini_tools.append(gemini_types.Tool(function_declarations=[gemini_function]))
+    return gemini_tools
+
+
+PROVIDER_COMPILERS: Dict[str, Callable[[List[Dict[str, Any]]], Any]] = {
+    "openai": lambda tools: tools,
+    "responses": to_responses_tools,
+    "claude": to_claude_tools,
+    "gemini": to_gemini_tools,
+    "text": format_tools_as_text,
+}
+
+_lock = threading.Lock()
+_toolsets: Dict[str, List[Dict[str, Any]]] = {}
+# id() of each shared tool list -> its tool set name, to recognise registry lists passed back in
+_toolset_ids: Dict[int, str] = {}
+_compiled: Dict[tuple, Any] = {}
+_hashes: Dict[tuple, str] = {}
+
+
+def get_toolset(name: str) -> List[Dict[str, Any]] | None:
+    """Return the shared OpenAI-format tool list for a client type, building it on first use.
+
+    Args:
+        name: Client type (unified, browser, file, code, jupyter, shell)
+
+    Returns:
+        The tool list, or None for client types without tools
+    """
+    loader = TOOLSET_LOADERS.get(name)
+    if loader is None:
+        return None
+    with _lock:
+        if name not in _toolsets:
+            tools = loader()
+            _toolsets[name] = tools
+            _toolset_ids[id(tools)] = name
+        return _toolsets[name]
+
+
+def _canonical_json(tools: List[Dict[str, Any]]) -> str:
+    return json.dumps(tools, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def compile_tools(tools: List[Dict[str, Any]], provider: str) -> Any:
+    """Return ``tools`` in a provider's format, compiled once per tool set and provider.
+
+    Lists obtained from ``get_toolset`` are cached; any other list is converted
+    on every call.
+
+    Args:
+        tools: OpenAI-format tool list
+        provider: One of ``PROVIDER_COMPILERS``
+
+    Returns:
+        The compiled schema (shared, read-only)
+    """
+    compiler = PROVIDER_COMPILERS[provider]
+    name = _toolset_ids.get(id(tools))
+    if name is None or _toolsets.get(name) is not tools:
+        return compiler(tools)
+    key = (name, provider)
+    with _lock:
+        if key not in _compiled:
+            _compiled[key] = compiler(tools)
+            logger.debug(f"Compiled {len(tools)} {name} tools for {provider}")
+        return _compiled[key]
+
+
+def tool_schema_hash(tools: List[Dict[str, Any]] | None, provider: str = "openai") -> str:
+    """Stable hash of a tool schema in a provider's format.
+
+    The hash only depends on the tool definitions, the provider format and
+    ``SCHEMA_VERSION``, so it is identical across processes and runs.
+    """
+    if not tools:
+        return ""
+    name = _toolset_ids.get(id(tools))
+    key = (name, provider) if name is not None and _toolsets.get(name) is tools else None
+    if key is not None and key in _hashes:
+        return _hashes[key]
+    digest = hashlib.sha256(f"{SCHEMA_VERSION}:{provider}:{_canonical_json(tools)}".encode()).hexdigest()[:16]
+    if key is not None:
+        with _lock:
+            _hashes[key] = digest
+    return digest
@@ -65,20 +65,29 @@ def measure_execution_time(func):
     return wrapper
 
 
+def _without_api_keys(value: Any) -> Any:
+    """Copy of a config value with every ``*api_key`` entry removed, at any depth."""
+    if isinstance(value, dict):
+        return {
+            key: _without_api_keys(item)
+            for key, item in value.items()
+            if not (isinstance(key, str) and key.lower().endswith("api_key"))
+        }
+    if isinstance(value, list):
+        return [_without_api_keys(item) for item in value]
+    return value
+
+
 def extract_config_info(config: Dict[str, Any]) -> Dict[str, Any]:
-    """Extract relevant config information for result recording."""
+    """Extract relevant config information for result recording, without API keys."""
     controller_config = config.get("controller", {})
     sandbox_config = config.get("sandbox", {})
 
-    config_info = {
-        "controller": controller_config,
-        "sandbox": sandbox_config
+    return {
+        "controller": _without_api_keys(controller_config),
+        "sandbox": _without_api_keys(sandbox_config),
     }
 
-    config_info['controller']['args'].pop("api_key", None)
-
-    return config_info
-
 
 def colorize(obj: Any, color: str = "CYAN") -> str:
     """Apply color to an object for terminal output.
@@ -6,11 +6,14 @@ import argparse
 import json
 import os
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import yaml
 
 from agents import BaseAgent, CocoaAgent, OpenAIDeepResearchAgent, GeminiDeepResearchAgent
+from executor.controller import CostTracker
+from executor.result_index import ResultIndex
+from executor.token_estimator import TokenEstimator, provider_family
 from executor.utils import setup_logging, load_config, get_logger
 from decrypt import decrypt_file_to_memory, read_canary
 
@@ -27,7 +30,10 @@ def parse_arguments() -> dict:
     parser.add_argument("--model", type=str,
                        help="Override model name from config")
     parser.add_argument("--run-all", action="store_true",
-                       help="Run all tasks. By default only run tasks with no result or status 'error'.")
+                       help="Run all tasks. By default only run tasks with no result or status 'error' or 'timeout'.")
+    parser.add_argument("--pipeline", action="store_true",
+                       help="Prepare the next task's image and container while the current task runs "
+                            "(enables the warm container pool)")
 
     return parser.parse_args()
 
@@ -112,6 +118,108 @@ def load_tasks(tasks_dir: str, use_encrypted: bool = False) -> List[Dict[str, An
     return tasks
 
 
+def create_agent(config: Dict[str, Any]) -> BaseAgent:
+    """Build the agent selected by ``agent_type`` in the configuration."""
+    logger = get_logger("inference")
+    agent_type = config.get("agent_type", "cocoa")
+    logger.info(f"Using agent type: {agent_type}")
+
+    if agent_type == "openai_deep_research":
+        return OpenAIDeepResearchAgent(config)
+    elif agent_type == "gemini_deep_research":
+        return GeminiDeepResearchAgent(config)
+    elif agent_type == "cocoa":
+        return CocoaAgent(config)
+    else:
+        raise ValueError(f"Unknown agent type: {agent_type}")
+
+
+def print_cost_forecast(task: Dict[str, Any], model: str | None, history: List[Dict[str, Any]]) -> float | None:
+    """Print the predicted cost of a task before it runs.
+
+    Args:
+        task: Task dictionary from load_tasks
+        model: Model that will run the task
+        history: Earlier result summaries, e.g. ``ResultIndex.history()``
+
+    Returns:
+        Predicted cost in USD, or None if there is nothing to predict from
+    """
+    task_name = task.get("task_name", "task")
+    instruction = task.get("instruction")
+    instruction_tokens = (
+        TokenEstimator(provider_family(model)).count_text(instruction) if isinstance(instruction, str) else 0
+    )
+    forecast = CostTracker.forecast_task_cost(model or "", instruction_tokens, history)
+    if forecast is None:
+        print(f"[Forecast] {task_name}: no earlier {model} results to predict from (instruction ~{instruction_tokens} tokens)")
+        return None
+    print(
+        f"[Forecast] {task_name}: ~${forecast['predicted_cost_usd']:.4f} with {model} | "
+        f"~{forecast['calls']:.0f} calls of ~{forecast['prompt_tokens_per_call']} prompt tokens | "
+        f"based on {forecast['based_on']} earlier task(s)"
+    )
+    return forecast["predicted_cost_usd"]
+
+
+def run_single_task(
+    agent: BaseAgent,
+    task: Dict[str, Any],
+    output_dir: str | Path,
+    next_task: Optional[Dict[str, Any]] = None,
+) -> Path:
+    """Set up, run, evaluate and clean up one task, saving its result JSON.
+
+    Failures are recorded as an error result instead of being raised, so one
+    task cannot take down the caller's loop.
+
+    Args:
+        agent: Agent used to run the task
+        task: Task dictionary from load_tasks
+        output_dir: Directory receiving ``{task_name}.json``
+        next_task: Upcoming task whose environment is prepared while this one runs (pipelined mode)
+
+    Returns:
+        Path of the written result file
+    """
+    logger = get_logger("inference")
+    task_name = task.get("task_name", "task")
+    output_file = Path(output_dir) / f"{task_name}.json"
+
+    try:
+        agent.setup_environment(task)
+        if next_task is not None:
+            agent.prepare_environment(next_task)
+        result = agent.run_task(task)
+
+        # Run test if available
+        test_result = agent.run_eval(task, result)
+        if test_result is not None:
+            result["eval"] = test_result
+
+        # Save result to task-specific JSON file
+        with open(output_file, 'w') as f:
+            json.dump(result, f, indent=2)
+        logger.debug(f"Task {task_name} result saved to {output_file}")
+    except Exception as e:
+        logger.error(f"Task {task_name} failed with error: {e}")
+        # Save error result
+        error_result = {
+            "status": "error",
+            "error": str(e),
+            "task_name": task_name
+        }
+        with open(output_file, 'w') as f:
+            json.dump(error_result, f, indent=2)
+    finally:
+        try:
+            agent.cleanup_environment()
+        except Exception as cleanup_error:
+            logger.error(f"Cleanup failed for task {task_name}: {cleanup_error}")
+
+    return output_file
+
+
 def main():
     """Main function."""
     args = parse_arguments()
@@ -130,6 +238,13 @@ def main():
         config["controller"]["args"]["model"] = args.model
         logger.info(f"Model overridden to: {args.model}")
 
+    if args.pipeline:
+        # Overlapping tasks need containers on distinct ports, which the warm pool provides;
+        # pooled containers are also torn down in the background after each task
+        pool_config = config.setdefault("sandbox", {}).setdefault("pool", {})
+        pool_config["enabled"] = True
+        logger.info("Pipelined mode: next task's environment is prepared while the current one runs")
+
     os.makedirs(args.output_dir, exist_ok=True)
 
     # Check if we should use encrypted tasks
@@ -137,21 +252,11 @@ def main():
     logger.info(f"Use encrypted tasks: {use_encrypted}")
 
     # Select agent based on configuration
-    agent_type = config.get("agent_type", "cocoa")
-    logger.info(f"Using agent type: {agent_type}")
-    
-    if agent_type == "openai_deep_research":
-        agent = OpenAIDeepResearchAgent(config)
-    elif agent_type == "gemini_deep_research":
-        agent = GeminiDeepResearchAgent(config)
-    elif agent_type == "cocoa":
-        agent = CocoaAgent(config)
-    else:
-        raise ValueError(f"Unknown agent type: {agent_type}")
+    agent = create_agent(config)
 
     tasks = load_tasks(args.tasks_dir, use_encrypted=use_encrypted)
 
-    # By default only run tasks with no result or status "error"; use --run-all to run everything
+    # By default only run tasks with no result or status "error"/"timeout"; use --run-all to run everything
     if not getattr(args, "run_all", False):
         output_path = Path(args.output_dir)
         def should_run(t: Dict[str, Any]) -> bool:
@@ -164,130 +269,41 @@ def main():
             try:
                 with open(out_file) as f:
                     data = json.load(f)
-                return data.get("status") == "error"
+                return data.get("status") in ("error", "timeout")
             except Exception:
                 return True
         tasks = [t for t in tasks if should_run(t)]
-        logger.info(f"Only running tasks with no result or status 'error': {len(tasks)} tasks to run")
+        logger.info(f"Only running tasks with no result or status 'error' or 'timeout': {len(tasks)} tasks to run")
+
+    # Earlier results in the output directory (including this run's) feed the per-task cost forecast
+    model = config.get("controller", {}).get("args", {}).get("model")
+    result_index = ResultIndex.load(args.output_dir)
 
     for i, task in enumerate(tasks, 1):
         task_name = task.get("task_name", f"task_{i}")
         logger.info(f"Processing task {i}/{len(tasks)}: {task_name}")
+        print_cost_forecast(task, model, result_index.refresh().history())
+        next_task = tasks[i] if args.pipeline and i < len(tasks) else None
+        run_single_task(agent, task, args.output_dir, next_task=next_task)
 
-        try:
-            agent.setup_environment(task)
-            result = agent.run_task(task)
-
-            # Run test if available
-            test_result = agent.run_eval(task, result)
-            if test_result is not None:
-                result["eval"] = test_result
-
-            # Save result to task-specific JSON file
-            output_file = Path(args.output_dir) / f"{task_name}.json"
-            with open(output_file, 'w') as f:
-                json.dump(result, f, indent=2)
-            logger.debug(f"Task {task_name} result saved to {output_file}")
-        except Exception as e:
-            logger.error(f"Task {task_name} failed with error: {e}")
-            # Save error result
-            error_result = {
-                "status": "error",
-                "error": str(e),
-                "task_name": task_name
-            }
-            output_file = Path(args.output_dir) / f"{task_name}.json"
-            with open(output_file, 'w') as f:
-                json.dump(error_result, f, indent=2)
-        finally:
-            try:
-                agent.cleanup_environment()
-            except Exception as cleanup_error:
-                logger.error(f"Cleanup failed for task {task_name}: {cleanup_error}")
-
+    agent.close()
     logger.info(f"Processed {len(tasks)} tasks. Results saved to {args.output_dir}")
 
-    # Calculate statistics + aggregate costs
-    total_tasks = 0
-    passed_tasks = 0
-    error_tasks = 0
-    passed_list = []
-    error_list = []
-    grand_total_cost = 0.0
-    grand_total_input = 0
-    grand_total_output = 0
-    grand_total_cached = 0
-    per_task_costs = []
-
-    output_path = Path(args.output_dir)
-    if output_path.exists():
-        for json_file in sorted(output_path.glob("*.json")):
-            if json_file.stem == "statistics":
-                continue
-            try:
-                with open(json_file, 'r') as f:
-                    data = json.load(f)
-                    total_tasks += 1
-                    if data.get("status") == "error":
-                        error_tasks += 1
-                        error_list.append(json_file.stem)
-                    elif data.get("eval", {}).get("passed", False) is True:
-                        passed_tasks += 1
-                        passed_list.append(json_file.stem)
-
-                    cs = data.get("api_cost_stats", {})
-                    task_cost = float(cs.get("total_cost_usd", 0) or 0)
-                    grand_total_cost += task_cost
-                    grand_total_input += int(cs.get("total_input_tokens", 0) or 0)
-                    grand_total_output += int(cs.get("total_output_tokens", 0) or 0)
-                    grand_total_cached += int(cs.get("total_cached_tokens", 0) or 0)
-                    if task_cost > 0:
-                        per_task_costs.append((json_file.stem, task_cost, cs.get("api_calls", 0)))
-            except Exception as e:
-                logger.error(f"Error reading {json_file}: {e}")
-
-    success_rate = (passed_tasks / total_tasks * 100) if total_tasks > 0 else 0.0
-
-    stats_content = (
-        f"Total Tasks: {total_tasks}\n"
-        f"Passed: {passed_tasks}\n"
-        f"Failed: {total_tasks - passed_tasks - error_tasks}\n"
-        f"Errors: {error_tasks}\n"
-        f"Success Rate: {success_rate:.2f}%\n"
-    )
-
-    if passed_list:
-        stats_content += "\nPassed Tasks:\n"
-        for task_name in sorted(passed_list):
-            stats_content += f"  - {task_name}\n"
-
-    if error_list:
-        stats_content += "\nError Tasks:\n"
-        for task_name in sorted(error_list):
-            stats_content += f"  - {task_name}\n"
-
-    stats_content += (
-        f"\n--- Cost Summary ---\n"
-        f"Grand Total Cost: ${grand_total_cost:.6f}\n"
-        f"Total Input Tokens: {grand_total_input}\n"
-        f"Total Output Tokens: {grand_total_output}\n"
-        f"Total Cached Tokens: {grand_total_cached}\n"
-    )
-    if per_task_costs:
-        stats_content += "\nPer-Task Costs:\n"
-        for tname, tcost, tcalls in sorted(per_task_costs, key=lambda x: -x[1]):
-            stats_content += f"  {tname}: ${tcost:.6f} ({tcalls} calls)\n"
-
-    stats_file = output_path / "statistics.txt"
-    with open(stats_file, 'w') as f:
-        f.write(stats_content)
+    # Calculate statistics + aggregate costs from the incremental result index
+    result_index.refresh()
+    stats_file = result_index.write_statistics()
+    totals = result_index.totals()
+    per_task_costs = result_index.per_task_costs()
 
     print(f"\n{'='*60}")
-    print(f"Grand Total Cost: ${grand_total_cost:.6f}")
-    print(f"Input: {grand_total_input}  Output: {grand_total_output}  Cached: {grand_total_cached}")
+    print(f"Grand Total Cost: ${totals['total_cost_usd']:.6f}")
+    print(
+        f"Input: {totals['total_input_tokens']}  Output: {totals['total_output_tokens']}  "
+        f"Cached: {totals['total_cached_tokens']}"
+    )
     if per_task_costs:
         print("Per-task breakdown:")
-        for tname, tcost, tcalls in sorted(per_task_costs, key=lambda x: -x[1]):
+        for tname, tcost, tcalls in per_task_costs:
             print(f"  {tname}: ${tcost:.6f} ({tcalls} calls)")
     print(f"{'='*60}")
 
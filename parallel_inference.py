@@ -6,13 +6,28 @@ import json
 import multiprocessing as mp
 import os
 import shutil
+import signal
 import socket
+import statistics
 import subprocess
 import sys
+import threading
+import time
+from collections import deque
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from queue import Empty
+from typing import Any, Callable
+
+from executor.concurrency import AIMDConcurrencyGovernor
+from executor.checkpoint import load_checkpoint
+from executor.container_pool import OWNER_PID_LABEL
+from executor.result_index import ResultIndex
+from executor.telemetry import TELEMETRY_ENV, TelemetryTail
+
+# Return code reported for tasks killed by the wall-clock watchdog, as with coreutils `timeout`
+TIMEOUT_RETURN_CODE = 124
 
 
 def parse_args() -> argparse.Namespace:
@@ -36,6 +51,44 @@ def parse_args() -> argparse.Namespace:
         default=".parallel_run",
         help="Directory for temporary worker configs, logs, and intermediate results",
     )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Run tasks inside long-lived workers that each build one agent and reuse it, "
+        "instead of launching inference_main.py per task",
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=["lpt", "sorted"],
+        default="lpt",
+        help="Task order: 'lpt' starts the longest expected tasks first using earlier results, "
+        "'sorted' uses directory order",
+    )
+    parser.add_argument(
+        "--history-dir",
+        action="append",
+        default=[],
+        help="Extra directory of earlier result JSONs used to estimate task durations and costs (repeatable)",
+    )
+    parser.add_argument(
+        "--task-timeout",
+        type=float,
+        default=0,
+        help="Per-task wall-clock budget in seconds; on expiry the task is killed, its containers are "
+        "removed and a 'timeout' result with the partial trajectory is written (default: no limit)",
+    )
+    parser.add_argument(
+        "--adaptive-concurrency",
+        action="store_true",
+        help="Treat --workers as an upper bound and adjust the number of running tasks from the "
+        "rate-limit errors and LLM latency all workers report (AIMD)",
+    )
+    parser.add_argument(
+        "--min-workers",
+        type=int,
+        default=1,
+        help="Lower bound on running tasks with --adaptive-concurrency",
+    )
     return parser.parse_args()
 
 
@@ -51,11 +104,114 @@ def should_run_task(task_dir: Path, output_dir: Path) -> bool:
     try:
         with open(result_file, "r") as f:
             data = json.load(f)
-        return data.get("status") == "error"
+        return data.get("status") in ("error", "timeout")
     except Exception:
         return True
 
 
+def load_task_history(task_names: list[str], history_dirs: list[Path]) -> dict[str, dict]:
+    """Collect the most informative earlier result summary for each task from the history directories.
+
+    Summaries come from each directory's result index, so large result files are
+    only parsed when they changed. Directories are searched in order; a result
+    with ``execution_time`` wins over one without (e.g. an error result written
+    before the agent loop ran).
+    """
+    wanted = set(task_names)
+    history: dict[str, dict] = {}
+    for history_dir in history_dirs:
+        if not history_dir.is_dir():
+            continue
+        for task_name, entry in ResultIndex.load(history_dir).refresh().entries.items():
+            if task_name not in wanted or history.get(task_name, {}).get("execution_time"):
+                continue
+            if task_name not in history or entry.get("execution_time"):
+                history[task_name] = entry
+    return history
+
+
+def estimate_task_durations(task_names: list[str], history: dict[str, dict]) -> tuple[dict[str, float], int]:
+    """Estimate each task's wall time in seconds from earlier results.
+
+    Uses ``execution_time`` when present. Otherwise scales ``iterations`` or
+    ``api_calls`` (from ``api_cost_stats``) by the median seconds per iteration / API call
+    observed across the history, and finally falls back to the median duration
+    of all tasks with history.
+
+    Returns:
+        Tuple of (estimate per task name, number of tasks estimated from their own history)
+    """
+    durations: dict[str, float] = {}
+    per_iteration: list[float] = []
+    per_call: list[float] = []
+    for task_name, data in history.items():
+        execution_time = data.get("execution_time")
+        if not isinstance(execution_time, (int, float)) or execution_time <= 0:
+            continue
+        durations[task_name] = float(execution_time)
+        iterations = data.get("iterations") or 0
+        api_calls = data.get("api_calls") or 0
+        if iterations > 0:
+            per_iteration.append(execution_time / iterations)
+        if api_calls > 0:
+            per_call.append(execution_time / api_calls)
+
+    seconds_per_iteration = statistics.median(per_iteration) if per_iteration else None
+    seconds_per_call = statistics.median(per_call) if per_call else None
+    fallback = statistics.median(durations.values()) if durations else 0.0
+
+    estimates: dict[str, float] = {}
+    from_history = 0
+    for task_name in task_names:
+        data = history.get(task_name, {})
+        iterations = data.get("iterations") or 0
+        api_calls = data.get("api_calls") or 0
+        if task_name in durations:
+            estimates[task_name] = durations[task_name]
+        elif iterations > 0 and seconds_per_iteration is not None:
+            estimates[task_name] = iterations * seconds_per_iteration
+        elif api_calls > 0 and seconds_per_call is not None:
+            estimates[task_name] = api_calls * seconds_per_call
+        else:
+            estimates[task_name] = fallback
+            continue
+        from_history += 1
+    return estimates, from_history
+
+
+def order_tasks_lpt(task_dirs: list[Path], history_dirs: list[Path]) -> tuple[list[Path], dict[str, float], int]:
+    """Order tasks longest-expected-first so long tasks do not start last and stretch the run's tail."""
+    task_names = [task_dir.name for task_dir in task_dirs]
+    estimates, from_history = estimate_task_durations(task_names, load_task_history(task_names, history_dirs))
+    ordered = sorted(task_dirs, key=lambda task_dir: (-estimates[task_dir.name], task_dir.name))
+    return ordered, estimates, from_history
+
+
+def print_cost_forecasts(tasks_dir: Path, task_dirs: list[Path], config_path: Path, model: str | None, history_dirs: list[Path]) -> None:
+    """Print the predicted cost of each selected task and of the whole run, from earlier results."""
+    # Imported here so the parent process only loads the agent stack when forecasting
+    from inference_main import load_tasks, print_cost_forecast
+
+    with open(config_path, "r") as f:
+        config = json.load(f)
+    model = model or config.get("controller", {}).get("args", {}).get("model")
+    history = [
+        entry
+        for history_dir in history_dirs
+        if history_dir.is_dir()
+        for entry in ResultIndex.load(history_dir).refresh().history()
+    ]
+    selected = {task_dir.name for task_dir in task_dirs}
+    tasks = [
+        task for task in load_tasks(str(tasks_dir), use_encrypted=config.get("use_encrypted_tasks", False))
+        if task["task_name"] in selected
+    ]
+    predictions = [print_cost_forecast(task, model, history) for task in tasks]
+    known = [cost for cost in predictions if cost is not None]
+    if known:
+        print(f"Predicted run cost: ~${sum(known):.2f} for {len(known)}/{len(tasks)} tasks with a forecast")
+
+
 def ensure_clean_dir(path: Path) -> None:
     if path.exists():
         shutil.rmtree(path)
@@ -69,12 +225,19 @@ def link_or_copy_task(task_dir: Path, destination: Path) -> None:
         shutil.copytree(task_dir, destination)
 
 
-def write_worker_config(config_path: Path, worker_config_path: Path, docker_port: int) -> None:
+def write_worker_config(
+    config_path: Path,
+    worker_config_path: Path,
+    docker_port: int,
+    checkpoint_dir: Path | None = None,
+) -> None:
     with open(config_path, "r") as f:
         config = json.load(f)
 
     config.setdefault("sandbox", {})
     config["sandbox"]["docker_port"] = docker_port
+    if checkpoint_dir is not None:
+        config["checkpoint_dir"] = str(checkpoint_dir)
 
     with open(worker_config_path, "w") as f:
         json.dump(config, f, indent=2)
@@ -140,82 +303,15 @@ def find_available_ports(
 
 
 def write_statistics(output_dir: Path) -> None:
-    total_tasks = 0
-    passed_tasks = 0
-    error_tasks = 0
-    passed_list: list[str] = []
-    error_list: list[str] = []
-    grand_total_cost = 0.0
-    grand_total_input = 0
-    grand_total_output = 0
-    grand_total_cached = 0
-    per_task_costs: list[tuple[str, float, int]] = []
-
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    for json_file in sorted(output_dir.glob("*.json")):
-        try:
-            with open(json_file, "r") as f:
-                data = json.load(f)
-            total_tasks += 1
-
-            if data.get("status") == "error":
-                error_tasks += 1
-                error_list.append(json_file.stem)
-            elif data.get("eval", {}).get("passed", False) is True:
-                passed_tasks += 1
-                passed_list.append(json_file.stem)
-
-            cost_stats = data.get("api_cost_stats", {})
-            task_cost = float(cost_stats.get("total_cost_usd", 0) or 0)
-            grand_total_cost += task_cost
-            grand_total_input += int(cost_stats.get("total_input_tokens", 0) or 0)
-            grand_total_output += int(cost_stats.get("total_output_tokens", 0) or 0)
-            grand_total_cached += int(cost_stats.get("total_cached_tokens", 0) or 0)
-            if task_cost > 0:
-                per_task_costs.append((json_file.stem, task_cost, int(cost_stats.get("api_calls", 0) or 0)))
-        except Exception as exc:
-            print(f"Error reading {json_file}: {exc}", file=sys.stderr)
-
-    success_rate = (passed_tasks / total_tasks * 100) if total_tasks > 0 else 0.0
-    stats_content = (
-        f"Total Tasks: {total_tasks}\n"
-        f"Passed: {passed_tasks}\n"
-        f"Failed: {total_tasks - passed_tasks - error_tasks}\n"
-        f"Errors: {error_tasks}\n"
-        f"Success Rate: {success_rate:.2f}%\n"
-    )
-
-    if passed_list:
-        stats_content += "\nPassed Tasks:\n"
-        for task_name in sorted(passed_list):
-            stats_content += f"  - {task_name}\n"
-
-    if error_list:
-        stats_content += "\nError Tasks:\n"
-        for task_name in sorted(error_list):
-            stats_content += f"  - {task_name}\n"
-
-    stats_content += (
-        f"\n--- Cost Summary ---\n"
-        f"Grand Total Cost: ${grand_total_cost:.6f}\n"
-        f"Total Input Tokens: {grand_total_input}\n"
-        f"Total Output Tokens: {grand_total_output}\n"
-        f"Total Cached Tokens: {grand_total_cached}\n"
-    )
-
-    if per_task_costs:
-        stats_content += "\nPer-Task Costs:\n"
-        for task_name, task_cost, task_calls in sorted(per_task_costs, key=lambda item: -item[1]):
-            stats_content += f"  {task_name}: ${task_cost:.6f} ({task_calls} calls)\n"
-
-    with open(output_dir / "statistics.txt", "w") as f:
-        f.write(stats_content)
+    """Refresh the result index of ``output_dir`` and render statistics.txt from it."""
+    ResultIndex.load(output_dir).refresh().write_statistics()
 
 
 @dataclass
 class WorkerSlot:
     index: int
+    # Sandbox port owned by the worker in --in-process mode; subprocess mode uses per-task ports
+    docker_port: int | None = None
 
 
 @dataclass
@@ -227,10 +323,15 @@ class TaskRunPaths:
     temp_output_dir: Path
     log_path: Path
     config_path: Path
-    docker_port: int
+    docker_port: int | None
 
 
-def prepare_task_run(task_dir: Path, tasks_root: Path, base_config_path: Path, docker_port: int) -> TaskRunPaths:
+def prepare_task_run(
+    task_dir: Path,
+    tasks_root: Path,
+    base_config_path: Path,
+    docker_port: int | None,
+) -> TaskRunPaths:
     run_dir = tasks_root / task_dir.name
     input_dir = run_dir / "input"
     temp_output_dir = run_dir / "output"
@@ -241,7 +342,8 @@ def prepare_task_run(task_dir: Path, tasks_root: Path, base_config_path: Path, d
     ensure_clean_dir(input_dir)
     ensure_clean_dir(temp_output_dir)
     link_or_copy_task(task_dir, input_dir / task_dir.name)
-    write_worker_config(base_config_path, config_path, docker_port)
+    if docker_port is not None:
+        write_worker_config(base_config_path, config_path, docker_port, checkpoint_dir=tasks_root)
 
     return TaskRunPaths(
         task_name=task_dir.name,
@@ -267,11 +369,75 @@ def write_fallback_error_result(task: TaskRunPaths, error_message: str) -> Path:
     return output_file
 
 
+def kill_process_tree(process: subprocess.Popen, grace_period: float = 10) -> None:
+    """Terminate a process started with ``start_new_session=True`` together with its children."""
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=grace_period)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+    except ProcessLookupError:
+        process.wait()
+
+
+def teardown_task_containers(task: TaskRunPaths, owner_pid: int | None = None) -> None:
+    """Remove the containers a killed task may have left running.
+
+    Runs the task's compose teardown, removes the fixed-name task container (also
+    used by the Docker Engine backend) and any pooled containers labelled with
+    the killed process id.
+    """
+    container_name = f"task-{task.task_name}-container"
+    compose_file = task.source_dir / "docker-compose.yaml"
+    env = {
+        **os.environ,
+        "TASK_DOCKER_IMAGE_NAME": f"task-{task.task_name}:latest",
+        "TASK_DOCKER_CONTAINER_NAME": container_name,
+        "HOST_PORT": str(task.docker_port or 8080),
+    }
+    commands = []
+    if compose_file.exists():
+        commands.append(["docker", "compose", "-f", str(compose_file), "down"])
+    commands.append(["docker", "rm", "-f", container_name])
+    try:
+        for command in commands:
+            subprocess.run(command, capture_output=True, text=True, timeout=60, env=env)
+        if owner_pid is not None:
+            listed = subprocess.run(
+                ["docker", "ps", "-aq", "--filter", f"label={OWNER_PID_LABEL}={owner_pid}"],
+                capture_output=True,
+                text=True,
+                timeout=30,
+            )
+            container_ids = listed.stdout.split()
+            if container_ids:
+                subprocess.run(["docker", "rm", "-f", *container_ids], capture_output=True, text=True, timeout=60)
+    except (subprocess.TimeoutExpired, OSError) as exc:
+        print(f"Container teardown for {task.task_name} failed: {exc}", file=sys.stderr)
+
+
+def write_timeout_result(task: TaskRunPaths, budget: float, elapsed: float) -> Path:
+    """Write a ``timeout`` result that keeps the partial trajectory the task checkpointed."""
+    result = load_checkpoint(task.run_dir.parent / f"{task.task_name}.partial.jsonl")
+    result |= {
+        "status": "timeout",
+        "error": f"Task exceeded its wall-clock budget of {budget:.0f}s",
+        "task_name": task.task_name,
+        "execution_time": elapsed,
+    }
+    output_file = task.temp_output_dir / f"{task.task_name}.json"
+    with open(output_file, "w") as f:
+        json.dump(result, f, indent=2)
+    return output_file
+
+
 def run_task_in_worker(
     slot: WorkerSlot,
     repo_root: Path,
     task: TaskRunPaths,
     model: str | None,
+    task_timeout: float = 0,
 ) -> dict[str, str | int]:
     command = build_worker_command(
         worker_config_path=task.config_path,
@@ -287,20 +453,34 @@ def run_task_in_worker(
             f"task={task.task_name} started_at={started_at} ====\n"
         )
         log_file.flush()
-        completed = subprocess.run(
+        # Own session, so the watchdog can kill inference_main.py and everything it spawned
+        process = subprocess.Popen(
             command,
             cwd=repo_root,
             stdout=log_file,
             stderr=subprocess.STDOUT,
             text=True,
+            start_new_session=True,
         )
+        started = time.monotonic()
+        timed_out = False
+        try:
+            process.wait(timeout=task_timeout or None)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            kill_process_tree(process)
+            teardown_task_containers(task, owner_pid=process.pid)
+            log_file.write(f"\n==== watchdog: task={task.task_name} killed after {task_timeout:.0f}s ====\n")
 
     output_file = task.temp_output_dir / f"{task.task_name}.json"
-    return_code = completed.returncode
-    if not output_file.exists():
+    return_code = process.returncode
+    if timed_out:
+        output_file = write_timeout_result(task, task_timeout, time.monotonic() - started)
+        return_code = TIMEOUT_RETURN_CODE
+    elif not output_file.exists():
         output_file = write_fallback_error_result(
             task,
-            f"inference_main.py exited with code {completed.returncode} without producing {task.task_name}.json",
+            f"inference_main.py exited with code {process.returncode} without producing {task.task_name}.json",
         )
         if return_code == 0:
             return_code = 1
@@ -317,10 +497,191 @@ def run_task_in_worker(
     }
 
 
+def run_task_in_process(
+    slot: WorkerSlot,
+    agent_state: dict[str, Any],
+    config: dict[str, Any],
+    task: TaskRunPaths,
+    claim: Callable[[], bool] = lambda: True,
+) -> dict[str, str | int] | None:
+    """Run one task with the worker's agent.
+
+    The result is written to a staging directory and only moved into place once
+    ``claim`` returns True; a task the watchdog already reported returns None and
+    leaves the timeout result alone.
+    """
+    from executor.logger import redirect_output
+    from inference_main import create_agent, load_tasks, run_single_task
+
+    started_at = datetime.now().isoformat(timespec="seconds")
+    return_code = 0
+    failure = None
+    staging_dir = task.run_dir / "in_process_output"
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    with open(task.log_path, "a") as log_file:
+        log_file.write(
+            f"\n==== worker={slot.index} pid={os.getpid()} port={slot.docker_port} "
+            f"task={task.task_name} started_at={started_at} (in-process) ====\n"
+        )
+        log_file.flush()
+        with redirect_output(log_file):
+            try:
+                # The agent (controller, HTTP clients, sandbox client) is built once per worker
+                if agent_state.get("agent") is None:
+                    agent_state["agent"] = create_agent(config)
+                tasks = load_tasks(str(task.input_dir), use_encrypted=config.get("use_encrypted_tasks", False))
+                if not tasks:
+                    raise RuntimeError(f"Task {task.task_name} could not be loaded")
+                run_single_task(agent_state["agent"], tasks[0], staging_dir)
+            except Exception as exc:
+                failure = f"Task failed in in-process worker {slot.index}: {exc}"
+                print(failure)
+                return_code = 1
+            log_file.flush()
+
+    if not claim():
+        return None
+    output_file = task.temp_output_dir / f"{task.task_name}.json"
+    staged_file = staging_dir / output_file.name
+    if staged_file.exists():
+        os.replace(staged_file, output_file)
+    else:
+        output_file = write_fallback_error_result(
+            task,
+            failure or f"In-process worker {slot.index} did not produce {task.task_name}.json",
+        )
+        return_code = 1
+
+    finished_at = datetime.now().isoformat(timespec="seconds")
+    return {
+        "event": "finished",
+        "worker_index": str(slot.index),
+        "task_name": task.task_name,
+        "return_code": str(return_code),
+        "log_path": str(task.log_path),
+        "output_file": str(output_file),
+        "finished_at": finished_at,
+    }
+
+
+def in_process_worker_main(
+    slot: WorkerSlot,
+    repo_root: Path,
+    config_path: Path,
+    model: str | None,
+    checkpoint_dir: Path,
+    task_timeout: float,
+    task_queue: mp.Queue,
+    result_queue: mp.Queue,
+) -> None:
+    # Same working directory and import path a per-task inference_main.py subprocess would get
+    os.chdir(repo_root)
+    sys.path.insert(0, str(repo_root))
+    from executor.utils import load_config, setup_logging
+
+    config = load_config(str(config_path))
+    config.setdefault("sandbox", {})["docker_port"] = slot.docker_port
+    config["checkpoint_dir"] = str(checkpoint_dir)
+    if model:
+        config["controller"]["args"]["model"] = model
+    setup_logging(config.get("log_level", "INFO"))
+
+    agent_state: dict[str, Any] = {"agent": None}
+    # Whichever of the task and its watchdog gets here first reports the task
+    report_lock = threading.Lock()
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                return
+
+            result_queue.put(
+                {
+                    "event": "started",
+                    "worker_index": str(slot.index),
+                    "worker_pid": str(os.getpid()),
+                    "task_name": task.task_name,
+                    "log_path": str(task.log_path),
+                    "docker_port": str(slot.docker_port),
+                }
+            )
+
+            reported = False
+            started = time.monotonic()
+
+            def claim() -> bool:
+                """Claim the right to write and report the task's result; only the first caller gets it."""
+                nonlocal reported
+                with report_lock:
+                    if reported:
+                        return False
+                    reported = True
+                    return True
+
+            def on_timeout() -> None:
+                # The task cannot be interrupted inside this process, so the worker ends itself
+                # once the result is flushed; it never dies holding a queue lock
+                if not claim():
+                    return
+                print(
+                    f"[worker {slot.index}] task={task.task_name} exceeded {task_timeout:.0f}s, "
+                    f"restarting worker pid={os.getpid()}",
+                    file=sys.stderr,
+                )
+                teardown_task_containers(task, owner_pid=os.getpid())
+                output_file = write_timeout_result(task, task_timeout, time.monotonic() - started)
+                result_queue.put(
+                    {
+                        "event": "finished",
+                        "worker_index": str(slot.index),
+                        "task_name": task.task_name,
+                        "return_code": str(TIMEOUT_RETURN_CODE),
+                        "log_path": str(task.log_path),
+                        "output_file": str(output_file),
+                        "finished_at": datetime.now().isoformat(timespec="seconds"),
+                    }
+                )
+                result_queue.close()
+                result_queue.join_thread()
+                os._exit(TIMEOUT_RETURN_CODE)
+
+            watchdog = None
+            if task_timeout > 0:
+                watchdog = threading.Timer(task_timeout, on_timeout)
+                watchdog.daemon = True
+                watchdog.start()
+
+            try:
+                event = run_task_in_process(slot=slot, agent_state=agent_state, config=config, task=task, claim=claim)
+            except Exception as exc:
+                event = None
+                if claim():
+                    output_file = write_fallback_error_result(task, f"Worker crashed while running task: {exc}")
+                    event = {
+                        "event": "finished",
+                        "worker_index": str(slot.index),
+                        "task_name": task.task_name,
+                        "return_code": "1",
+                        "log_path": str(task.log_path),
+                        "output_file": str(output_file),
+                        "finished_at": datetime.now().isoformat(timespec="seconds"),
+                    }
+            if event is None:
+                # The watchdog already wrote and reported the task and is about to end the process
+                watchdog.join()
+            if watchdog is not None:
+                watchdog.cancel()
+            result_queue.put(event)
+    finally:
+        if agent_state["agent"] is not None:
+            agent_state["agent"].close()
+
+
 def worker_main(
     slot: WorkerSlot,
     repo_root: Path,
     model: str | None,
+    task_timeout: float,
     task_queue: mp.Queue,
     result_queue: mp.Queue,
 ) -> None:
@@ -341,7 +702,9 @@ def worker_main(
         )
 
         try:
-            result_queue.put(run_task_in_worker(slot=slot, repo_root=repo_root, task=task, model=model))
+            result_queue.put(
+                run_task_in_worker(slot=slot, repo_root=repo_root, task=task, model=model, task_timeout=task_timeout)
+            )
         except Exception as exc:
             output_file = write_fallback_error_result(task, f"Worker crashed while running task: {exc}")
             result_queue.put(
@@ -392,14 +755,39 @@ def main() -> int:
         print("No tasks to run.")
         return 0
 
+    if args.schedule == "lpt":
+        history_dirs = [output_dir] + [Path(path).resolve() for path in args.history_dir]
+        selected_tasks, estimates, from_history = order_tasks_lpt(selected_tasks, history_dirs)
+        print(
+            f"Scheduling longest-expected-first: {from_history}/{len(selected_tasks)} tasks estimated "
+            f"from earlier results, longest {estimates[selected_tasks[0].name]:.0f}s ({selected_tasks[0].name})"
+        )
+
+    try:
+        print_cost_forecasts(
+            tasks_dir, selected_tasks, config_path, args.model,
+            [output_dir] + [Path(path).resolve() for path in args.history_dir],
+        )
+    except Exception as exc:
+        print(f"Cost forecast skipped: {exc}", file=sys.stderr)
+
     session_dir = work_root / datetime.now().strftime("%Y%m%d-%H%M%S")
     tasks_root = session_dir / "tasks"
     tasks_root.mkdir(parents=True, exist_ok=True)
     output_dir.mkdir(parents=True, exist_ok=True)
 
     worker_count = max(1, min(args.workers, len(selected_tasks)))
-    worker_slots = [WorkerSlot(index=worker_index) for worker_index in range(worker_count)]
-    task_ports = find_available_ports(count=len(selected_tasks), start_port=args.base_port)
+    if args.in_process:
+        # Each long-lived worker reuses one sandbox port for all of its tasks
+        worker_ports = find_available_ports(count=worker_count, start_port=args.base_port)
+        worker_slots = [
+            WorkerSlot(index=worker_index, docker_port=worker_ports[worker_index])
+            for worker_index in range(worker_count)
+        ]
+        task_ports: list[int | None] = [None] * len(selected_tasks)
+    else:
+        worker_slots = [WorkerSlot(index=worker_index) for worker_index in range(worker_count)]
+        task_ports = find_available_ports(count=len(selected_tasks), start_port=args.base_port)
     task_runs = [
         prepare_task_run(
             task_dir=task_dir,
@@ -411,37 +799,86 @@ def main() -> int:
     ]
 
     print(f"Total tasks selected: {len(task_runs)}")
-    print(f"Launching {worker_count} workers")
+    print(f"Launching {worker_count} {'in-process ' if args.in_process else ''}workers")
     print(f"Session directory: {session_dir}")
-    print(f"Allocated task ports from {task_ports[0]} to {task_ports[-1]}")
+    if args.in_process:
+        print(f"Allocated worker ports from {worker_ports[0]} to {worker_ports[-1]}")
+    else:
+        print(f"Allocated task ports from {task_ports[0]} to {task_ports[-1]}")
+
+    governor = None
+    telemetry = None
+    if args.adaptive_concurrency:
+        # Workers (and the inference_main.py processes they launch) inherit the telemetry file
+        telemetry_path = session_dir / "telemetry.jsonl"
+        os.environ[TELEMETRY_ENV] = str(telemetry_path)
+        telemetry = TelemetryTail(telemetry_path)
+        governor = AIMDConcurrencyGovernor(min_limit=args.min_workers, max_limit=worker_count)
+        print(
+            f"Adaptive concurrency between {governor.min_limit} and {governor.max_limit} tasks, "
+            f"starting at {governor.limit}"
+        )
 
     ctx = mp.get_context("spawn")
     task_queue: mp.Queue = ctx.Queue()
     result_queue: mp.Queue = ctx.Queue()
 
-    for task in task_runs:
-        task_queue.put(task)
-    for _ in range(worker_count):
-        task_queue.put(None)
+    # Tasks are queued only while fewer than the concurrency limit are in flight, so idle
+    # workers stay blocked on the queue when the governor lowers the limit
+    undispatched = deque(task_runs)
+    dispatched_tasks = 0
+
+    def dispatch_tasks(limit: int) -> None:
+        nonlocal dispatched_tasks
+        while undispatched and dispatched_tasks - completed_tasks < limit:
+            task_queue.put(undispatched.popleft())
+            dispatched_tasks += 1
+            if not undispatched:
+                for _ in range(worker_count):
+                    task_queue.put(None)
 
-    processes: list[mp.Process] = []
-    for slot in worker_slots:
+    completed_tasks = 0
+    dispatch_tasks(governor.limit if governor else len(task_runs))
+
+    def start_worker(slot: WorkerSlot) -> mp.Process:
+        if args.in_process:
+            target = in_process_worker_main
+            worker_args = (slot, repo_root, config_path, args.model, tasks_root, args.task_timeout, task_queue, result_queue)
+        else:
+            target = worker_main
+            worker_args = (slot, repo_root, args.model, args.task_timeout, task_queue, result_queue)
         process = ctx.Process(
-            target=worker_main,
-            args=(slot, repo_root, args.model, task_queue, result_queue),
+            target=target,
+            args=worker_args,
             name=f"parallel-worker-{slot.index}",
         )
         process.start()
-        processes.append(process)
         print(f"[worker {slot.index}] pid={process.pid} ready")
+        return process
+
+    processes: list[mp.Process] = [start_worker(slot) for slot in worker_slots]
+
+    # Running aggregate; each finished task only parses its own result file
+    result_index = ResultIndex.load(output_dir).refresh()
 
-    completed_tasks = 0
     completed_task_names: set[str] = set()
     failed_tasks: list[str] = []
 
     # Workers publish `started` and `finished` events so progress is visible while
     # results are still being produced into the shared final output directory.
     while completed_tasks < len(task_runs):
+        if governor is not None:
+            for telemetry_event in telemetry.read_new():
+                governor.observe(telemetry_event)
+            dispatch_tasks(governor.update(in_flight=dispatched_tasks - completed_tasks))
+
+        if args.in_process:
+            for slot_index, process in enumerate(processes):
+                if process.exitcode == TIMEOUT_RETURN_CODE:
+                    # The worker ended itself after its task timed out; the replacement takes the next task
+                    process.join()
+                    processes[slot_index] = start_worker(worker_slots[slot_index])
+
         try:
             event = result_queue.get(timeout=1)
         except Empty:
@@ -462,7 +899,8 @@ def main() -> int:
 
         output_file = Path(event["output_file"])
         copy_task_output(output_file, output_dir)
-        write_statistics(output_dir)
+        result_index.update_file(output_dir / output_file.name)
+        result_index.write_statistics()
 
         if int(event["return_code"]) == 0:
             print(
@@ -480,10 +918,10 @@ def main() -> int:
     for process in processes:
         process.join()
 
-    crashed_workers = [process.name for process in processes if process.exitcode not in (0, None)]
+    crashed_workers = [process.name for process in processes if process.exitcode not in (0, None, TIMEOUT_RETURN_CODE)]
     missing_tasks = sorted(task.task_name for task in task_runs if task.task_name not in completed_task_names)
 
-    write_statistics(output_dir)
+    result_index.write_statistics()
     print(f"Results written incrementally to {output_dir}")
     print(f"Statistics written to {output_dir / 'statistics.txt'}")
 
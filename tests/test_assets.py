@@ -0,0 +1,101 @@
+"""Tests for parsing asset-only Dockerfiles and packing their assets."""
+
+import io
+import tarfile
+
+import pytest
+
+from executor.assets import asset_injection_plan, build_assets_tar
+
+BASE_IMAGE = "ghcr.io/agent-infra/sandbox:latest"
+
+
+def write_task(tmp_path, dockerfile, assets=("series.csv",)):
+    (tmp_path / "Dockerfile").write_text(dockerfile)
+    for name in assets:
+        path = tmp_path / "assets" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"contents of {name}")
+    return tmp_path
+
+
+def test_plan_for_the_standard_asset_dockerfile(tmp_path):
+    task_dir = write_task(
+        tmp_path,
+        f"FROM {BASE_IMAGE}\n"
+        "RUN mkdir -p /home/gem/assets\n"
+        "COPY assets/series.csv /home/gem/assets/\n"
+        "COPY ./assets/extra /home/gem/assets/extra/\n"
+        "RUN chown -R 1000:1000 /home/gem/\n",
+    )
+    plan = asset_injection_plan(task_dir)
+    assert plan.base_image == BASE_IMAGE
+    assert plan.base_dockerfile == f"FROM {BASE_IMAGE}"
+    assert plan.directories == ["/home/gem/assets"]
+    assert plan.copies == [("assets/series.csv", "/home/gem/assets/"), ("assets/extra", "/home/gem/assets/extra/")]
+    assert (plan.uid, plan.gid) == (1000, 1000)
+
+
+def test_plan_without_chown_keeps_root_ownership(tmp_path):
+    task_dir = write_task(tmp_path, f"FROM {BASE_IMAGE}\nCOPY assets/series.csv /data/series.csv\n")
+    plan = asset_injection_plan(task_dir)
+    assert (plan.uid, plan.gid) == (0, 0)
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        "COPY assets/series.csv /home/gem/assets/\nRUN pip install numpy\n",
+        "COPY --chown=1000 assets/series.csv /home/gem/assets/\n",
+        "COPY assets/series.csv relative/\n",
+        "COPY assets/*.csv /home/gem/assets/\n",
+        "COPY data/series.csv /home/gem/assets/\n",
+        "COPY assets/../secret /home/gem/assets/\n",
+        "COPY /etc/passwd /home/gem/assets/\n",
+        "RUN chown -R 1000:1000 /home/gem/\nCOPY assets/series.csv /home/gem/assets/\n",
+        "COPY assets/series.csv /opt/assets/\nRUN chown -R 1000:1000 /home/gem/\n",
+        "RUN mkdir -p /home/gem/assets\n",
+        "ENV A=1\nCOPY assets/series.csv /home/gem/assets/\n",
+    ],
+)
+def test_dockerfiles_that_need_a_real_build_have_no_plan(tmp_path, body):
+    assert asset_injection_plan(write_task(tmp_path, f"FROM {BASE_IMAGE}\n{body}")) is None
+
+
+def test_missing_or_multi_stage_dockerfile_has_no_plan(tmp_path):
+    assert asset_injection_plan(tmp_path) is None
+    task_dir = write_task(tmp_path, f"FROM {BASE_IMAGE} AS base\nCOPY assets/series.csv /home/gem/assets/\n")
+    assert asset_injection_plan(task_dir) is None
+
+
+def test_tar_holds_directories_and_files_with_the_plan_ownership(tmp_path):
+    task_dir = write_task(
+        tmp_path,
+        f"FROM {BASE_IMAGE}\n"
+        "RUN mkdir -p /home/gem/assets\n"
+        "COPY assets/series.csv /home/gem/assets/\n"
+        "COPY assets/extra /home/gem/assets/extra\n"
+        "RUN chown -R 1000:1000 /home/gem/\n",
+        assets=("series.csv", "extra/a.txt", "extra/nested/b.txt"),
+    )
+    data = build_assets_tar(task_dir, asset_injection_plan(task_dir))
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        members = {member.name: member for member in tar.getmembers()}
+        assert set(members) == {
+            "home/gem/assets",
+            "home/gem/assets/series.csv",
+            "home/gem/assets/extra",
+            "home/gem/assets/extra/a.txt",
+            "home/gem/assets/extra/nested",
+            "home/gem/assets/extra/nested/b.txt",
+        }
+        assert all((member.uid, member.gid) == (1000, 1000) for member in members.values())
+        assert members["home/gem/assets/extra/nested"].isdir()
+        content = tar.extractfile(members["home/gem/assets/extra/nested/b.txt"]).read()
+        assert content == b"contents of extra/nested/b.txt"
+
+
+def test_tar_reports_missing_assets(tmp_path):
+    task_dir = write_task(tmp_path, f"FROM {BASE_IMAGE}\nCOPY assets/missing.csv /data/\n")
+    with pytest.raises(FileNotFoundError):
+        build_assets_tar(task_dir, asset_injection_plan(task_dir))
@@ -0,0 +1,106 @@
+"""Tests for token-budgeted context trimming."""
+
+import pytest
+
+from executor.context_manager import IMAGE_PLACEHOLDER, ContextManager
+
+
+def estimate(messages):
+    """Roughly one token per four characters, so tests do not depend on tiktoken."""
+    return sum(len(str(message.get("content"))) // 4 + 1 for message in messages)
+
+
+def manager(**kwargs):
+    kwargs.setdefault("estimator", estimate)
+    return ContextManager(**kwargs)
+
+
+def openai_history(turns, text_chars=800):
+    messages = [{"role": "system", "content": "system"}, {"role": "user", "content": "task"}]
+    for index in range(turns):
+        messages.append({"role": "assistant", "content": f"step {index}", "tool_calls": [{"id": f"call_{index}"}]})
+        messages.append({"role": "tool", "tool_call_id": f"call_{index}", "content": "x" * text_chars})
+    return messages
+
+
+def test_history_under_budget_is_untouched():
+    messages = openai_history(2, text_chars=10)
+    original = list(messages)
+    assert manager(max_tokens=10_000).fit(messages) == []
+    assert messages == original
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        ContextManager(max_tokens=100, strategies=["summarize"])
+
+
+def test_from_config_resolves_per_model_budget():
+    config = {"context_window": {"max_tokens": {"gpt-test": 5000, "default": 1000}, "keep_recent": 4}}
+    assert ContextManager.from_config(config, "gpt-test").max_tokens == 5000
+    assert ContextManager.from_config(config, "other").max_tokens == 1000
+    assert ContextManager.from_config({}, "gpt-test") is None
+
+
+def test_elides_old_tool_outputs_but_keeps_prompt_and_recent_messages():
+    messages = openai_history(6)
+    recent = messages[-2:]
+    dropped = manager(max_tokens=800, keep_recent=2, strategies=["elide_tool_outputs"]).fit(messages)
+    assert dropped and dropped[0].startswith("elide_tool_outputs")
+    assert messages[:2] == [{"role": "system", "content": "system"}, {"role": "user", "content": "task"}]
+    assert messages[-2:] == recent
+    assert "characters elided" in messages[3]["content"]
+    assert estimate(messages) <= 800
+
+
+def test_messages_are_replaced_not_edited_in_place():
+    messages = openai_history(6)
+    old_tool_message = messages[3]
+    manager(max_tokens=800, keep_recent=2, strategies=["elide_tool_outputs"]).fit(messages)
+    assert messages[3] is not old_tool_message
+    assert old_tool_message["content"] == "x" * 800
+
+
+def test_strips_old_images():
+    image = {"type": "image_url", "image_url": {"url": "data:image/png;base64," + "A" * 4000}}
+    messages = [{"role": "user", "content": "task"}]
+    for _ in range(3):
+        messages.append({"role": "assistant", "content": "look"})
+        messages.append({"role": "user", "content": [{"type": "text", "text": "screen"}, image]})
+    manager(max_tokens=2000, keep_recent=2, strategies=["strip_images"]).fit(messages)
+    assert messages[2]["content"][-1] == {"type": "text", "text": IMAGE_PLACEHOLDER}
+    assert messages[-1]["content"][-1] is image
+
+
+def test_drop_turns_removes_tool_calls_with_their_results():
+    messages = openai_history(6)
+    dropped = manager(max_tokens=1000, keep_recent=2, strategies=["drop_turns"]).fit(messages)
+    # Six turns of ~200 tokens; three go to get under the 800-token low-water mark
+    assert dropped == ["dropped 3 old turn(s)"]
+    roles = [message["role"] for message in messages]
+    assert roles == ["system", "user"] + ["assistant", "tool"] * 3
+    assert [message["tool_call_id"] for message in messages[3::2]] == ["call_3", "call_4", "call_5"]
+    # The gap is noted in the task prompt rather than in a second user message
+    assert messages[1]["content"] == "task\n\n[6 earlier messages were removed to fit the context budget]"
+
+
+def test_drop_turns_updates_an_existing_gap_note():
+    messages = openai_history(6)
+    context = manager(max_tokens=1000, keep_recent=2, strategies=["drop_turns"])
+    context.fit(messages)
+    messages.extend(openai_history(4)[2:])
+    context.fit(messages)
+    assert messages[1]["content"].count("earlier messages were removed") == 1
+    assert messages[1]["content"].endswith("[14 earlier messages were removed to fit the context budget]")
+
+
+def test_drop_turns_treats_gemini_model_messages_as_turns():
+    messages = [{"role": "user", "content": "task"}]
+    for index in range(6):
+        messages.append({"role": "model", "content": f"thinking {index} " + "x" * 800})
+        messages.append({"role": "model", "content": "Tool call click: ok"})
+    manager(max_tokens=700, keep_recent=2, strategies=["drop_turns"]).fit(messages)
+    assert messages[0]["content"].startswith("task\n\n[")
+    # Turns start at model replies, never at a tool result left without its call
+    assert messages[1]["content"].startswith("thinking")
+    assert [message["role"] for message in messages].count("user") == 1
@@ -0,0 +1,128 @@
+"""Tests for load balancing over OpenAI-compatible replicas."""
+
+import pytest
+
+from executor.endpoints import EndpointPool, resolve_base_urls
+
+URLS = ["http://a/v1", "http://b/v1", "http://c/v1"]
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def make_pool(**kwargs):
+    return EndpointPool(URLS, make_client=lambda url: f"client for {url}", **kwargs)
+
+
+def expire_ejection(endpoint):
+    endpoint.ejected_until = 0.0
+
+
+def test_resolve_base_urls_from_config_string_or_env(monkeypatch):
+    assert resolve_base_urls({"base_urls": "http://a/v1, http://b/v1,,http://a/v1"}) == ["http://a/v1", "http://b/v1"]
+    monkeypatch.setenv("VLLM_BASE_URLS", "http://c/v1")
+    assert resolve_base_urls({}) == ["http://c/v1"]
+    assert resolve_base_urls({"base_urls": ["http://d/v1"]}) == ["http://d/v1"]
+
+
+def test_pool_needs_a_url():
+    with pytest.raises(ValueError):
+        EndpointPool([], make_client=lambda url: None)
+
+
+def test_unrouted_calls_go_to_the_least_busy_replica():
+    pool = make_pool()
+    leased = [pool.acquire() for _ in range(3)]
+    assert sorted(endpoint.url for endpoint in leased) == URLS
+    pool.release(leased[1])
+    assert pool.acquire() is leased[1]
+
+
+def test_routing_key_sticks_to_one_replica_until_it_is_too_busy():
+    pool = make_pool(sticky_slack=2)
+    preferred = pool.acquire("task-1")
+    assert all(pool.acquire("task-1") is preferred for _ in range(2))
+    # Three calls in flight on the preferred replica and none elsewhere exceeds the slack
+    assert pool.acquire("task-1") is not preferred
+
+
+def test_exclude_avoids_a_replica_unless_nothing_else_is_left():
+    pool = make_pool()
+    assert pool.acquire(exclude=("http://a/v1", "http://b/v1")).url == "http://c/v1"
+    single = EndpointPool(["http://a/v1"], make_client=lambda url: None)
+    assert single.acquire(exclude=("http://a/v1",)).url == "http://a/v1"
+
+
+def test_replica_is_ejected_after_consecutive_unhealthy_failures():
+    pool = make_pool(eject_after=2, eject_seconds=60)
+    endpoint = pool.endpoints[0]
+    for _ in range(2):
+        pool.acquire(exclude=("http://b/v1", "http://c/v1"))
+        pool.release(endpoint, StatusError(503))
+    assert endpoint.consecutive_failures == 2
+    assert all(pool.acquire().url != endpoint.url for _ in range(4))
+
+
+def test_client_errors_do_not_count_against_a_replica():
+    pool = make_pool(eject_after=1)
+    endpoint = pool.acquire()
+    pool.release(endpoint, StatusError(400))
+    pool.release(pool.acquire(), StatusError(429))
+    assert all(endpoint.consecutive_failures == 0 for endpoint in pool.endpoints)
+
+
+def test_ejected_replica_gets_a_single_probe_and_recovers_on_success():
+    pool = make_pool(eject_after=1, eject_seconds=60)
+    endpoint = pool.acquire(exclude=("http://b/v1", "http://c/v1"))
+    pool.release(endpoint, StatusError(500))
+    expire_ejection(endpoint)
+
+    probe = pool.acquire(exclude=("http://b/v1", "http://c/v1"))
+    assert probe is endpoint
+    # While the probe is in flight other calls stay off the replica
+    assert all(pool.acquire().url != endpoint.url for _ in range(4))
+
+    pool.release(probe)
+    assert endpoint.consecutive_failures == 0
+    assert endpoint.available(0.0)
+
+
+def test_failed_probe_ejects_the_replica_again():
+    pool = make_pool(eject_after=1, eject_seconds=60)
+    endpoint = pool.acquire(exclude=("http://b/v1", "http://c/v1"))
+    pool.release(endpoint, StatusError(500))
+    expire_ejection(endpoint)
+
+    probe = pool.acquire(exclude=("http://b/v1", "http://c/v1"))
+    pool.release(probe, TimeoutError())
+    assert endpoint.consecutive_failures == 2
+    assert all(pool.acquire().url != endpoint.url for _ in range(4))
+
+
+def test_all_ejected_falls_back_to_the_replica_that_returns_first():
+    pool = make_pool(eject_after=1, eject_seconds=60)
+    for endpoint in pool.endpoints:
+        pool.release(endpoint, StatusError(502))
+    pool.endpoints[1].ejected_until -= 30
+    assert pool.acquire() is pool.endpoints[1]
+
+
+def test_lease_releases_with_the_call_outcome():
+    pool = make_pool(eject_after=1)
+    with pytest.raises(ConnectionError):
+        with pool.lease(exclude=("http://b/v1", "http://c/v1")) as endpoint:
+            assert endpoint.outstanding == 1
+            raise ConnectionError("reset")
+    assert endpoint.outstanding == 0
+    assert endpoint.failures == 1
+
+
+def test_from_config_shares_pools_between_controllers():
+    config = {"base_urls": ["http://shared-a/v1", "http://shared-b/v1"]}
+    first = EndpointPool.from_config(config, make_client=lambda url: object(), api_key="key")
+    assert EndpointPool.from_config(config, make_client=lambda url: object(), api_key="key") is first
+    assert EndpointPool.from_config(config, make_client=lambda url: object(), api_key="other") is not first
+    assert EndpointPool.from_config({}, make_client=lambda url: object()) is None
@@ -0,0 +1,153 @@
+"""Tests for hedged LLM requests."""
+
+import threading
+
+import pytest
+
+from executor.hedging import (
+    DUPLICATE,
+    PRIMARY,
+    ApiAttempt,
+    HedgePolicy,
+    LatencyHistogram,
+    RequestCancelled,
+    run_hedged,
+)
+
+TIMEOUT = 5
+
+
+class Race:
+    """Runs attempts that block until the test releases them, recording what happened."""
+
+    def __init__(self):
+        self.release = {PRIMARY: threading.Event(), DUPLICATE: threading.Event()}
+        self.started = {PRIMARY: threading.Event(), DUPLICATE: threading.Event()}
+        self.failures: dict = {}
+        self.abandoned: list = []
+        self.stopped = threading.Event()
+
+    def run(self, attempt):
+        self.started[attempt.role].set()
+        # Poll like a streamed response checks between chunks
+        while not self.release[attempt.role].wait(0.01):
+            try:
+                attempt.check_cancelled()
+            except RequestCancelled:
+                self.stopped.set()
+                raise
+        if attempt.role in self.failures:
+            raise self.failures[attempt.role]
+        return f"{attempt.role} response"
+
+    def on_abandoned(self, attempt, future):
+        self.abandoned.append((attempt, future))
+
+
+def test_histogram_percentile_and_policy_delay():
+    histogram = LatencyHistogram(window=10)
+    policy = HedgePolicy(percentile=90, min_samples=5, min_delay=0.5, max_delay=8)
+    assert histogram.percentile(90) is None
+    for seconds in range(1, 5):
+        histogram.add(seconds)
+    assert policy.delay(histogram) is None
+    for seconds in range(5, 21):
+        histogram.add(seconds)
+    # The window keeps the last 10 samples, 11..20
+    assert len(histogram) == 10
+    assert histogram.percentile(90) == 19
+    assert policy.delay(histogram) == 8
+    assert HedgePolicy.from_config({}) is None
+    assert HedgePolicy.from_config({"hedging": {"enabled": False}}) is None
+
+
+def test_fast_primary_is_not_hedged():
+    race = Race()
+    race.release[PRIMARY].set()
+    start_duplicate = pytest.fail
+    response, winner = run_hedged(race.run, ApiAttempt(), TIMEOUT, start_duplicate, race.on_abandoned)
+    assert (response, winner.role) == ("primary response", PRIMARY)
+    assert race.abandoned == []
+
+
+def test_duplicate_wins_and_primary_is_cancelled():
+    race = Race()
+    race.release[DUPLICATE].set()
+    primary = ApiAttempt()
+    primary.prompt_tokens = 1234
+    response, winner = run_hedged(race.run, primary, 0.05, lambda attempt: True, race.on_abandoned)
+
+    assert (response, winner.role) == ("duplicate response", DUPLICATE)
+    assert winner.duplicate_of is primary
+    assert winner.prompt_tokens == 1234
+    assert primary.cancelled.is_set()
+    assert [attempt for attempt, _ in race.abandoned] == [primary]
+    assert race.stopped.wait(TIMEOUT)
+    with pytest.raises(RequestCancelled):
+        race.abandoned[0][1].result(timeout=TIMEOUT)
+
+
+def test_primary_still_wins_after_the_duplicate_started():
+    race = Race()
+    primary = ApiAttempt()
+
+    def start_duplicate(attempt):
+        # Let the primary answer right after the duplicate is sent
+        threading.Timer(0.05, race.release[PRIMARY].set).start()
+        return True
+
+    response, winner = run_hedged(race.run, primary, 0.05, start_duplicate, race.on_abandoned)
+    assert (response, winner) == ("primary response", primary)
+    assert race.started[DUPLICATE].is_set()
+    loser, _ = race.abandoned[0]
+    assert loser.role == DUPLICATE and loser.cancelled.is_set()
+
+
+def test_declined_hedge_waits_for_the_primary():
+    race = Race()
+    threading.Timer(0.1, race.release[PRIMARY].set).start()
+    response, winner = run_hedged(race.run, ApiAttempt(), 0.01, lambda attempt: False, race.on_abandoned)
+    assert (response, winner.role) == ("primary response", PRIMARY)
+    assert not race.started[DUPLICATE].is_set()
+
+
+def test_failed_primary_falls_back_to_the_duplicate():
+    race = Race()
+    race.failures[PRIMARY] = ConnectionError("reset")
+
+    def start_duplicate(attempt):
+        race.release[PRIMARY].set()
+        threading.Timer(0.05, race.release[DUPLICATE].set).start()
+        return True
+
+    response, winner = run_hedged(race.run, ApiAttempt(), 0.05, start_duplicate, race.on_abandoned)
+    assert (response, winner.role) == ("duplicate response", DUPLICATE)
+    assert race.abandoned == []
+
+
+def test_primary_error_is_raised_when_both_fail():
+    race = Race()
+    race.failures = {PRIMARY: ConnectionError("primary"), DUPLICATE: TimeoutError("duplicate")}
+
+    def start_duplicate(attempt):
+        race.release[PRIMARY].set()
+        race.release[DUPLICATE].set()
+        return True
+
+    with pytest.raises(ConnectionError, match="primary"):
+        run_hedged(race.run, ApiAttempt(), 0.05, start_duplicate, race.on_abandoned)
+
+
+def test_stop_early_dispatch_blocks_hedging_once_actions_started():
+    class Monitor:
+        def __init__(self, dispatched):
+            self.dispatched = dispatched
+
+        def cancel_dispatch(self):
+            return not self.dispatched
+
+    attempt = ApiAttempt()
+    assert attempt.stop_early_dispatch()
+    started = ApiAttempt()
+    started.attach_monitor(Monitor(dispatched=True))
+    assert not started.stop_early_dispatch()
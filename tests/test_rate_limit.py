@@ -0,0 +1,68 @@
+"""Tests for the host-wide token-bucket rate limiter."""
+
+import pytest
+
+from executor.rate_limit import RateLimiter, resolve_rate_limit
+
+
+@pytest.fixture
+def limiter(tmp_path):
+    return RateLimiter("openai|gpt-test|key", requests_per_minute=60, tokens_per_minute=1200, state_dir=tmp_path)
+
+
+def test_resolve_rate_limit_prefers_model_entry_over_default():
+    config = {"rate_limits": {"gpt-test": {"requests_per_minute": 10}, "default": {"tokens_per_minute": 100}}}
+    assert resolve_rate_limit(config, "gpt-test") == {"requests_per_minute": 10}
+    assert resolve_rate_limit(config, "other") == {"tokens_per_minute": 100}
+    assert resolve_rate_limit({}, "gpt-test") is None
+    assert resolve_rate_limit({"rate_limits": {"default": {}}}, "gpt-test") is None
+
+
+def test_bucket_file_name_does_not_contain_api_key(limiter):
+    assert "key" not in limiter.state_path.name
+
+
+def test_take_charges_one_request_and_the_tokens(limiter):
+    state = {"requests": 60.0, "tokens": 1200.0}
+    assert limiter._take(state, 200) == 0
+    assert state == {"requests": 59.0, "tokens": 1000.0}
+
+
+def test_take_waits_for_missing_tokens_without_charging(limiter):
+    state = {"requests": 60.0, "tokens": 100.0}
+    # 200 missing tokens at 1200 tokens/min refill in 10s
+    assert limiter._take(state, 300) == pytest.approx(10.0)
+    assert state == {"requests": 60.0, "tokens": 100.0}
+
+
+def test_take_waits_for_a_request(limiter):
+    state = {"requests": 0.5, "tokens": 1200.0}
+    # Half a request at 60 requests/min refills in 0.5s
+    assert limiter._take(state, 0) == pytest.approx(0.5)
+
+
+def test_take_only_waits_for_a_full_bucket_when_call_exceeds_it(limiter):
+    state = {"requests": 60.0, "tokens": 1200.0}
+    assert limiter._take(state, 5000) == 0
+    assert state["tokens"] == -3800.0
+
+
+def test_settle_turns_underestimate_into_debt(limiter):
+    assert limiter.try_acquire(1000)
+    limiter.settle(500)
+    # 1200 - 1000 - 500 leaves 300 tokens of debt, so nothing more fits right now
+    assert not limiter.try_acquire(1)
+
+
+def test_settle_refund_is_capped_at_a_full_bucket(limiter):
+    limiter.settle(-10_000)
+    with limiter._locked_state() as state:
+        assert state["tokens"] == 1200.0
+
+
+def test_limiters_with_the_same_bucket_share_quota(tmp_path):
+    first = RateLimiter("bucket", requests_per_minute=1, state_dir=tmp_path)
+    second = RateLimiter("bucket", requests_per_minute=1, state_dir=tmp_path)
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    assert RateLimiter("other", requests_per_minute=1, state_dir=tmp_path).try_acquire()
@@ -0,0 +1,95 @@
+"""Tests for the record/replay LLM response cache."""
+
+import os
+
+import pytest
+from openai.types.chat import ChatCompletion
+
+from executor.response_cache import ResponseCache, ResponseCacheMiss
+
+
+def completion(text):
+    return ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-test",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+        }
+    )
+
+
+def key_for(cache, messages, **params):
+    return cache.make_key("OpenAILLM", "gpt-test", messages, "tools-hash", params or {"temperature": 0})
+
+
+def test_key_ignores_trailing_whitespace_and_cache_control(tmp_path):
+    cache = ResponseCache(cache_dir=tmp_path)
+    plain = [{"role": "user", "content": [{"type": "text", "text": "hello"}]}]
+    annotated = [{"role": "user", "content": [{"type": "text", "text": "hello  ", "cache_control": {"type": "ephemeral"}}]}]
+    assert key_for(cache, plain) == key_for(cache, annotated)
+
+
+def test_key_changes_with_messages_params_and_tools(tmp_path):
+    cache = ResponseCache(cache_dir=tmp_path)
+    messages = [{"role": "user", "content": "hello"}]
+    key = key_for(cache, messages)
+    assert key != key_for(cache, [{"role": "user", "content": "bye"}])
+    assert key != key_for(cache, messages, temperature=1)
+    assert key != cache.make_key("OpenAILLM", "gpt-test", messages, None, {"temperature": 0})
+    assert key != cache.make_key("OpenAILLM", "gpt-other", messages, "tools-hash", {"temperature": 0})
+
+
+def test_key_notices_replaced_message_content(tmp_path):
+    cache = ResponseCache(cache_dir=tmp_path)
+    message = {"role": "user", "content": "hello"}
+    key = key_for(cache, [message])
+    message["content"] = "changed"
+    assert key_for(cache, [message]) != key
+
+
+def test_replay_returns_the_recorded_response(tmp_path):
+    recorder = ResponseCache(mode="record", cache_dir=tmp_path)
+    key = key_for(recorder, [{"role": "user", "content": "hello"}])
+    assert recorder.lookup(key) is None
+    recorder.store(key, completion("hi there"))
+
+    replayed = ResponseCache(mode="replay", cache_dir=tmp_path).lookup(key)
+    assert isinstance(replayed, ChatCompletion)
+    assert replayed.choices[0].message.content == "hi there"
+
+
+def test_replay_miss_raises_and_replay_or_live_falls_through(tmp_path):
+    with pytest.raises(ResponseCacheMiss):
+        ResponseCache(mode="replay", cache_dir=tmp_path).lookup("0" * 64)
+    assert ResponseCache(mode="replay_or_live", cache_dir=tmp_path).lookup("0" * 64) is None
+
+
+def test_from_config_and_invalid_mode(tmp_path):
+    assert ResponseCache.from_config({}) is None
+    cache = ResponseCache.from_config({"response_cache": {"mode": "replay", "dir": str(tmp_path)}})
+    assert cache.mode == "replay" and cache.cache_dir == tmp_path
+    with pytest.raises(ValueError):
+        ResponseCache(mode="off", cache_dir=tmp_path)
+
+
+def test_eviction_removes_least_recently_used_entries(tmp_path):
+    cache = ResponseCache(mode="replay_or_live", cache_dir=tmp_path, max_bytes=10**6)
+    keys = [f"{index:02d}" + "0" * 62 for index in range(4)]
+    for age, key in enumerate(keys):
+        cache.store(key, completion("x" * 200))
+        path = cache._entry_path(key)
+        # Oldest first: key 0 was used longest ago
+        os.utime(path, (1000 + age, 1000 + age))
+    entry_size = cache._entry_path(keys[0]).stat().st_size
+
+    # Using key 0 makes it the most recently used entry
+    assert cache.lookup(keys[0]) is not None
+    cache.max_bytes = int(entry_size * 3.5)
+    cache.store("04" + "0" * 62, completion("x" * 200))
+
+    remaining = {path.stem for path in tmp_path.glob("*/*.json")}
+    assert keys[0] in remaining
+    assert keys[1] not in remaining and keys[2] not in remaining
+    assert cache._size_bytes <= cache.max_bytes
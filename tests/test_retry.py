@@ -0,0 +1,101 @@
+"""Tests for API error classification and retry backoff."""
+
+import pytest
+
+from executor import retry
+from executor.retry import RetryPolicy, classify_error, retry_after_hint
+
+
+class FakeResponse:
+    def __init__(self, headers=None):
+        self.headers = headers or {}
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = FakeResponse(headers)
+
+
+class GenaiError(Exception):
+    """Shaped like google-genai's APIError: an int ``code`` and a JSON ``details`` body."""
+
+    def __init__(self, code, details=None):
+        super().__init__(f"code {code}")
+        self.code = code
+        self.details = details
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+@pytest.mark.parametrize(
+    "error, kind",
+    [
+        (StatusError(429), retry.RATE_LIMITED),
+        (StatusError(503), retry.SERVER_ERROR),
+        (StatusError(408), retry.TIMEOUT),
+        (StatusError(400), retry.CLIENT_ERROR),
+        (GenaiError(429), retry.RATE_LIMITED),
+        (APITimeoutError(), retry.TIMEOUT),
+        (APIConnectionError(), retry.CONNECTION_ERROR),
+        (ValueError("boom"), retry.UNKNOWN_ERROR),
+    ],
+)
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+
+def test_retry_after_hint_from_headers_and_gemini_details():
+    assert retry_after_hint(StatusError(429, {"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_hint(StatusError(429, {"retry-after": "7"})) == 7.0
+    details = {"error": {"details": [{"@type": "RetryInfo", "retryDelay": "12.5s"}]}}
+    assert retry_after_hint(GenaiError(429, details)) == 12.5
+    assert retry_after_hint(StatusError(429)) is None
+
+
+def test_client_errors_are_not_retried():
+    state = RetryPolicy().begin()
+    assert state.next_delay(StatusError(400)) is None
+
+
+def test_gives_up_after_max_attempts():
+    state = RetryPolicy(max_attempts=3, base_delay=0.01).begin()
+    assert state.next_delay(StatusError(503)) is not None
+    assert state.next_delay(StatusError(503)) is not None
+    assert state.next_delay(StatusError(503)) is None
+    assert state.attempts == 3
+
+
+def test_server_hint_wins_over_backoff():
+    state = RetryPolicy().begin()
+    delay = state.next_delay(StatusError(429, {"retry-after": "20"}))
+    assert 20 <= delay <= 21
+
+
+def test_decorrelated_jitter_stays_between_base_and_cap():
+    policy = RetryPolicy(max_attempts=50, base_delay=1.0, max_delay=30.0, total_budget=10_000)
+    state = policy.begin()
+    base = retry.BASE_DELAYS[retry.SERVER_ERROR]
+    previous = base
+    for _ in range(40):
+        delay = state.next_delay(StatusError(500))
+        assert base <= delay <= min(30.0, previous * 3)
+        previous = delay
+
+
+def test_gives_up_when_delay_exceeds_total_budget():
+    state = RetryPolicy(total_budget=10).begin()
+    assert state.next_delay(StatusError(429, {"retry-after": "60"})) is None
+
+
+def test_policy_from_config_defaults():
+    policy = RetryPolicy.from_config(None)
+    assert (policy.max_attempts, policy.max_delay, policy.total_budget) == (8, 60.0, 600.0)
+    assert RetryPolicy.from_config({"max_attempts": 0}).max_attempts == 1